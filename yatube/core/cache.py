@@ -0,0 +1,273 @@
+"""Двухуровневый кэш: LRU в памяти процесса (L1) поверх общего L2.
+
+L2 — любой кэш из settings.CACHES, общий для всех воркеров (файловый
+или в базе). В L1 попадают только ключи с префиксами из
+L1_KEY_PREFIXES: записи, которые под своим именем никогда не
+переписываются. Это отрисованные посты (в ключе updated_at, имя автора
+и версия шаблона) и метаданные картинок sorl-thumbnail (размеры по
+имени файла: загруженный файл не меняется, а имя нового всегда
+другое). Новое содержимое уходит под новый ключ, а старое просто
+перестаёт читаться, поэтому копия в памяти воркера не устаревает.
+
+Остальные ключи читаются и пишутся прямо в L2: версии лент, счётчики,
+блокировки, списки миниатюр sorl-thumbnail, а также страницы из
+get_or_refresh — у них версия в имени, но пересчёт кладёт под тот же
+ключ новый срок, и чужая копия в L1 заставляла бы пересчитывать уже
+обновлённую страницу.
+"""
+import math
+import pickle
+import random
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+L1_KEY_PREFIXES = ('post_html:', 'sorl-thumbnail||image||')
+
+# Уровни L1 по имени кэша. Django создаёт экземпляр бэкенда на каждый
+# поток, а L1 должен быть общим для процесса.
+_tiers = {}
+_tiers_lock = Lock()
+
+
+class LocalTier:
+    """Ограниченный LRU в памяти процесса со счётчиками попаданий."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = Lock()
+        self.stats = {
+            'l1_hits': 0, 'l1_misses': 0, 'l2_hits': 0, 'l2_misses': 0,
+        }
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self.data.move_to_end(key)
+                self.stats['l1_hits'] += 1
+                return item[0]
+            if item is not None:
+                del self.data[key]
+            self.stats['l1_misses'] += 1
+        return None
+
+    def count(self, **deltas):
+        with self.lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats)
+
+    def set(self, key, pickled, ttl):
+        with self.lock:
+            self.data[key] = (pickled, time.monotonic() + ttl)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def reset(self):
+        with self.lock:
+            self.data.clear()
+
+
+class TieredCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = options.get('L2_CACHE', 'shared')
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._l1_prefixes = tuple(
+            options.get('L1_KEY_PREFIXES', L1_KEY_PREFIXES))
+        with _tiers_lock:
+            self._tier = _tiers.setdefault(
+                name, LocalTier(options.get('L1_MAX_ENTRIES', 1000)))
+
+    @property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def stats(self):
+        """Попадания и промахи по уровням для текущего процесса."""
+        return self._tier.snapshot()
+
+    def is_local(self, key):
+        """Держится ли ключ в L1: только версионированные записи."""
+        return key.startswith(self._l1_prefixes)
+
+    def _l1_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self._l1_timeout
+        return max(0, min(self._l1_timeout, timeout - time.time()))
+
+    def _remember(self, key, local_key, value, ttl):
+        if ttl > 0 and self.is_local(key):
+            self._tier.set(
+                local_key, pickle.dumps(value, self.pickle_protocol), ttl)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        if self.is_local(key):
+            pickled = self._tier.get(local_key)
+            if pickled is not None:
+                return pickle.loads(pickled)
+        value = self.l2.get(key, self, version=version)
+        if value is self:
+            self._tier.count(l2_misses=1)
+            return default
+        self._tier.count(l2_hits=1)
+        self._remember(key, local_key, value, self._l1_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            local_key = self.make_key(key, version=version)
+            self.validate_key(local_key)
+            pickled = self._tier.get(local_key) if self.is_local(key) else None
+            if pickled is not None:
+                found[key] = pickle.loads(pickled)
+            else:
+                missing.append(key)
+        if missing:
+            from_l2 = self.l2.get_many(missing, version=version)
+            self._tier.count(l2_hits=len(from_l2),
+                             l2_misses=len(missing) - len(from_l2))
+            for key, value in from_l2.items():
+                self._remember(
+                    key, self.make_key(key, version=version), value,
+                    self._l1_timeout)
+            found.update(from_l2)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        self.l2.set(key, value, self._l2_timeout(timeout), version=version)
+        self._remember(key, local_key, value, self._l1_ttl(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(
+            data, self._l2_timeout(timeout), version=version)
+        ttl = self._l1_ttl(timeout)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(
+                    key, self.make_key(key, version=version), value, ttl)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # add — это блокировки и «первый пишет»: только через L2.
+        self._tier.discard(self.make_key(key, version=version))
+        return self.l2.add(key, value, self._l2_timeout(timeout),
+                           version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._tier.discard(self.make_key(key, version=version))
+        return self.l2.touch(key, self._l2_timeout(timeout), version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self._tier.discard(self.make_key(key, version=version))
+        return value
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version=version)
+        self._tier.discard(self.make_key(key, version=version))
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        self.l2.delete_many(keys, version=version)
+        for key in keys:
+            self._tier.discard(self.make_key(key, version=version))
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        self.l2.clear()
+        self._tier.reset()
+
+    def _l2_timeout(self, timeout):
+        # DEFAULT_TIMEOUT означает таймаут этого кэша, а не L2.
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+
+def _should_refresh(delta, expiry, beta):
+    """XFetch: чем ближе срок и дольше пересчёт, тем вероятнее
+    пересчитать значение заранее."""
+    return time.time() - delta * beta * math.log(random.random()) >= expiry
+
+
+def get_or_refresh(cache, key, timeout, compute, beta=1.0, stale=None,
+                   lock_timeout=10, wait=2.0):
+    """Кэширует результат compute() с защитой от лавины пересчётов.
+
+    Рядом со значением хранится его логический срок и время пересчёта.
+    Пересчитывает только тот, кто успел взять блокировку через
+    cache.add, остальные в это время получают устаревшее значение:
+    оно физически живёт в кэше ещё stale секунд (по умолчанию столько
+    же, сколько timeout). Незадолго до срока значение пересчитывается
+    с вероятностью по алгоритму XFetch, так что чаще всего обновление
+    случается до того, как ключ протух.
+
+    Если значения нет совсем, а пересчёт уже идёт, ждём его не дольше
+    wait секунд и возвращаем None, если не дождались: сам compute()
+    вызывается только под блокировкой.
+
+    В блокировке лежит случайный токен. Если compute() дольше
+    lock_timeout, блокировка успевает истечь и достаться другому
+    воркеру, и снимать её мы уже не вправе.
+    """
+    if stale is None:
+        stale = timeout
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    entry = cache.get(key)
+    if entry is not None:
+        value, delta, expiry = entry
+        if not _should_refresh(delta, expiry, beta):
+            return value
+        if not cache.add(lock_key, token, lock_timeout):
+            return value
+    elif not cache.add(lock_key, token, lock_timeout):
+        return _wait_for(cache, key, wait)
+    try:
+        start = time.time()
+        value = compute()
+        delta = time.time() - start
+        cache.set(key, (value, delta, time.time() + timeout),
+                  timeout + stale)
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+    return value
+
+
+def _wait_for(cache, key, wait):
+    """Ждёт значение, которое считает другой воркер; None по таймауту."""
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return None
@@ -0,0 +1,38 @@
+from django import template
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache import get_or_refresh
+
+register = template.Library()
+
+
+class PageCacheNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        request = context.get('request')
+        key = getattr(request, 'page_cache_key', None)
+        if key is None:
+            return self.nodelist.render(context)
+        html = get_or_refresh(
+            caches['default'], key, settings.PAGE_CACHE_TIMEOUT,
+            lambda: self.nodelist.render(context),
+        )
+        if html is None:
+            return self.nodelist.render(context)
+        return html
+
+
+@register.tag
+def pagecache(parser, token):
+    """Кэширует страницу целиком под ключом request.page_cache_key,
+    который ставит view (см. posts/pages.py). Без ключа рендерит как
+    есть.
+
+        {% pagecache %}...{% endpagecache %}
+    """
+    nodelist = parser.parse(('endpagecache',))
+    parser.delete_first_token()
+    return PageCacheNode(nodelist)
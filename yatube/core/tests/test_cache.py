@@ -0,0 +1,173 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpRequest
+from django.template import Context, Template
+from django.test import TestCase
+from core.cache import LocalTier, TieredCache, get_or_refresh
+
+OPTIONS = {'L2_CACHE': 'shared', 'L1_TIMEOUT': 60}
+
+
+def make_worker():
+    """Экземпляр кэша со своим L1, как в отдельном процессе."""
+    cache = TieredCache('test-tiered', {'OPTIONS': OPTIONS})
+    cache._tier = LocalTier(max_entries=3)
+    return cache
+
+
+class TieredCacheTests(TestCase):
+    def setUp(self):
+        caches['shared'].clear()
+        self.first = make_worker()
+        self.second = make_worker()
+
+    def test_versioned_reads_are_served_from_l1(self):
+        self.first.set('post_html:1:v1', 'value')
+        self.assertEqual(self.first.get('post_html:1:v1'), 'value')
+        self.assertEqual(self.first.stats()['l1_hits'], 1)
+
+        self.assertEqual(self.second.get('post_html:1:v1'), 'value')
+        self.assertEqual(self.second.get('post_html:1:v1'), 'value')
+        self.assertEqual(self.second.stats(), {
+            'l1_hits': 1, 'l1_misses': 1, 'l2_hits': 1, 'l2_misses': 0,
+        })
+
+    def test_other_keys_always_read_l2(self):
+        self.first.set('feed_version:index', 1)
+        self.assertEqual(self.second.get('feed_version:index'), 1)
+        self.first.incr('feed_version:index')
+        self.assertEqual(self.second.get('feed_version:index'), 2)
+        self.first.delete('feed_version:index')
+        self.assertIsNone(self.second.get('feed_version:index'))
+        self.assertEqual(self.second.stats()['l1_hits'], 0)
+
+    def test_refreshed_pages_always_read_l2(self):
+        key = 'template.cache.page.abc'
+        get_or_refresh(self.first, key, 20, lambda: 'старая')
+        self.assertEqual(self.second.get(key)[0], 'старая')
+        self.first.set(key, ('новая', 0, time.time() + 20))
+        self.assertEqual(self.second.get(key)[0], 'новая')
+        self.assertEqual(self.second.stats()['l1_hits'], 0)
+
+    def test_sorl_image_records_in_l1(self):
+        image = 'sorl-thumbnail||image||abc'
+        thumbnails = 'sorl-thumbnail||thumbnails||abc'
+        self.first.set_many({image: 'meta', thumbnails: ['small']})
+        self.assertEqual(self.second.get(image), 'meta')
+        self.assertEqual(self.second.get(image), 'meta')
+        self.assertEqual(self.second.get(thumbnails), ['small'])
+        self.first.set(thumbnails, ['small', 'large'])
+        self.assertEqual(self.second.get(thumbnails), ['small', 'large'])
+        self.assertEqual(self.second.stats()['l1_hits'], 1)
+
+    def test_writes_keep_foreign_l1(self):
+        self.second.set('post_html:1:v1', 'value')
+        self.first.set_many({f'key{i}': i for i in range(5)})
+        self.first.incr('key0')
+        self.assertEqual(self.second.get('post_html:1:v1'), 'value')
+        self.assertEqual(self.second.stats()['l1_hits'], 1)
+
+    def test_l1_is_bounded(self):
+        self.first.set_many({f'post_html:{i}': i for i in range(5)})
+        self.assertEqual(len(self.first._tier.data), 3)
+        self.assertEqual(
+            self.first.get_many(['post_html:0', 'post_html:4']),
+            {'post_html:0': 0, 'post_html:4': 4})
+
+
+class GetOrRefreshTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'значение {self.calls}'
+
+    def test_value_is_cached(self):
+        for _ in range(3):
+            value = get_or_refresh(cache, 'key', 20, self.compute)
+        self.assertEqual(value, 'значение 1')
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_value_served_stale_while_locked(self):
+        cache.set('key', ('старое', 0.01, time.time() - 1), 60)
+        cache.add('key:lock', True, 10)
+        value = get_or_refresh(cache, 'key', 20, self.compute)
+        self.assertEqual(value, 'старое')
+        self.assertEqual(self.calls, 0)
+
+        cache.delete('key:lock')
+        value = get_or_refresh(cache, 'key', 20, self.compute)
+        self.assertEqual(value, 'значение 1')
+        self.assertIsNone(cache.get('key:lock'))
+
+    def test_cold_key_computed_once(self):
+        # Потоки не видят транзакцию теста, поэтому кэш — в памяти.
+        shared = LocMemCache('race', {})
+        start = threading.Barrier(2)
+        results = []
+
+        def slow():
+            time.sleep(0.2)
+            return self.compute()
+
+        def call():
+            start.wait()
+            results.append(get_or_refresh(shared, 'key', 20, slow))
+
+        workers = [threading.Thread(target=call) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['значение 1', 'значение 1'])
+
+    def test_waiter_keeps_owner_lock(self):
+        cache.add('key:lock', True, 10)
+        value = get_or_refresh(cache, 'key', 20, self.compute, wait=0.1)
+        self.assertIsNone(value)
+        self.assertEqual(self.calls, 0)
+        self.assertTrue(cache.get('key:lock'))
+
+    def test_slow_compute_keeps_foreign_lock(self):
+        # Кэш в базе хранит срок с точностью до секунды, этот — точнее.
+        shared = LocMemCache('slow', {})
+
+        def slow():
+            # Блокировка истекла, и её взял другой воркер.
+            time.sleep(0.2)
+            self.assertTrue(shared.add('key:lock', 'чужая', 10))
+            return self.compute()
+
+        value = get_or_refresh(shared, 'key', 20, slow, lock_timeout=0.1)
+        self.assertEqual(value, 'значение 1')
+        self.assertEqual(shared.get('key:lock'), 'чужая')
+
+    def test_early_refresh_before_expiry(self):
+        # Пересчёт «длится» час, поэтому XFetch обновит ключ заранее.
+        cache.set('key', ('старое', 3600, time.time() + 5), 60)
+        with mock.patch('core.cache.random.random', return_value=0.5):
+            value = get_or_refresh(cache, 'key', 20, self.compute)
+        self.assertEqual(value, 'значение 1')
+
+    def test_pagecache_tag(self):
+        template = Template(
+            '{% load soft_cache %}'
+            '{% pagecache %}{{ name }}{% endpagecache %}')
+        request = HttpRequest()
+        self.assertEqual(
+            template.render(Context({'name': 'a', 'request': request})), 'a')
+        self.assertEqual(
+            template.render(Context({'name': 'b', 'request': request})), 'b')
+
+        request.page_cache_key = 'page'
+        self.assertEqual(
+            template.render(Context({'name': 'a', 'request': request})), 'a')
+        self.assertEqual(
+            template.render(Context({'name': 'b', 'request': request})), 'a')
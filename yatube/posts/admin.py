@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Post, Group
+from . import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -9,6 +10,12 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%…%' по всей таблице ищем по индексу FTS5.
+        if not search.match_expression(search_term):
+            return queryset, False
+        return search.matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     prepopulated_fields = {'slug': ('title',)}
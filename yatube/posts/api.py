@@ -0,0 +1,283 @@
+"""JSON API только для чтения: ленты, пачка постов по id, комментарии.
+
+Ленты листаются курсором (?after=/?before=, как в HTML; битый курсор —
+ошибка 400, а не первая страница), ?limit=
+задаёт размер страницы. ?fields=id,text,author выбирает поля поста:
+каждое поле знает свои колонки, и выборка получает .only() ровно по
+ним (плюс pub_date и id для курсора). Ответ собирается из словарей
+без шаблонов. Валидаторы для условных GET те же, что у HTML-страниц
+(conditional.py), с двумя добавками: comments_count меняется без
+версий лент, поэтому он не входит в поля по умолчанию, а запросивший
+его ответ зависит ещё и от версии comments; пачка ?ids= зависит от
+версий своих постов и их авторов.
+"""
+from functools import wraps
+from operator import attrgetter
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+
+from . import conditional, selectors, threads
+from .conditional import feed_condition
+from .counters import author_stats
+from .models import Group, Post
+from .paginators import CursorPaginator, decode_cursor
+
+User = get_user_model()
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+MAX_IDS = 100
+CURSOR_FIELDS = ('id', 'pub_date')
+COMMENTS_PER_PAGE = 20
+
+
+def _image_url(post):
+    return post.image.url if post.image else None
+
+
+def _group_slug(post):
+    return post.group.slug if post.group_id is not None else None
+
+
+# Поле ответа: колонки для .only() и как достать значение из поста.
+FIELDS = {
+    'id': (('id',), attrgetter('id')),
+    'text': (('text',), attrgetter('text')),
+    'pub_date': (('pub_date',), attrgetter('pub_date')),
+    'image': (('image',), _image_url),
+    'author': (('author', 'author__username'), attrgetter('author.username')),
+    'group': (('group', 'group__slug'), _group_slug),
+    'comments_count': (('comments_count',), attrgetter('comments_count')),
+    'updated_at': (('updated_at',), attrgetter('updated_at')),
+}
+RELATED = ('author', 'group')
+DEFAULT_FIELDS = tuple(name for name in FIELDS if name != 'comments_count')
+
+
+def parse_fields(value):
+    """Поля из ?fields= в порядке запроса; ValueError для неизвестных."""
+    if not value:
+        return DEFAULT_FIELDS
+    fields = tuple(dict.fromkeys(
+        name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(', '.join(unknown))
+    return fields
+
+
+def parse_limit(value):
+    try:
+        limit = int(value or DEFAULT_LIMIT)
+    except ValueError:
+        limit = DEFAULT_LIMIT
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def parse_ids(value):
+    ids = []
+    for part in value.split(','):
+        part = part.strip()
+        if not part.isdigit():
+            raise ValueError(part)
+        ids.append(int(part))
+    return list(dict.fromkeys(ids))[:MAX_IDS]
+
+
+def invalid_cursor(request, names=('after', 'before')):
+    """Имя параметра с непустым, но нераспознанным курсором."""
+    for name in names:
+        value = request.GET.get(name)
+        if value and decode_cursor(value) is None:
+            return name
+    return None
+
+
+def api_scopes(scopes):
+    """scopes страницы плюс версия comments, если просили
+    comments_count."""
+    def wrapper(request, **kwargs):
+        found = scopes(request, **kwargs)
+        try:
+            fields = parse_fields(request.GET.get('fields'))
+        except ValueError:
+            return found
+        if 'comments_count' in fields:
+            found = [*found, 'comments']
+        return found
+    return wrapper
+
+
+def posts_scopes(request, **kwargs):
+    try:
+        ids = parse_ids(request.GET['ids'])
+    except (KeyError, ValueError):
+        # Без ?ids= — главная лента; с неверным ответит 400 сам view.
+        return conditional.index_scopes(request, **kwargs)
+    # Имя автора — поле по умолчанию, а его смена версии постов не
+    # трогает: авторы пачки читаются одним запросом по первичным ключам.
+    usernames = Post.objects.filter(pk__in=ids).order_by().values_list(
+        'author__username', flat=True).distinct()
+    return ([f'post:{pk}' for pk in ids]
+            + [f'author:{username}' for username in usernames])
+
+
+def projected(queryset, fields):
+    """Выборка постов только с колонками полей fields."""
+    columns = set(CURSOR_FIELDS)
+    for name in fields:
+        columns.update(FIELDS[name][0])
+    related = [name for name in RELATED if name in fields]
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*columns)
+
+
+def serialize(posts, fields):
+    getters = [(name, FIELDS[name][1]) for name in fields]
+    return [{name: get(post) for name, get in getters} for post in posts]
+
+
+def serialize_comments(comments):
+    return [{
+        'id': comment.pk,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+        'more_replies': getattr(comment, 'replies_cursor', None),
+    } for comment in comments]
+
+
+def error(message, status=400):
+    return JsonResponse({'error': message}, status=status)
+
+
+def api_login_required(view):
+    """Как login_required, но вместо редиректа на вход отвечает 401."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return error('Нужно войти', status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def feed_response(request, queryset, keys=('pub_date', 'id'), load=None,
+                  **extra):
+    """Страница ленты по курсору.
+
+    Если лента — не посты, а ключи к ним (keys=('pub_date', 'post_id')),
+    load(page) возвращает id постов, и они читаются одним запросом.
+    """
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as unknown:
+        return error(f'Неизвестные поля: {unknown}')
+    wrong = invalid_cursor(request)
+    if wrong is not None:
+        return error(f'Неверный курсор: {wrong}')
+    if load is None:
+        queryset = projected(queryset, fields)
+    paginator = CursorPaginator(
+        queryset, parse_limit(request.GET.get('limit')), keys=keys)
+    page = paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    posts = page
+    if load is not None:
+        ids = load(page)
+        found = projected(Post.objects.all(), fields).in_bulk(ids)
+        posts = [found[pk] for pk in ids if pk in found]
+    return JsonResponse(dict(
+        extra,
+        results=serialize(posts, fields),
+        next=page.next_cursor,
+        previous=page.previous_cursor,
+    ))
+
+
+@require_safe
+@feed_condition(api_scopes(posts_scopes))
+def posts(request):
+    """Главная лента или, с ?ids=1,2,3, пачка постов одним запросом
+    в порядке ids (несуществующие пропускаются)."""
+    if 'ids' not in request.GET:
+        return feed_response(request, Post.objects.all())
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        ids = parse_ids(request.GET['ids'])
+    except ValueError as wrong:
+        return error(f'Неверный параметр: {wrong}')
+    found = projected(Post.objects.all(), fields).in_bulk(ids)
+    return JsonResponse({
+        'results': serialize((found[pk] for pk in ids if pk in found),
+                             fields),
+    })
+
+
+@require_safe
+@feed_condition(api_scopes(conditional.group_scopes))
+def group_posts(request, slug):
+    group = Group.objects.filter(slug=slug).first()
+    if group is None:
+        return error('Группа не найдена', status=404)
+    return feed_response(
+        request, Post.objects.filter(group=group),
+        group={'slug': group.slug, 'title': group.title,
+               'description': group.description})
+
+
+@require_safe
+@feed_condition(api_scopes(conditional.profile_scopes))
+def profile_posts(request, username):
+    author = User.objects.filter(username=username).first()
+    if author is None:
+        return error('Автор не найден', status=404)
+    stats = author_stats(author)
+    return feed_response(
+        request, Post.objects.filter(author=author),
+        author={'username': author.username,
+                'full_name': author.get_full_name(),
+                'posts_count': stats.posts_count,
+                'followers_count': stats.followers_count,
+                'following_count': stats.following_count})
+
+
+@require_safe
+@api_login_required
+@feed_condition(api_scopes(conditional.follow_scopes))
+def follow_posts(request):
+    return feed_response(
+        request, selectors.follow_entries(request.user),
+        keys=('pub_date', 'post_id'),
+        load=lambda page: [entry.post_id for entry in page])
+
+
+@require_safe
+@feed_condition(conditional.post_scopes)
+def post_comments(request, post_id):
+    """Страница веток или, с ?replies=<курсор ответа>, следующие
+    ответы ветки (курсор — more_replies последнего показанного)."""
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден', status=404)
+    if 'replies' in request.GET:
+        comments = threads.replies_page(post_id, request.GET['replies'])
+        if comments is None:
+            return error('Неверный курсор')
+        return JsonResponse({
+            'results': serialize_comments(comments),
+            'next': None,
+        })
+    if invalid_cursor(request, ('after',)) is not None:
+        return error('Неверный курсор: after')
+    comments = threads.thread_page(
+        post_id, COMMENTS_PER_PAGE, after=request.GET.get('after'))
+    return JsonResponse({
+        'results': serialize_comments(comments),
+        'next': comments.next_cursor,
+    })
@@ -0,0 +1,209 @@
+"""Автодополнение авторов и групп по префиксу без запросов к базе.
+
+Индекс — отсортированный список ключей (строка в нижнем регистре,
+вид, id) в памяти процесса. Все ключи с нужным префиксом лежат в нём
+подряд, поэтому поиск — это bisect и короткий проход по соседям.
+Вставка и удаление тоже идут через bisect.
+
+Список строится из базы при первом запросе, а дальше меняется сигналами
+сохранения и удаления пользователей и групп. Изменения из других
+процессов отслеживаются по своей версии в кэше (VERSION_KEY, отдельно
+от версий лент): её поднимает каждое изменение, а индекс сверяется
+с ней не чаще, чем раз в AUTOCOMPLETE_REFRESH_INTERVAL секунд, и при
+расхождении перестраивается целиком. Перестройка идёт вне блокировки
+поиска; готовый индекс подменяет старый за одно присваивание.
+"""
+import time
+from bisect import bisect_left, insort
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.urls import NoReverseMatch, reverse
+
+from .models import Group
+from .versions import bump_version, get_version
+
+User = get_user_model()
+
+VERSION_KEY = 'autocomplete_version'
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+DEFAULT_REFRESH_INTERVAL = 5
+
+USER = 'user'
+GROUP = 'group'
+
+
+def refresh_interval():
+    return getattr(settings, 'AUTOCOMPLETE_REFRESH_INTERVAL',
+                   DEFAULT_REFRESH_INTERVAL)
+
+
+def normalize(text):
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def user_entry(user):
+    """Ключи и то, что отдаётся клиенту, для пользователя."""
+    full_name = f'{user.first_name} {user.last_name}'.strip()
+    keys = {normalize(user.username), normalize(full_name),
+            normalize(user.last_name)}
+    item = {
+        'type': USER,
+        'value': user.username,
+        'label': full_name or user.username,
+    }
+    return keys, item
+
+
+def group_entry(group):
+    keys = {normalize(group.slug), normalize(group.title)}
+    item = {
+        'type': GROUP,
+        'value': group.slug,
+        'label': group.title,
+    }
+    return keys, item
+
+
+URL_NAMES = {USER: 'posts:profile', GROUP: 'posts:group_posts'}
+
+
+def with_url(item):
+    """Копия записи со ссылкой на профиль или группу. Slug, заведённый
+    в обход формы, может не подойти под URL — тогда ссылки нет."""
+    try:
+        url = reverse(URL_NAMES[item['type']], args=[item['value']])
+    except NoReverseMatch:
+        url = None
+    return dict(item, url=url)
+
+
+def build():
+    """Записи и отсортированные ключи всех пользователей и групп."""
+    items = {}
+    users = User.objects.only(
+        'username', 'first_name', 'last_name').order_by()
+    for user in users.iterator():
+        items[USER, user.pk] = user_entry(user)
+    for group in Group.objects.only('slug', 'title').order_by():
+        items[GROUP, group.pk] = group_entry(group)
+    keys = sorted(
+        (key, kind, pk)
+        for (kind, pk), (keys, _) in items.items()
+        for key in keys if key)
+    return keys, items
+
+
+def index_version():
+    return get_version(VERSION_KEY)
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = Lock()
+        self._load_lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """Забывает содержимое: следующий поиск прочитает базу."""
+        self._keys = []
+        self._items = {}
+        self._loaded = False
+        self._version = None
+        self._checked_at = 0.0
+        self._changes = 0
+
+    def _load(self):
+        """Строит индекс заново без общей блокировки и подменяет его
+        целиком. Пока строится, поиск идёт по прежнему индексу."""
+        version = index_version()
+        changes = self._changes
+        keys, items = build()
+        with self._lock:
+            self._keys, self._items = keys, items
+            self._version = version
+            self._loaded = True
+            # Правки, пришедшие во время сборки, могли в неё не попасть:
+            # их версия новее, и следующий поиск сверится с ней сразу.
+            self._checked_at = (
+                time.monotonic() if changes == self._changes else 0.0)
+
+    def _ensure_fresh(self):
+        if self._loaded:
+            now = time.monotonic()
+            if now - self._checked_at < refresh_interval():
+                return
+            self._checked_at = now
+            if index_version() == self._version:
+                return
+            # Индекс уже есть: перестраивает его один поток, остальные
+            # пока ищут по старому.
+            if not self._load_lock.acquire(blocking=False):
+                return
+        else:
+            self._load_lock.acquire()
+            if self._loaded:
+                self._load_lock.release()
+                return
+        try:
+            self._load()
+        finally:
+            self._load_lock.release()
+
+    def _remove(self, kind, pk):
+        keys, _ = self._items.pop((kind, pk), (set(), None))
+        for key in keys:
+            position = bisect_left(self._keys, (key, kind, pk))
+            if (position < len(self._keys)
+                    and self._keys[position] == (key, kind, pk)):
+                del self._keys[position]
+
+    def _changed(self, kind, pk, entry=None):
+        version = bump_version(VERSION_KEY)
+        with self._lock:
+            self._changes += 1
+            if not self._loaded:
+                return
+            self._remove(kind, pk)
+            if entry is not None:
+                self._items[kind, pk] = entry
+                for key in entry[0]:
+                    if key:
+                        insort(self._keys, (key, kind, pk))
+            # Если версию успел поднять кто-то ещё, при следующей
+            # сверке индекс перестроится.
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def update(self, kind, pk, entry):
+        self._changed(kind, pk, entry)
+
+    def remove(self, kind, pk):
+        self._changed(kind, pk)
+
+    def search(self, prefix, limit=DEFAULT_LIMIT):
+        """До limit записей, у которых какой-то ключ начинается
+        с prefix, по порядку ключей."""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        self._ensure_fresh()
+        with self._lock:
+            found = []
+            seen = set()
+            keys = self._keys
+            position = bisect_left(keys, (prefix,))
+            while position < len(keys) and len(found) < limit:
+                key, kind, pk = keys[position]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    found.append(self._items[kind, pk][1])
+                position += 1
+            return found
+
+
+index = PrefixIndex()
@@ -0,0 +1,116 @@
+"""Счётчики ссылок на файлы картинок и сборка мусора.
+
+Одинаковые загрузки получают один и тот же файл (см. storage.py),
+поэтому удалять файл вместе с постом нельзя. Вместо этого у каждого
+файла есть счётчик постов, которые на него ссылаются: он меняется
+атомарно при сохранении и удалении постов, а collect() удаляет файлы
+без ссылок вместе с их миниатюрами.
+
+Загрузка тех же байтов может прийти, пока сборщик удаляет файл.
+Поэтому storage сначала отмечает файл через touch() (заново заводя
+строку Blob, если сборщик её уже удалил) и только потом проверяет,
+есть ли он на диске, а collect() сначала переносит файл в корзину,
+потом проверяет, не понадобился ли он снова, и тогда возвращает его.
+"""
+import os
+from datetime import timedelta
+
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Blob, Post
+from .storage import post_image_storage
+
+
+def acquire(name):
+    if not name:
+        return
+    Blob.objects.get_or_create(name=name)
+    Blob.objects.filter(name=name).update(
+        refs=F('refs') + 1, updated=timezone.now())
+
+
+def release(name):
+    if not name:
+        return
+    Blob.objects.filter(name=name, refs__gte=1).update(
+        refs=F('refs') - 1, updated=timezone.now())
+
+
+TRASH_DIR = 'trash'
+
+
+def touch(name):
+    """Отмечает, что файл только что понадобился новой загрузке,
+    чтобы сборщик не удалил его до того, как пост сохранится."""
+    blob, created = Blob.objects.get_or_create(name=name)
+    if not created:
+        Blob.objects.filter(name=name).update(updated=timezone.now())
+
+
+def replace(old_name, new_name):
+    if old_name != new_name:
+        acquire(new_name)
+        release(old_name)
+
+
+def recount():
+    """Пересчитывает ссылки по таблице постов."""
+    totals = dict(
+        Post.objects.exclude(image='').order_by().values(
+            'image').annotate(total=Count('pk')).values_list(
+            'image', 'total'))
+    Blob.objects.bulk_create(
+        (Blob(name=name) for name in totals), ignore_conflicts=True)
+    Blob.objects.exclude(name__in=totals).update(refs=0)
+    for name, total in totals.items():
+        Blob.objects.filter(name=name).exclude(refs=total).update(
+            refs=total)
+
+
+def collect(grace=timedelta(hours=1), dry_run=False):
+    """Удаляет файлы без ссылок, не менявшиеся дольше grace.
+
+    Возвращает список удалённых имён.
+    """
+    from sorl.thumbnail import delete as delete_with_thumbnails
+    from sorl.thumbnail.images import ImageFile
+
+    deadline = timezone.now() - grace
+    removed = []
+    for blob in Blob.objects.filter(refs=0, updated__lt=deadline):
+        # Ссылку мог добавить пост, сохранённый в обход счётчика.
+        if Post.objects.filter(image=blob.name).exists():
+            continue
+        if not dry_run:
+            deleted, _ = Blob.objects.filter(
+                name=blob.name, refs=0, updated__lt=deadline).delete()
+            if not deleted or not _discard_file(blob.name):
+                continue
+            delete_with_thumbnails(
+                ImageFile(blob.name, post_image_storage), delete_file=False)
+        removed.append(blob.name)
+    return removed
+
+
+def _discard_file(name):
+    """Удаляет файл, если он не понадобился снова. Возвращает успех.
+
+    Файл сначала атомарно уходит в корзину: загрузка, которая проверит
+    его после этого, запишет файл заново. Затем смотрим, не завела ли
+    загрузка (touch) или пост строку снова, пока мы удаляли свою.
+    """
+    path = post_image_storage.path(name)
+    trash = post_image_storage.path(os.path.join(TRASH_DIR, name))
+    os.makedirs(os.path.dirname(trash), exist_ok=True)
+    try:
+        os.replace(path, trash)
+    except FileNotFoundError:
+        return True
+    needed = (Blob.objects.filter(name=name).exists()
+              or Post.objects.filter(image=name).exists())
+    if needed and not os.path.exists(path):
+        os.replace(trash, path)
+    else:
+        os.remove(trash)
+    return not needed
@@ -0,0 +1,115 @@
+"""Условные GET для лент и страницы поста.
+
+Валидаторы строятся из версий лент в кэше (см. versions.py), которые
+поднимают сигналы при любом изменении, влияющем на страницу, и из
+времени последнего такого изменения. Страница зависит только от своих
+лент: группа — от group:<slug>, профиль — от author:<username>, пост —
+от post:<id>, автора и группы; главная версия index нужна только
+главной и ленте подписок. К базе обращается лишь страница поста —
+узнать его автора и группу.
+Совпал If-None-Match или страница не менялась с If-Modified-Since —
+view не выполняется, клиент получает 304.
+
+Лента подписок персональная; остальные страницы общие (pages.py), но
+их валидаторы всё равно строятся для каждого пользователя, как и для
+ленты подписок. Поэтому в ETag входят id пользователя и ключ сессии
+(при входе меняется и он, и CSRF-cookie), Last-Modified отдаётся
+только анонимам, а ответ помечается Vary: Cookie.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Post
+from .versions import scope_states
+
+
+def index_scopes(request, **kwargs):
+    return ['index']
+
+
+def group_scopes(request, slug, **kwargs):
+    return [f'group:{slug}']
+
+
+def profile_scopes(request, username, **kwargs):
+    return [f'author:{username}']
+
+
+def post_scopes(request, post_id, **kwargs):
+    """На странице поста есть имя и число постов автора и название
+    группы, поэтому она зависит и от их лент. Автор и группа поста
+    читаются одним запросом по первичному ключу."""
+    scopes = [f'post:{post_id}']
+    found = Post.objects.filter(pk=post_id).order_by().values_list(
+        'author__username', 'group__slug').first()
+    if found is not None:
+        username, slug = found
+        scopes.append(f'author:{username}')
+        if slug is not None:
+            scopes.append(f'group:{slug}')
+    return scopes
+
+
+def follow_scopes(request, **kwargs):
+    # Лента подписок — выборка из главной: новый пост любого автора
+    # может в неё попасть.
+    return ['index', f'follow:{request.user.pk}']
+
+
+def feed_states(request, scopes, kwargs):
+    """Версии и время изменения лент страницы.
+
+    Их читают и валидаторы, и общий кэш страниц (pages.py): кэш
+    опрашивается один раз на запрос.
+    """
+    cached = getattr(request, '_feed_states', None)
+    if cached is None:
+        cached = request._feed_states = scope_states(
+            scopes(request, **kwargs))
+    return cached
+
+
+def _etag(scopes):
+    def etag(request, *args, **kwargs):
+        parts = [request.get_full_path(), str(request.user.pk or 0),
+                 request.session.session_key or '']
+        parts += [str(version) for version, _ in
+                  feed_states(request, scopes, kwargs)]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+    return etag
+
+
+def _last_modified(scopes):
+    def last_modified(request, *args, **kwargs):
+        # Время изменения общее для всех, а страница вошедшего
+        # пользователя своя: ему хватит ETag.
+        if request.user.is_authenticated:
+            return None
+        changed = max(at for _, at in feed_states(request, scopes, kwargs))
+        return datetime.fromtimestamp(changed, timezone.utc)
+    return last_modified
+
+
+def feed_condition(scopes):
+    """Декоратор view: 304 по ETag и Last-Modified лент из scopes.
+
+    scopes(request, **kwargs) возвращает список лент, от которых
+    зависит страница.
+    """
+    def decorator(view):
+        conditional = condition(
+            etag_func=_etag(scopes),
+            last_modified_func=_last_modified(scopes),
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = conditional(request, *args, **kwargs)
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        return wrapper
+    return decorator
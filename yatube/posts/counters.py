@@ -0,0 +1,70 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Счётчики меняются атомарным UPDATE ... SET x = x + 1 при записи,
+а команда recount пересчитывает их по базе, если они разошлись.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def recount_authors(users=None):
+    """Пересчитывает счётчики авторов (по умолчанию — всех)."""
+    users = User.objects.all() if users is None else users
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk)
+         for pk in users.values_list('pk', flat=True)),
+        ignore_conflicts=True
+    )
+    AuthorStats.objects.filter(user__in=users).update(
+        posts_count=_count_subquery(Post.objects.all(), 'author'),
+        followers_count=_count_subquery(Follow.objects.all(), 'author'),
+        following_count=_count_subquery(Follow.objects.all(), 'user'),
+    )
+
+
+def recount_comments(posts=None):
+    """Пересчитывает счётчики комментариев постов."""
+    posts = Post.objects.all() if posts is None else posts
+    posts.update(
+        comments_count=_count_subquery(Comment.objects.all(), 'post'))
+
+
+def change_author(user_id, field, delta):
+    """Атомарно сдвигает счётчик автора на delta.
+
+    Если строки счётчиков ещё нет, её посчитает author_stats при
+    первом чтении.
+    """
+    stats = AuthorStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    stats.update(**{field: F(field) + delta})
+
+
+def change_comments(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+def author_stats(user):
+    """Счётчики автора, при необходимости посчитанные заново."""
+    try:
+        return AuthorStats.objects.get(user=user)
+    except AuthorStats.DoesNotExist:
+        recount_authors(User.objects.filter(pk=user.pk))
+        return AuthorStats.objects.get(user=user)
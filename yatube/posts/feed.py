@@ -0,0 +1,120 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается в FeedEntry всем подписчикам
+автора, при подписке лента дополняется постами автора, при отписке —
+очищается от них. Чтение ленты — один диапазонный скан по индексу.
+
+Публикация ленты не подрезает: у популярного автора это был бы запрос
+на каждого подписчика. Ленты длиннее feed_max_length() обрезает
+rebuild_feed --trim-only, его запускают по расписанию; до тех пор
+лишние старые записи только занимают место, читается лента
+по курсору сверху.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+
+
+def feed_max_length():
+    return getattr(settings, 'FEED_MAX_LENGTH', 1000)
+
+
+def fan_out(post):
+    """Добавляет пост в ленты всех подписчиков его автора одной
+    вставкой."""
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in follower_ids),
+        ignore_conflicts=True
+    )
+
+
+def estimate_length(user_id):
+    """Примерная длина ленты по счётчикам постов авторов из подписок.
+
+    Лента подрезается до feed_max_length(), а посты, вышедшие до
+    подписки, в неё добавляет backfill, так что сумма счётчиков
+    расходится с ней разве что после ручных правок.
+    """
+    total = AuthorStats.objects.filter(
+        user__following__user_id=user_id
+    ).aggregate(total=Sum('posts_count'))['total']
+    return min(total or 0, feed_max_length())
+
+
+def backfill(user_id, author_id, limit=None):
+    """Дополняет ленту пользователя последними постами автора."""
+    limit = limit or feed_max_length()
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:limit]
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts),
+        ignore_conflicts=True
+    )
+    # Подписка может удвоить ленту: подрезаем сразу, она одна.
+    trim(user_id, limit)
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты пользователя посты автора."""
+    FeedEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def trim(user_id, limit=None):
+    """Оставляет в ленте пользователя только limit последних записей."""
+    limit = limit or feed_max_length()
+    entries = FeedEntry.objects.filter(user_id=user_id)
+    cutoff = entries.order_by('-pub_date', '-post_id').values_list(
+        'pub_date', 'post_id'
+    )[limit:limit + 1]
+    for pub_date, post_id in cutoff:
+        entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, post_id__lte=post_id)
+        ).delete()
+
+
+def overflowing(limit=None):
+    """id пользователей, чьи ленты длиннее limit записей."""
+    limit = limit or feed_max_length()
+    return FeedEntry.objects.order_by().values('user_id').annotate(
+        length=Count('id')).filter(length__gt=limit).values_list(
+        'user_id', flat=True)
+
+
+def rebuild(user_id, limit=None):
+    """Пересобирает ленту пользователя по его подпискам с нуля.
+
+    Удаление и вставка идут одной транзакцией: читатель не увидит
+    пустую ленту посреди пересборки.
+    """
+    limit = limit or feed_max_length()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).order_by('-pub_date', '-id').values_list('id', 'pub_date')[:limit]
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        FeedEntry.objects.bulk_create(
+            FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        )
+
+
+def drop_orphans():
+    """Удаляет ленты пользователей, у которых не осталось подписок.
+
+    rebuild обходит только тех, кто на кого-то подписан, такие ленты
+    он не видит.
+    """
+    FeedEntry.objects.exclude(
+        user_id__in=Follow.objects.values('user_id')
+    ).delete()
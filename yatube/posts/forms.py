@@ -1,8 +1,45 @@
-from django.forms import ModelForm
+from django.forms import ModelForm, ValidationError
 from .models import Post, Comment
+from . import images, threads, uploads
 
 
 class PostForm(ModelForm):
+    def __init__(self, *args, upload=None, too_large=(), **kwargs):
+        """upload — завершённая загрузка по частям (см. uploads.py),
+        она заменяет файл из поля image; too_large — поля, загрузку
+        которых оборвали по размеру (uploads.too_large)."""
+        super().__init__(*args, **kwargs)
+        self.upload = upload
+        self.too_large = too_large
+
+    def clean_image(self):
+        """Новую картинку небольшого размера обрабатывает сразу,
+        крупную оставляет пулу миниатюр (см. images.py)."""
+        image = self.cleaned_data.get('image')
+        if self.upload is not None:
+            image = uploads.open_file(self.upload)
+        elif 'image' not in self.changed_data:
+            return image
+        self.instance.image_original_size = image.size if image else None
+        self.instance.image_size = None
+        if not image or image.size > images.inline_limit():
+            return image
+        try:
+            stored = images.normalize(image)
+        except (OSError, ValueError):
+            raise ValidationError('Не удалось обработать картинку')
+        self.instance.image_size = stored.size
+        return stored
+
+    def clean(self):
+        # Обработчик загрузки обрывает файл сверх лимита, и в форму он
+        # не попадает: вместо «поле пустое» показываем настоящую
+        # причину.
+        if 'image' in self.too_large:
+            self.errors.pop('image', None)
+            self.add_error('image', 'Картинка слишком большая')
+        return super().clean()
+
     class Meta:
         model = Post
         fields = ['text', 'group', 'image']
@@ -14,6 +51,12 @@ class PostForm(ModelForm):
 
 
 class CommentForm(ModelForm):
+    def __init__(self, *args, parent=None, **kwargs):
+        """parent — комментарий, на который пишется ответ. Слишком
+        глубокий ответ прикрепляется выше (см. threads.py)."""
+        super().__init__(*args, **kwargs)
+        self.instance.parent = threads.attach_parent(parent)
+
     class Meta:
         model = Comment
         fields = ['text', ]
@@ -0,0 +1,112 @@
+"""Персональные места страниц: меню в шапке, вкладки лент, кнопка
+подписки, ссылка на редактирование, формы комментариев.
+
+На общей странице из кэша (pages.py) вместо фрагмента стоит заглушка
+с вариантом для анонима, а static/js/fragments.js забирает настоящие
+фрагменты одним запросом к /fragments/. На остальных страницах тег
+{% fragment %} рендерит их сразу, как обычный include.
+
+Фрагмент называется строкой «имя:аргумент:...», например
+follow:leo или reply:12. Одинаковые места страницы — формы ответа под
+каждым комментарием поста — это один фрагмент: он приходит один раз,
+а id комментария форма берёт у своего места (data-comment).
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+
+from .forms import CommentForm
+from .models import Follow, Post
+
+SEPARATOR = ':'
+MAX_NAMES = 100
+
+registry = {}
+
+
+def fragment(name, template):
+    """Регистрирует функцию контекста фрагмента.
+
+    Функция получает пользователя и аргументы из имени (строки) и
+    для анонима не должна ходить в базу: её вызывают при рендере
+    заглушки.
+    """
+    def decorator(func):
+        registry[name] = (template, func)
+        return func
+    return decorator
+
+
+@fragment('nav', 'posts/fragments/nav.html')
+def nav(user):
+    return {}
+
+
+@fragment('switcher', 'posts/includes/switcher.html')
+def switcher(user, active):
+    if active not in ('index', 'follow'):
+        raise ValueError(active)
+    return {active: True}
+
+
+@fragment('follow', 'posts/fragments/follow.html')
+def follow(user, username):
+    following = user.is_authenticated and Follow.objects.filter(
+        user=user, author__username=username).exists()
+    return {'username': username, 'following': following}
+
+
+@fragment('edit', 'posts/fragments/edit.html')
+def edit(user, post_id):
+    post_id = int(post_id)
+    can_edit = user.is_authenticated and Post.objects.filter(
+        pk=post_id, author=user).exists()
+    return {'post_id': post_id, 'can_edit': can_edit}
+
+
+@fragment('comment-form', 'posts/fragments/comment_form.html')
+def comment_form(user, post_id):
+    return {'post_id': int(post_id), 'form': CommentForm()}
+
+
+@fragment('reply', 'posts/fragments/reply.html')
+def reply(user, post_id):
+    return {'post_id': int(post_id)}
+
+
+def join(name, args):
+    return SEPARATOR.join([name, *map(str, args)])
+
+
+def resolve(key, user):
+    """Шаблон и контекст фрагмента по имени; None, если имя неверное."""
+    name, *args = key.split(SEPARATOR)
+    if name not in registry:
+        return None
+    template, func = registry[name]
+    try:
+        data = func(user, *args)
+    except (TypeError, ValueError):
+        return None
+    return template, dict(data, user=user)
+
+
+def render(key, request):
+    """Фрагмент для пользователя запроса (с CSRF-токеном в формах)."""
+    resolved = resolve(key, request.user)
+    if resolved is None:
+        return None
+    template, data = resolved
+    return render_to_string(template, data, request=request)
+
+
+def placeholder(name, args):
+    """Заглушка на общей странице: вариант фрагмента для анонима.
+
+    display: contents — чтобы обёртка не влияла на вёрстку.
+    """
+    key = join(name, args)
+    template, data = resolve(key, AnonymousUser())
+    return format_html(
+        '<div data-fragment="{}" style="display: contents">{}</div>',
+        key, render_to_string(template, data))
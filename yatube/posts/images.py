@@ -0,0 +1,90 @@
+"""Приведение загруженных картинок к виду, в котором их стоит хранить.
+
+Фото с камеры весят мегабайты и хранят EXIF (в том числе геометку и
+поворот). При загрузке картинка поворачивается по EXIF, уменьшается
+до POST_IMAGE_MAX_SIZE, теряет метаданные и пересжимается в
+прогрессивный JPEG с качеством POST_IMAGE_QUALITY. Небольшие файлы
+обрабатываются прямо в форме, крупные сохраняются как есть и
+обрабатываются в пуле процессов вместе с миниатюрами.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+
+def max_size():
+    return getattr(settings, 'POST_IMAGE_MAX_SIZE', (2048, 2048))
+
+
+def quality():
+    return getattr(settings, 'POST_IMAGE_QUALITY', 85)
+
+
+def inline_limit():
+    """Файлы не больше этого размера (в байтах) обрабатываются в форме."""
+    return getattr(settings, 'POST_IMAGE_INLINE_LIMIT', 1024 * 1024)
+
+
+def upload_max_size():
+    """Наибольший размер загружаемой картинки в байтах."""
+    return getattr(settings, 'POST_IMAGE_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+
+
+def normalize(file_):
+    """Возвращает ContentFile с обработанной картинкой в формате JPEG.
+
+    Имя сохраняется, меняется только расширение.
+    """
+    file_.seek(0)
+    with Image.open(file_) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size(), Image.LANCZOS)
+        if image.mode in ('RGBA', 'LA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        buffer = BytesIO()
+        # Без exif= метаданные в новый файл не попадают.
+        image.save(buffer, 'JPEG', quality=quality(), optimize=True,
+                   progressive=True)
+    name = os.path.splitext(os.path.basename(file_.name))[0] + '.jpg'
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def normalize_stored(post):
+    """Обрабатывает уже сохранённую картинку поста и заменяет файл.
+
+    Счётчики и ленты не трогаются: запись идёт через update(), а версии
+    страниц поднимает вызывающий (thumbnails.process_post). Возвращает
+    имя нового файла или None, если картинку поста уже заменили.
+    """
+    from . import blobs
+    from .models import Post
+
+    field = post.image
+    original_size = field.size
+    with field.open('rb') as source:
+        stored = normalize(source)
+    old_name = field.name
+    field.save(stored.name, stored, save=False)
+    # Пока файл пересжимался, пост могли сохранить с новой картинкой:
+    # её не трогаем, а на обработанный файл ссылки так и не появится,
+    # и его удалит сборщик.
+    updated = Post.objects.filter(pk=post.pk, image=old_name).update(
+        image=field.name,
+        image_original_size=original_size,
+        image_size=stored.size,
+        updated_at=timezone.now(),
+    )
+    if not updated:
+        return None
+    # Старый файл может быть нужен другим постам: удалит его сборщик.
+    blobs.replace(old_name, field.name)
+    return field.name
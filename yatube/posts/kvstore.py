@@ -0,0 +1,115 @@
+"""Хранилище ключей sorl-thumbnail с пакетной подгрузкой на запрос.
+
+Тег {% thumbnail %} ищет каждую миниатюру отдельным обращением к кэшу
+(а при промахе — к таблице thumbnail_kvstore). prefetch() заранее
+вычисляет ключи миниатюр для всех постов страницы и забирает их одним
+get_many и, для промахов, одним запросом к таблице. Найденное
+кладётся в память запроса, и теги дальше читают уже оттуда. Память
+очищается в начале каждого запроса (см. signals.py).
+"""
+from threading import local
+
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE, KVStore as CachedKVStore)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .thumbnails import THUMBNAILS
+
+_memo = local()
+
+
+def _values():
+    if not hasattr(_memo, 'values'):
+        _memo.values = {}
+    return _memo.values
+
+
+def clear_memo(**kwargs):
+    _memo.values = {}
+
+
+class KVStore(CachedKVStore):
+    """cached_db_kvstore, который сначала смотрит в память запроса."""
+
+    def _get_raw(self, key):
+        values = _values()
+        if key in values:
+            value = values[key]
+            return None if value == EMPTY_VALUE else value
+        return super()._get_raw(key)
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        values = _values()
+        if key in values:
+            values[key] = value
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        values = _values()
+        for key in keys:
+            values.pop(key, None)
+
+    def get_many_raw(self, keys):
+        """Значения по ключам: один get_many, для промахов — один SELECT."""
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            from_db = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            if from_db:
+                self.cache.set_many(
+                    from_db, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(from_db)
+        return found
+
+
+def thumbnail_file(file_, geometry, options):
+    """Файл миниатюры с тем именем, которое дал бы ей get_thumbnail."""
+    backend = default.backend
+    source = ImageFile(file_)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry, options),
+        default.storage)
+
+
+def thumbnail_key(file_, geometry, options):
+    """Ключ хранилища для миниатюры, как его считает get_thumbnail."""
+    return add_prefix(thumbnail_file(file_, geometry, options).key)
+
+
+def prefetch(posts):
+    """Подгружает записи миниатюр для постов страницы и возвращает posts.
+
+    Ключи, которых нет ни в кэше, ни в таблице, тоже запоминаются:
+    тег построит такую миниатюру сам, не делая лишних поисков.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, KVStore):
+        return posts
+    keys = [
+        thumbnail_key(post.image, geometry, options)
+        for post in posts if post.image
+        for geometry, options in THUMBNAILS
+    ]
+    values = _values()
+    keys = [key for key in keys if key not in values]
+    if keys:
+        found = kvstore.get_many_raw(keys)
+        for key in keys:
+            values[key] = found.get(key, EMPTY_VALUE)
+    return posts
@@ -0,0 +1,21 @@
+"""Общие помощники команд bench_*.
+
+Данные для замеров создаются в транзакции, которую откатывает
+исключение Rollback, время берётся лучшее из нескольких повторов.
+"""
+from time import perf_counter
+
+
+class Rollback(Exception):
+    pass
+
+
+def measure(func, repeat):
+    """Лучшее время одного вызова в миллисекундах."""
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        elapsed = (perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
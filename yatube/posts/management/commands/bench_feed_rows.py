@@ -0,0 +1,71 @@
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import selectors
+from posts.models import Group, Post
+from posts.rows import as_rows
+
+from ..bench import Rollback, measure
+
+User = get_user_model()
+
+
+def peak_memory(func):
+    """Пиковый объём памяти за один вызов в килобайтах."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает выборку ленты моделями и строками FeedRow: '
+            'время и пиковую память для страницы и для выгрузки. '
+            'Данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10)
+        parser.add_argument('--export', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                results = self.run(
+                    options['page'], options['export'], options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(
+            f'{"постов":>7} {"выборка":>8} {"мс":>8} {"КБ":>9}')
+        for size, kind, elapsed, memory in results:
+            self.stdout.write(
+                f'{size:>7} {kind:>8} {elapsed:>8.2f} {memory:>9.1f}')
+
+    def run(self, page, export, repeat):
+        author = User.objects.create_user(
+            username='bench_rows_author', first_name='Имя',
+            last_name='Фамилия')
+        group = Group.objects.create(
+            title='Группа', slug='bench-rows', description='')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=author, group=group,
+                 image=f'posts/{i}.jpg')
+            for i in range(export))
+        kinds = {
+            'модели': (selectors.feed_posts, list),
+            'строки': (selectors.feed_values, as_rows),
+        }
+        results = []
+        for size in (page, export):
+            for kind, (queryset, convert) in kinds.items():
+                def load():
+                    convert(queryset().filter(author=author)[:size])
+                results.append((size, kind, measure(load, repeat),
+                                peak_memory(load)))
+        return results
@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+
+from posts import feed, timelines
+from posts.models import FeedEntry, Follow, Post
+
+from ..bench import Rollback, measure
+
+User = get_user_model()
+
+PER_PAGE = 10
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает первую страницу ленты подписок: JOIN по '
+            'подпискам, материализованная таблица и слияние кэшированных '
+            'лент авторов. Данные создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--follows', type=int, nargs='+', default=[10, 100, 1000])
+        parser.add_argument('--posts-per-author', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"подписок":>9} {"join, мс":>10} {"таблица, мс":>12} '
+            f'{"слияние, мс":>12}')
+        for follows in options['follows']:
+            try:
+                with transaction.atomic():
+                    row = self.run(
+                        follows, options['posts_per_author'],
+                        options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+            self.stdout.write(
+                f'{follows:>9} {row[0]:>10.2f} {row[1]:>12.2f} '
+                f'{row[2]:>12.2f}')
+
+    def run(self, follows, posts_per_author, repeat):
+        reader = User.objects.create_user(username='bench_reader')
+        User.objects.bulk_create(
+            User(username=f'bench_author_{i}') for i in range(follows))
+        authors = list(User.objects.filter(
+            username__startswith='bench_author_'))
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=author)
+            for author in authors for i in range(posts_per_author))
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=author) for author in authors)
+        feed.rebuild(reader.pk)
+
+        def join():
+            list(Post.objects.filter(
+                author__following__user=reader
+            ).select_related('author', 'group')[:PER_PAGE])
+
+        def table():
+            [entry.post for entry in FeedEntry.objects.filter(
+                user=reader
+            ).select_related('post__author', 'post__group')[:PER_PAGE]]
+
+        def merge():
+            page = timelines.follow_page(reader, PER_PAGE)
+            assert page is not None, 'pull-лента ушла в запасной путь'
+
+        author_ids = [author.pk for author in authors]
+        cache.delete_many(
+            [timelines.TIMELINE_KEY.format(pk) for pk in author_ids])
+        # Порог поднимаем, чтобы слияние не уходило в таблицу, а первый
+        # вызов прогревает кэш лент авторов.
+        pull_limit = max(follows, timelines.pull_max_follows())
+        with override_settings(FOLLOW_FEED_PULL_MAX_FOLLOWS=pull_limit):
+            merge()
+            result = (measure(join, repeat), measure(table, repeat),
+                      measure(merge, repeat))
+        cache.delete_many(
+            [timelines.TIMELINE_KEY.format(pk) for pk in author_ids])
+        return result
@@ -0,0 +1,109 @@
+import random
+from itertools import accumulate
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import search
+from posts.models import Post
+
+from ..bench import Rollback, measure
+
+User = get_user_model()
+
+PER_PAGE = 10
+BATCH_SIZE = 10000
+VOCABULARY = 20000
+WORDS_PER_POST = 30
+
+
+def word(i):
+    """Детерминированное «слово» из русских слогов."""
+    syllables = ('ка', 'ло', 'ми', 'ну', 'ре', 'ста', 'вы', 'до', 'жи', 'те')
+    letters = []
+    while True:
+        i, rest = divmod(i, len(syllables))
+        letters.append(syllables[rest])
+        if not i:
+            return ''.join(letters)
+
+
+# На 200 тысячах постов (мс, первая страница):
+#
+#     запрос          LIKE    FTS5
+#     частое слово     0,7    11,5
+#     редкое слово    75,7     1,9
+#     два слова        1,4    12,4
+#     префикс          0,8    50,9
+#     нет совпадений 295,5     0,6
+#
+# На частых словах и префиксах LIKE быстрее только потому, что отдаёт
+# первые 10 новых совпадений без ранжирования, а FTS5 считает bm25 для
+# окна из SEARCH_RANK_WINDOW совпадений (и для префикса ещё сливает
+# списки всех подходящих слов). Это цена сортировки по релевантности;
+# чем реже совпадения, тем сильнее LIKE деградирует до полного скана.
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск первой страницы постов через LIKE и через '
+            'индекс FTS5. Посты создаются в транзакции и откатываются.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=17)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                results = self.run(
+                    options['posts'], options['repeat'], options['seed'])
+                raise Rollback
+        except Rollback:
+            pass
+        self.stdout.write(
+            f'{"запрос":>16} {"LIKE, мс":>10} {"FTS5, мс":>10}')
+        for query, like, fts in results:
+            self.stdout.write(f'{query:>16} {like:>10.2f} {fts:>10.2f}')
+
+    def run(self, total, repeat, seed):
+        rng = random.Random(seed)
+        words = [word(i) for i in range(VOCABULARY)]
+        # Частоты слов как в живом тексте: немногие встречаются почти
+        # везде, большинство — редко.
+        weights = list(accumulate(
+            1 / (rank + 1) for rank in range(VOCABULARY)))
+        author = User.objects.create_user(username='bench_search_author')
+        start = perf_counter()
+        for offset in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(author=author, text=' '.join(rng.choices(
+                    words, cum_weights=weights, k=WORDS_PER_POST)))
+                for _ in range(min(BATCH_SIZE, total - offset)))
+        self.stderr.write(
+            f'Создано постов: {total} за {perf_counter() - start:.1f} с')
+
+        queries = {
+            'частое слово': words[0],
+            'редкое слово': words[VOCABULARY - 1],
+            'два слова': f'{words[3]} {words[500]}',
+            'префикс': words[VOCABULARY // 2][:4],
+            'нет совпадений': 'ничего',
+        }
+        results = []
+        for label, query in queries.items():
+            def like():
+                posts = Post.objects.all()
+                for term in query.split():
+                    posts = posts.filter(text__icontains=term)
+                list(posts.order_by('-pub_date', '-id')[:PER_PAGE])
+
+            def fts():
+                list(search.SearchPaginator(
+                    query, PER_PAGE).get_cursor_page())
+
+            results.append(
+                (label, measure(like, repeat), measure(fts, repeat)))
+        return results
@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import uploads
+
+
+class Command(BaseCommand):
+    help = 'Удаляет брошенные загрузки по частям вместе с их файлами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int, default=24,
+            help='Удалять загрузки старше этого числа часов.')
+
+    def handle(self, *args, **options):
+        count = uploads.expire(timedelta(hours=options['hours']))
+        self.stdout.write(f'Удалено загрузок: {count}')
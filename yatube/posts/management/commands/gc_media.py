@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from posts import blobs
+
+
+class Command(BaseCommand):
+    help = ('Удаляет файлы картинок, на которые не ссылается ни один пост, '
+            'вместе с их миниатюрами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours', type=float, default=1,
+            help='Не трогать файлы, которые менялись недавно.')
+        parser.add_argument(
+            '--recount', action='store_true',
+            help='Сначала пересчитать ссылки по таблице постов.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            blobs.recount()
+        removed = blobs.collect(
+            timedelta(hours=options['grace_hours']),
+            dry_run=options['dry_run'])
+        for name in removed:
+            self.stdout.write(name)
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(f'{verb} файлов: {len(removed)}')
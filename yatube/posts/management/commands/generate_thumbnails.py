@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Строит миниатюры для картинок всех постов в пуле процессов. '
+            'Уже готовые миниатюры sorl находит в хранилище ключей и '
+            'не пересчитывает.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Число процессов (по умолчанию THUMBNAIL_WORKERS).')
+        parser.add_argument('--chunk-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').values_list(
+            'image', flat=True).order_by('pk').iterator()
+        workers = options['workers']
+        if workers is None:
+            workers = thumbnails.workers()
+        done = failed = 0
+        if workers:
+            pool = thumbnails.get_pool(workers)
+            results = pool.map(
+                thumbnails.try_generate, names,
+                chunksize=options['chunk_size'])
+        else:
+            results = map(thumbnails.try_generate, names)
+        for ok in results:
+            done += ok
+            failed += not ok
+        self.stdout.write(
+            f'Миниатюры построены для {done} картинок, ошибок: {failed}')
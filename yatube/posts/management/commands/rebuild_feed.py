@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает материализованные ленты подписок '
+            'и обрезает их до заданной длины.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-length', type=int, default=None,
+            help='Сколько записей хранить в ленте каждого пользователя '
+                 '(по умолчанию settings.FEED_MAX_LENGTH).'
+        )
+        parser.add_argument(
+            '--trim-only', action='store_true',
+            help='Только обрезать ленты, не пересобирая их. Публикация '
+                 'ленты не подрезает, поэтому команду с этим ключом '
+                 'запускают по расписанию.'
+        )
+
+    def handle(self, *args, **options):
+        limit = options['max_length'] or feed.feed_max_length()
+        if options['trim_only']:
+            for user_id in list(feed.overflowing(limit)):
+                feed.trim(user_id, limit)
+            self.stdout.write(self.style.SUCCESS(
+                f'Ленты обрезаны до {limit} записей.'))
+            return
+        feed.drop_orphans()
+        user_ids = Follow.objects.values_list(
+            'user_id', flat=True).distinct()
+        for user_id in user_ids.iterator():
+            feed.rebuild(user_id, limit)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны, длина не больше {limit} записей.'))
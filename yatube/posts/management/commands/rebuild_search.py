@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = ('Заново строит индекс полнотекстового поиска по постам '
+            'и восстанавливает его триггеры.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-optimize', action='store_true',
+            help='Не сливать сегменты индекса после перестройки.')
+
+    def handle(self, *args, **options):
+        search.rebuild(optimize=not options['no_optimize'])
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает по базе счётчики постов, подписчиков, подписок '
+            'и комментариев, если они разошлись с данными.')
+
+    def handle(self, *args, **options):
+        counters.recount_authors()
+        counters.recount_comments()
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
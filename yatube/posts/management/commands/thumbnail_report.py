@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand
+
+from posts import selectors, thumbnails
+from posts.rows import as_rows
+
+PER_PAGE = 10
+
+
+def pick(variants, width):
+    """Вариант, который браузер возьмёт из srcset для ширины width:
+    самый узкий не уже неё, иначе самый широкий."""
+    for variant in variants:
+        if variant[0] >= width:
+            return variant
+    return variants[-1]
+
+
+class Command(BaseCommand):
+    help = ('Считает, сколько байт картинок весит страница главной ленты '
+            'с прежним JPEG 960x339 и с вариантами из srcset для заданной '
+            'ширины экрана в пикселях. Недостающие варианты строятся.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=5)
+        parser.add_argument(
+            '--width', type=int, default=640,
+            help='Нужная ширина картинки в физических пикселях.')
+
+    def handle(self, *args, **options):
+        width = options['width']
+        preferred, *_, fallback = thumbnails.VARIANT_FORMATS
+        posts = as_rows(selectors.index_feed().exclude(image='').order_by(
+            '-pub_date', '-id')[:options['pages'] * PER_PAGE])
+        self.stdout.write(
+            f'{"страница":>8} {"было, КБ":>9} {"стало, КБ":>10} '
+            f'{"экономия, КБ":>13}')
+        total_before = total_after = 0
+        for start in range(0, len(posts), PER_PAGE):
+            before = after = 0
+            for post in posts[start:start + PER_PAGE]:
+                variants = thumbnails.variants(post.image)
+                legacy = variants[fallback][-1][2]
+                chosen = pick(variants[preferred], width)[2]
+                before += legacy.storage.size(legacy.name)
+                after += chosen.storage.size(chosen.name)
+            total_before += before
+            total_after += after
+            self.stdout.write(
+                f'{start // PER_PAGE + 1:>8} {before / 1024:>9.1f} '
+                f'{after / 1024:>10.1f} {(before - after) / 1024:>13.1f}')
+        if total_before:
+            self.stdout.write(
+                f'Итого экономия {(total_before - total_after) / 1024:.1f} '
+                f'КБ ({100 - 100 * total_after / total_before:.0f}%)')
@@ -0,0 +1,64 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    # По одному UPDATE на таблицу: построчно на больших таблицах это
+    # миллионы запросов.
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+
+    Post.objects.update(
+        comments_count=count_subquery(Comment.objects.all(), 'post'))
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk)
+         for pk in User.objects.values_list('pk', flat=True).iterator()),
+        batch_size=1000,
+    )
+    AuthorStats.objects.update(
+        posts_count=count_subquery(Post.objects.all(), 'author'),
+        followers_count=count_subquery(Follow.objects.all(), 'author'),
+        following_count=count_subquery(Follow.objects.all(), 'user'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(default=0)),
+                ('following_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 2.2.28 on 2026-10-18 18:44
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def fill_blobs(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Blob = apps.get_model('posts', 'Blob')
+    Blob.objects.bulk_create(
+        Blob(name=row['image'], refs=row['total'])
+        for row in Post.objects.exclude(image='').order_by().values(
+            'image').annotate(total=Count('pk'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Blob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refs', models.PositiveIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(fill_blobs, migrations.RunPython.noop),
+    ]
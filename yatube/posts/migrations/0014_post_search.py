@@ -0,0 +1,47 @@
+from django.db import migrations
+
+# Схема зафиксирована здесь, а не взята из posts/search.py: миграция
+# должна делать то же самое и после правок модуля.
+TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO posts_post_fts(posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_blobs'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=[
+                "CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts "
+                "USING fts5(text, content='posts_post', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+                *TRIGGERS,
+                "INSERT INTO posts_post_fts(posts_post_fts) "
+                "VALUES ('rebuild')",
+            ],
+            reverse_sql=[
+                'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+                'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+                'DROP TRIGGER IF EXISTS posts_post_fts_update',
+                'DROP TABLE IF EXISTS posts_post_fts',
+            ],
+        ),
+    ]
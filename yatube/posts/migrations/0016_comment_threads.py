@@ -0,0 +1,49 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_paths(apps, schema_editor):
+    # Все существующие комментарии — корни: путь из одного сегмента.
+    Comment = apps.get_model('posts', 'Comment')
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    for pk in Comment.objects.values_list('pk', flat=True).iterator():
+        number, segment = pk, ''
+        while number:
+            number, rest = divmod(number, 36)
+            segment = digits[rest] + segment
+        Comment.objects.filter(pk=pk).update(path=segment.rjust(8, '0'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_comment_post_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='posts.Comment'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'parent', '-created', '-id'], name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_path_idx'),
+        ),
+        migrations.RunPython(fill_paths, migrations.RunPython.noop),
+    ]
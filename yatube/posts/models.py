@@ -1,6 +1,10 @@
+import uuid
+
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
 
@@ -34,14 +38,35 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True
     )
+    # Размеры файла картинки в байтах: загруженного и сохранённого
+    # после обработки (см. images.py). Пока обработка не прошла,
+    # image_size пустой.
+    image_original_size = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    image_size = models.PositiveIntegerField(
+        null=True, blank=True, editable=False)
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # Время последней правки: входит в ключ кэша отрисованного поста
+    # (см. rendered.py). update() его не трогает, ставить вручную.
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы под курсорную пагинацию лент по ключу (pub_date, id).
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_feed_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_feed_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_feed_idx'),
+        ]
 
 
 class Comment(models.Model):
@@ -56,12 +81,33 @@ class Comment(models.Model):
         related_name='coments')
     text = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey(
+        'self',
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+        related_name='replies')
+    # Материализованный путь: id предков и самого комментария
+    # (см. threads.py). Ветка целиком — один диапазон по индексу.
+    path = models.CharField(max_length=255, blank=True, editable=False)
 
     def __str__(self):
         return self.text[:15]
 
+    @property
+    def depth(self):
+        from .threads import depth
+        return depth(self.path)
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # Курсорная пагинация корневых комментариев по (created, id).
+            models.Index(fields=['post', 'parent', '-created', '-id'],
+                         name='comment_thread_idx'),
+            models.Index(fields=['post', 'path'],
+                         name='comment_path_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -80,3 +126,83 @@ class Follow(models.Model):
             models.UniqueConstraint(
                 fields=['user', 'author'], name='unique follow')
         ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, обновляются при записи, чтобы не считать
+    COUNT(*) на каждом просмотре профиля."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'Счётчики {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя.
+
+    Заполняется при публикации поста (fan-out on write), поэтому
+    лента читается одним диапазонным сканом по индексу
+    (user, pub_date, post).
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries')
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique feed entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_entry_user_idx'),
+        ]
+
+
+class Upload(models.Model):
+    """Загрузка картинки по частям.
+
+    Байты копятся во временном файле (см. uploads.py), а здесь
+    хранится, сколько их уже принято, чтобы после обрыва связи
+    продолжить с того же места.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    received = models.PositiveIntegerField(default=0)
+    committed = models.BooleanField(default=False)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.size})'
+
+
+class Blob(models.Model):
+    """Файл картинки в хранилище по содержимому и число постов,
+    которые на него ссылаются. Файлы без ссылок удаляет команда
+    gc_media."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
@@ -0,0 +1,64 @@
+"""Общий кэш страниц лент и поста.
+
+Страница рендерится без персональных мест: вместо них стоят заглушки
+(см. fragments.py), поэтому одна копия из кэша годится и анониму, и
+вошедшему пользователю. Ключ копии — путь страницы, параметры, которые
+читает view (page, after, before), и версии её лент; версии поднимают
+сигналы Post, Comment и Follow (signals.py), так что после изменения
+страница просто ищется под новым ключом. Прочие параметры запроса на
+страницу не влияют и в ключ не входят: иначе каждая метка вроде
+?utm_source= заводила бы в кэше свою копию.
+
+View остаётся обычным: декоратор только кладёт ключ в
+request.page_cache_key, а шаблон base.html оборачивает страницу в
+{% pagecache %}. Данные, которые нужны только для рендера, view отдаёт
+ленивыми (SimpleLazyObject) — при попадании в кэш они не читаются.
+"""
+from functools import wraps
+
+from django.core.cache.utils import make_template_fragment_key
+
+from .conditional import feed_states
+from .paginators import decode_cursor
+
+
+def page_params(request):
+    """Параметры страницы в том виде, в каком их понимает
+    views.paginator_my: битый курсор — первая страница, номер
+    не числом — первая нумерованная."""
+    params = request.GET
+    if 'page' in params:
+        try:
+            return [f'page={int(params["page"])}']
+        except ValueError:
+            return ['page=1']
+    for name in ('after', 'before'):
+        if decode_cursor(params.get(name)) is not None:
+            return [f'{name}={params[name]}']
+    return []
+
+
+def page_key(request, versions):
+    return make_template_fragment_key(
+        'page', [request.path, *page_params(request), *versions])
+
+
+def is_shared(request):
+    return getattr(request, 'page_cache_key', None) is not None
+
+
+def shared_page(scopes):
+    """Декоратор view: страница кэшируется целиком, одна на всех.
+
+    scopes — как у conditional.feed_condition.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in ('GET', 'HEAD'):
+                versions = [str(version) for version, _ in
+                            feed_states(request, scopes, kwargs)]
+                request.page_cache_key = page_key(request, versions)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,218 @@
+import base64
+import binascii
+
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '|'
+ELLIPSIS = '…'
+COUNT_KEY = 'feed_count:{}'
+
+
+def encode_cursor(value, pk):
+    """Упаковывает ключ (дата, id) в непрозрачный токен для URL."""
+    raw = f'{value.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен курсора. Для битого токена возвращает None."""
+    if not token:
+        return None
+    padding = '=' * (-len(token) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        value, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, id).
+
+    Вместо COUNT(*) и OFFSET делает один запрос по индексу:
+    берёт per_page + 1 записей после (или до) курсора, лишняя запись
+    только показывает, есть ли следующая страница. Поэтому стоимость
+    страницы не зависит от её глубины.
+
+    Страница остаётся обычным Page: номер условный (1 — первая,
+    2 — любая следующая), а num_pages считается по соседним страницам,
+    так что has_next/has_previous в шаблонах работают как раньше.
+
+    transform превращает выбранные строки в объекты страницы: для
+    выборок values_list это rows.as_rows.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 transform=list):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.transform = transform
+        self._has_next = False
+        self._has_previous = False
+
+    @property
+    def num_pages(self):
+        return 1 + self._has_previous + self._has_next
+
+    def _key_of(self, obj):
+        return tuple(getattr(obj, key) for key in self.keys)
+
+    def encode_key(self, obj):
+        return encode_cursor(*self._key_of(obj))
+
+    def _after(self, cursor):
+        value, pk = cursor
+        first, second = self.keys
+        return self.object_list.filter(
+            Q(**{f'{first}__lt': value})
+            | Q(**{first: value, f'{second}__lt': pk})
+        ).order_by(f'-{first}', f'-{second}')
+
+    def _before(self, cursor):
+        value, pk = cursor
+        first, second = self.keys
+        return self.object_list.filter(
+            Q(**{f'{first}__gt': value})
+            | Q(**{first: value, f'{second}__gt': pk})
+        ).order_by(first, second)
+
+    def get_cursor_page(self, after=None, before=None):
+        """Возвращает страницу после токена after или до токена before."""
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+        first, second = self.keys
+        if before is not None:
+            rows = self.transform(self._before(before)[:self.per_page + 1])
+            if rows:
+                return self.build_page(
+                    rows[:self.per_page][::-1],
+                    has_next=True,
+                    has_previous=len(rows) > self.per_page,
+                )
+        if after is not None:
+            queryset = self._after(after)
+        else:
+            queryset = self.object_list.order_by(f'-{first}', f'-{second}')
+        rows = self.transform(queryset[:self.per_page + 1])
+        return self.build_page(
+            rows[:self.per_page],
+            has_next=len(rows) > self.per_page,
+            has_previous=after is not None,
+        )
+
+    def build_page(self, rows, has_next, has_previous):
+        """Собирает Page из уже выбранных строк и проставляет курсоры."""
+        self._has_next = has_next
+        self._has_previous = has_previous
+        page = self._get_page(rows, 1 + has_previous, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self.encode_key(rows[-1])
+        if rows and has_previous:
+            page.previous_cursor = self.encode_key(rows[0])
+        return page
+
+
+class FeedPaginator(Paginator):
+    """Нумерованный пагинатор для больших лент.
+
+    Число записей берётся из явно переданного счётчика или из кэша
+    (живёт count_timeout секунд); точный COUNT(*) делается, только
+    если ни того, ни другого нет. Счётчик может быть приблизительным
+    (estimated=True): если он разошёлся с реальным числом страниц,
+    записи пересчитываются точно. Вместо полного
+    page_range шаблон получает окно номеров вида 1 … 4 5 [6] 7 8 … N.
+    Строки страницы проходят через transform, как в CursorPaginator.
+    """
+
+    def __init__(self, object_list, per_page, count=None, count_key=None,
+                 count_timeout=60, estimated=False, transform=list):
+        super().__init__(object_list, per_page)
+        self.transform = transform
+        self.count_key = count_key and COUNT_KEY.format(count_key)
+        self.count_timeout = count_timeout
+        self.page_window = []
+        self.estimated = False
+        if count is not None:
+            self.count = count
+            self.estimated = estimated
+
+    def _exact_count(self):
+        count = Paginator.count.func(self)
+        if self.count_key:
+            cache.set(self.count_key, count, self.count_timeout)
+        self.estimated = False
+        return count
+
+    @property
+    def count(self):
+        if 'count' not in self.__dict__:
+            self.__dict__['count'] = self._cached_count()
+        return self.__dict__['count']
+
+    @count.setter
+    def count(self, value):
+        self.__dict__['count'] = value
+        self.__dict__.pop('num_pages', None)
+
+    def _cached_count(self):
+        if self.count_key:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        return self._exact_count()
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.estimated:
+                raise
+        # Оценка занизила число записей, считаем точно.
+        self.count = self._exact_count()
+        return super().validate_number(number)
+
+    def page(self, number):
+        # Срез не подрезается по count: число записей может быть
+        # приблизительным, а страница должна быть полной.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        page = self._get_page(
+            self.transform(self.object_list[bottom:bottom + self.per_page]),
+            number, self)
+        if self.estimated and number > 1 and not len(page):
+            # Оценка завысила число записей, считаем точно.
+            self.count = self._exact_count()
+            return self.page(min(number, self.num_pages))
+        self.page_window = list(self.get_elided_page_range(number))
+        return page
+
+    def get_elided_page_range(self, number, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS."""
+        num_pages = self.num_pages
+        if num_pages <= (on_each_side + on_ends) * 2 + 1:
+            yield from self.page_range
+            return
+        if number > 1 + on_each_side + on_ends + 1:
+            yield from range(1, on_ends + 1)
+            yield ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < num_pages - on_each_side - on_ends - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield ELLIPSIS
+            yield from range(num_pages - on_ends + 1, num_pages + 1)
+        else:
+            yield from range(number + 1, num_pages + 1)
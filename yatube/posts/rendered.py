@@ -0,0 +1,83 @@
+"""Кэш отрисованных постов (includes/post_body.html).
+
+Пост в ленте — текст через linebreaksbr, дата, имя автора, миниатюры
+и ссылка, а меняется он редко. Готовый HTML каждого поста лежит в кэше
+под ключом (id, updated_at, хэш имени автора, версия шаблона), так что
+правка поста, переименование автора или правка шаблона просто уводят
+его на новый ключ, сбрасывать ничего не нужно. Лента собирает посты
+страницы одним get_many и рисует только промахи; подгрузке ленты
+(views.more_posts) хватает одного запроса за ключами постов по индексу.
+
+Пост, картинку которого не удалось вывести целиком (миниатюр ещё нет
+или хранилище ответило ошибкой), рисуется, но в кэш не кладётся:
+иначе он остался бы без миниатюр на POST_FRAGMENT_TIMEOUT.
+"""
+import hashlib
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template, render_to_string
+
+from . import kvstore, selectors
+from .rows import FeedRow
+
+TEMPLATE = 'includes/post_body.html'
+# Шаблоны, из которых состоит пост: их правка меняет версию.
+TEMPLATES = (TEMPLATE, 'includes/post_image.html')
+KEY = 'post_html:{}:{}:{}:{}'
+# Переменная контекста, в которую post_image отмечает картинки,
+# выведенные не целиком.
+INCOMPLETE = 'incomplete_images'
+
+
+@lru_cache(maxsize=None)
+def template_version():
+    """Хэш исходников шаблонов поста; считается раз на процесс."""
+    digest = hashlib.md5()
+    for name in TEMPLATES:
+        digest.update(get_template(name).template.source.encode())
+    return digest.hexdigest()[:8]
+
+
+def cache_key(post):
+    """post — строка ленты или пост с загруженными именем и фамилией
+    автора."""
+    name = hashlib.md5(post.author.get_full_name().encode()).hexdigest()
+    return KEY.format(
+        post.id, post.updated_at.timestamp(), name[:8], template_version())
+
+
+def render_post(row):
+    """HTML поста и можно ли его кэшировать."""
+    incomplete = []
+    html = render_to_string(TEMPLATE, {'post': row, INCOMPLETE: incomplete})
+    return html, not incomplete
+
+
+def render_posts(posts):
+    """HTML постов: {id: html}.
+
+    posts — строки ленты (FeedRow) или любые объекты с id, updated_at
+    и автором (см. cache_key); для них при промахе строка читается из
+    базы, и если пост уже удалён, его в ответе нет.
+    """
+    keys = {post.id: cache_key(post) for post in posts}
+    found = cache.get_many(list(keys.values()))
+    html = {pk: found[key] for pk, key in keys.items() if key in found}
+    missing = [post for post in posts if post.id not in html]
+    if not missing:
+        return html
+    rows = [post for post in missing if isinstance(post, FeedRow)]
+    ids = [post.id for post in missing if not isinstance(post, FeedRow)]
+    if ids:
+        rows += selectors.feed_rows(ids).values()
+    kvstore.prefetch(rows)
+    complete = {}
+    for row in rows:
+        html[row.id], cacheable = render_post(row)
+        if cacheable:
+            complete[keys[row.id]] = html[row.id]
+    if complete:
+        cache.set_many(complete, settings.POST_FRAGMENT_TIMEOUT)
+    return html
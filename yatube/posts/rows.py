@@ -0,0 +1,122 @@
+"""Лёгкие строки ленты вместо экземпляров моделей.
+
+Для отрисовки поста в ленте нужны текст, дата, картинка, имя автора
+и группа. Строки собираются из кортежей values_list и не тянут за
+собой состояние модели, поэтому на страницу уходит заметно меньше
+памяти и времени. Со своими моделями они сравниваются по pk, так что
+row == post и row.author == user работают как для экземпляров.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Model
+
+from .models import Group, Post
+
+User = get_user_model()
+
+ROW_FIELDS = (
+    'id', 'text', 'pub_date', 'image',
+    'author_id', 'author__username', 'author__first_name',
+    'author__last_name',
+    'group_id', 'group__slug', 'group__title', 'updated_at',
+)
+
+
+class Row:
+    __slots__ = ()
+    model = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __eq__(self, other):
+        if isinstance(other, Row):
+            return self.model is other.model and self.id == other.id
+        if isinstance(other, Model):
+            return (other._meta.concrete_model is self.model
+                    and other.pk == self.id)
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.id}>'
+
+
+class AuthorRow(Row):
+    __slots__ = ('id', 'username', 'first_name', 'last_name')
+    model = User
+
+    def __init__(self, id, username, first_name, last_name):
+        self.id = id
+        self.username = username
+        self.first_name = first_name
+        self.last_name = last_name
+
+    def get_full_name(self):
+        return f'{self.first_name} {self.last_name}'.strip()
+
+    def __str__(self):
+        return self.username
+
+
+class GroupRow(Row):
+    __slots__ = ('id', 'slug', 'title')
+    model = Group
+
+    def __init__(self, id, slug, title):
+        self.id = id
+        self.slug = slug
+        self.title = title
+
+    def __str__(self):
+        return self.title
+
+
+class FeedRow(Row):
+    """Пост в ленте: то, что читает includes/post_body.html."""
+
+    __slots__ = ('id', 'text', 'pub_date', 'image', 'author', 'group',
+                 'updated_at')
+    model = Post
+    image_field = Post._meta.get_field('image')
+
+    def __init__(self, id, text, pub_date, image, author, group,
+                 updated_at=None):
+        self.id = id
+        self.text = text
+        self.pub_date = pub_date
+        self.image = self.image_field.attr_class(
+            self, self.image_field, image or '')
+        self.author = author
+        self.group = group
+        self.updated_at = updated_at
+
+    @property
+    def author_id(self):
+        return self.author.id
+
+    @property
+    def group_id(self):
+        return self.group.id if self.group is not None else None
+
+    def __str__(self):
+        return self.text[:15]
+
+    @classmethod
+    def from_values(cls, values):
+        (pk, text, pub_date, image, author_id, username, first_name,
+         last_name, group_id, slug, title, updated_at) = values
+        return cls(
+            pk, text, pub_date, image,
+            AuthorRow(author_id, username, first_name, last_name),
+            GroupRow(group_id, slug, title) if group_id is not None
+            else None,
+            updated_at,
+        )
+
+
+def as_rows(values):
+    """FeedRow для кортежей values_list(*ROW_FIELDS) — списком."""
+    return [FeedRow.from_values(row) for row in values]
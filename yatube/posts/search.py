@@ -0,0 +1,299 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts — таблица FTS5 с внешним содержимым: она хранит
+только словарь, а текст читает из posts_post по rowid = id поста.
+Синхронность держат триггеры на posts_post, поэтому индекс обновляется
+и при bulk_create, и при update(), и при правке из админки.
+
+SQLite пересоздаёт таблицу при многих ALTER (AlterField, AddField со
+значением по умолчанию) и при этом теряет её триггеры. Миграции,
+которые меняют posts_post, должны создать их заново своим RunSQL (как
+0017_post_updated_at), а не вызывать install(): иначе правка модуля
+поменяет и уже применённые миграции. Команда rebuild_search ставит
+триггеры и заново строит индекс.
+"""
+import base64
+import binascii
+import math
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import selectors
+from .paginators import CURSOR_SEPARATOR, CursorPaginator
+
+TABLE = 'posts_post_fts'
+DEFAULT_RANK_WINDOW = 5000
+MAX_TERMS = 8
+# Для префиксов из 2 и 3 букв у индекса есть отдельные словари
+# (prefix='2 3'), иначе запрос вида «ка*» перебирает тысячи слов.
+MIN_PREFIX = 2
+SNIPPET_TOKENS = 16
+# Управляющие символы не встречаются в тексте постов, поэтому ими
+# удобно отметить совпадения до экранирования.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {TABLE}({TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+
+
+def install(cursor):
+    """Создаёт таблицу индекса и триггеры, если их ещё нет."""
+    cursor.execute(SCHEMA)
+    for trigger in TRIGGERS:
+        cursor.execute(trigger)
+
+
+def uninstall(cursor):
+    for trigger in ('insert', 'delete', 'update'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS {TABLE}_{trigger}')
+    cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+def rebuild(optimize=True):
+    """Перестраивает индекс по posts_post и сливает его сегменты."""
+    with connection.cursor() as cursor:
+        install(cursor)
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('rebuild')")
+        if optimize:
+            cursor.execute(
+                f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+
+
+def rank_window():
+    return getattr(settings, 'SEARCH_RANK_WINDOW', DEFAULT_RANK_WINDOW)
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в запрос FTS5.
+
+    Синтаксис FTS5 (кавычки, NEAR, OR, двоеточия) наружу не отдаём:
+    берём слова, каждое берём в кавычки, последнее (если в нём хотя бы
+    MIN_PREFIX букв) ищем по префиксу, чтобы поиск работал и по
+    недописанному слову. Пустая строка
+    значит, что искать нечего.
+    """
+    terms = re.findall(r'\w+', query or '')[:MAX_TERMS]
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= MIN_PREFIX:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight(snippet):
+    """Экранирует отрывок и заменяет метки совпадений на <mark>."""
+    html = escape(snippet)
+    html = html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+    return mark_safe(html)
+
+
+def encode_cursor(rank, pk):
+    raw = f'{rank!r}{CURSOR_SEPARATOR}{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    padding = '=' * (-len(token) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(token + padding).decode()
+        rank, pk = raw.rsplit(CURSOR_SEPARATOR, 1)
+        rank = float(rank)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if not math.isfinite(rank):
+        return None
+    return rank, pk
+
+
+class SearchResult:
+    __slots__ = ('post', 'rank', 'snippet')
+
+    def __init__(self, post, rank, snippet):
+        self.post = post
+        self.rank = rank
+        self.snippet = snippet
+
+    @property
+    def id(self):
+        return self.post.id
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная пагинация по ключу (bm25, id).
+
+    bm25 в FTS5 тем меньше, чем лучше совпадение, поэтому выдача идёт
+    по возрастанию ранга, а при равном ранге — от новых постов к
+    старым. Ранг зависит от статистики всего индекса, так что после
+    новых постов курсор может сдвинуться на пару позиций, но страница
+    по-прежнему стоит одного запроса без OFFSET.
+
+    bm25 приходится считать для каждого совпадения, и для частого слова
+    это сотни тысяч строк (1,3 с на миллионе постов). Поэтому, если
+    совпадений больше window (settings.SEARCH_RANK_WINDOW), ранжируются
+    только window самых новых, а у страницы стоит truncated = True,
+    чтобы шаблон сказал об этом и предложил уточнить запрос.
+    """
+
+    def __init__(self, query, per_page, group_id=None, author_id=None,
+                 window=None):
+        super().__init__([], per_page, keys=('rank', 'id'))
+        self.expression = match_expression(query)
+        self.group_id = group_id
+        self.author_id = author_id
+        self.window = window or rank_window()
+        self.truncated = False
+
+    def encode_key(self, result):
+        return encode_cursor(result.rank, result.id)
+
+    def _filters(self):
+        """Условия WHERE, параметры и JOIN с постами, если он нужен."""
+        where = [f'{TABLE} MATCH %s']
+        params = [self.expression]
+        if self.group_id is not None:
+            where.append('post.group_id = %s')
+            params.append(self.group_id)
+        if self.author_id is not None:
+            where.append('post.author_id = %s')
+            params.append(self.author_id)
+        join = ''
+        if len(where) > 1:
+            join = f'JOIN posts_post AS post ON post.id = {TABLE}.rowid '
+        return where, params, join
+
+    def _window_floor(self):
+        """Нижняя граница окна: id самого старого из window новейших
+        совпадений, или 0, если совпадений не больше window. Заодно
+        отмечает, что более старые совпадения отброшены."""
+        where, params, join = self._filters()
+        sql = (
+            f'SELECT {TABLE}.rowid FROM {TABLE} {join}'
+            f"WHERE {' AND '.join(where)} "
+            f'ORDER BY {TABLE}.rowid DESC LIMIT 2 OFFSET %s'
+        )
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params + [self.window - 1])
+            rows = db_cursor.fetchall()
+        self.truncated = len(rows) > 1
+        return rows[0][0] if self.truncated else 0
+
+    def _select(self, cursor=None, backwards=False):
+        """(id, ранг) страницы и ещё одного совпадения за ней."""
+        score = f'bm25({TABLE})'
+        rowid = f'{TABLE}.rowid'
+        where, params, join = self._filters()
+        # FTS5 умеет искать по диапазону rowid, так что bm25 считается
+        # только внутри окна.
+        floor = self._window_floor()
+        if floor:
+            where.append(f'{rowid} >= %s')
+            params.append(floor)
+        if cursor is not None:
+            rank, pk = cursor
+            sign = '<' if backwards else '>'
+            other = '>' if backwards else '<'
+            where.append(f'({score} {sign} %s '
+                         f'OR ({score} = %s AND {rowid} {other} %s))')
+            params += [rank, rank, pk]
+        order = 'DESC' if backwards else 'ASC'
+        id_order = 'ASC' if backwards else 'DESC'
+        sql = (
+            f"SELECT {rowid}, {score} FROM {TABLE} {join}"
+            f"WHERE {' AND '.join(where)} "
+            f"ORDER BY {score} {order}, {rowid} {id_order} LIMIT %s"
+        )
+        params.append(self.per_page + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            return db_cursor.fetchall()
+
+    def _snippets(self, ids):
+        """Отрывки с совпадениями только для постов страницы: snippet()
+        в запросе с сортировкой считался бы для всего окна."""
+        if not ids:
+            return {}
+        marks = ', '.join(['%s'] * len(ids))
+        sql = (
+            f'SELECT rowid, snippet({TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid IN ({marks})'
+        )
+        params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS,
+                  self.expression, *ids]
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            return dict(db_cursor.fetchall())
+
+    def _results(self, found):
+        ids = [pk for pk, _ in found]
+        posts = selectors.feed_rows(ids)
+        snippets = self._snippets(ids)
+        return [
+            SearchResult(posts[pk], rank, highlight(snippets.get(pk, '')))
+            for pk, rank in found if pk in posts
+        ]
+
+    def build_page(self, rows, has_next, has_previous):
+        page = super().build_page(rows, has_next, has_previous)
+        page.truncated = self.truncated
+        return page
+
+    def get_cursor_page(self, after=None, before=None):
+        if not self.expression:
+            return self.empty_page()
+        after = decode_cursor(after)
+        before = decode_cursor(before) if after is None else None
+        if before is not None:
+            found = self._select(before, backwards=True)
+            if found:
+                return self.build_page(
+                    self._results(found[:self.per_page][::-1]),
+                    has_next=True,
+                    has_previous=len(found) > self.per_page,
+                )
+        found = self._select(after)
+        return self.build_page(
+            self._results(found[:self.per_page]),
+            has_next=len(found) > self.per_page,
+            has_previous=after is not None,
+        )
+
+    def empty_page(self):
+        """Пустая выдача, например для фильтра по несуществующему
+        автору."""
+        return self.build_page([], has_next=False, has_previous=False)
+
+
+def matching(queryset, query):
+    """Посты из queryset, подходящие под запрос."""
+    return selectors.with_ids(
+        queryset, f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [match_expression(query)])
@@ -0,0 +1,87 @@
+"""Запросы лент в одном месте.
+
+Шаблон includes/post_body.html и ссылки на группы читают у поста
+автора, группу и картинку, поэтому связанные объекты подтягиваются
+одним JOIN, а из таблиц выбираются только нужные колонки. Ленты
+отдают не модели, а кортежи колонок, из которых собираются лёгкие
+строки FeedRow (см. rows.py).
+"""
+from django.db.models.expressions import RawSQL
+
+from .models import Comment, FeedEntry, Post
+from .rows import ROW_FIELDS, as_rows
+
+POST_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'author', 'group',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__slug', 'group__title', 'updated_at',
+)
+
+
+def feed_posts():
+    """Посты для лент со всем, что нужно для отрисовки."""
+    return Post.objects.select_related('author', 'group').only(*POST_FIELDS)
+
+
+def feed_values():
+    """Посты для лент кортежами колонок ROW_FIELDS.
+
+    Фильтры, сортировки и срезы работают как обычно, а в FeedRow
+    кортежи превращает as_rows (пагинаторы делают это сами через
+    transform).
+    """
+    return Post.objects.values_list(*ROW_FIELDS, named=False)
+
+
+def feed_rows(ids):
+    """Посты ленты с id из ids как FeedRow, по аналогии с in_bulk."""
+    rows = as_rows(feed_values().filter(pk__in=ids))
+    return {row.id: row for row in rows}
+
+
+def index_feed():
+    return feed_values()
+
+
+def group_feed(group):
+    return feed_values().filter(group=group)
+
+
+def author_feed(author):
+    return feed_values().filter(author=author)
+
+
+def follow_entries(user):
+    """Ключи материализованной ленты подписок.
+
+    Сами посты подгружаются потом одним запросом через feed_rows().
+    """
+    return FeedEntry.objects.filter(user=user).only('pub_date', 'post')
+
+
+def detail_posts():
+    return Post.objects.select_related('author', 'group')
+
+
+def post_comments(post):
+    """Комментарии поста (объект или id) от новых к старым."""
+    return Comment.objects.filter(post=post).select_related('author').only(
+        'text', 'created', 'post', 'parent', 'path', 'author',
+        'author__username')
+
+
+class IdsSQL(RawSQL):
+    """Сырой подзапрос для pk__in.
+
+    Lookup сам берёт правую часть в скобки. Обычный RawSQL добавил бы
+    вторые, а «IN ((SELECT ...))» сравнивает с одним значением, а не
+    со списком.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def with_ids(queryset, sql, params):
+    """Строки queryset, чьи id возвращает подзапрос sql."""
+    return queryset.filter(pk__in=IdsSQL(sql, params))
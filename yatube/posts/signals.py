@@ -0,0 +1,226 @@
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import DEFERRED
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import (autocomplete, blobs, counters, feed, kvstore, threads,
+               timelines)
+from .versions import bump_feed_version, bump_post_versions
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def bump_post_pages(post, group_ids):
+    """Версии страниц поста; group_ids — его нынешняя и прежняя
+    группы."""
+    group_ids = {pk for pk in group_ids if pk is not None}
+    slugs = Group.objects.filter(pk__in=group_ids).values_list(
+        'slug', flat=True) if group_ids else ()
+    bump_post_versions(post.pk, post.author.username, slugs)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        feed.fan_out(instance)
+        counters.change_author(instance.author_id, 'posts_count', 1)
+    timelines.add_post(instance)
+    bump_post_pages(instance, {instance.group_id, instance._stored_group_id})
+    instance._stored_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_author(instance.author_id, 'posts_count', -1)
+    timelines.remove_post(instance)
+    bump_post_pages(instance, {instance.group_id})
+
+
+def _loaded_image(instance):
+    """Имя картинки, загруженное из базы, или None, если поле
+    отложено через only()/defer()."""
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    instance._stored_image = None
+    if 'image' in instance.__dict__:
+        instance._stored_image = _loaded_image(instance) or ''
+    # Прежняя группа нужна, чтобы сбросить и её страницу.
+    instance._stored_group_id = instance.__dict__.get('group_id', DEFERRED)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk or (instance._stored_image is not None
+                           and instance._stored_group_id is not DEFERRED):
+        return
+    image, group_id = Post.objects.filter(pk=instance.pk).values_list(
+        'image', 'group_id').first() or ('', None)
+    if instance._stored_image is None:
+        instance._stored_image = image or ''
+    if instance._stored_group_id is DEFERRED:
+        instance._stored_group_id = group_id
+
+
+@receiver(post_save, sender=Post)
+def post_image_saved(sender, instance, created, update_fields=None,
+                     **kwargs):
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    name = instance.image.name or ''
+    blobs.replace('' if created else instance._stored_image or '', name)
+    instance._stored_image = name
+
+
+@receiver(post_delete, sender=Post)
+def post_image_deleted(sender, instance, **kwargs):
+    blobs.release(_loaded_image(instance))
+
+
+def bump_follow_versions(follow):
+    bump_feed_version(f'follow:{follow.user_id}')
+    for user in (follow.user, follow.author):
+        bump_feed_version(f'author:{user.username}')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill(instance.user_id, instance.author_id)
+        counters.change_author(instance.author_id, 'followers_count', 1)
+        counters.change_author(instance.user_id, 'following_count', 1)
+        bump_follow_versions(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feed.remove_author(instance.user_id, instance.author_id)
+    counters.change_author(instance.author_id, 'followers_count', -1)
+    counters.change_author(instance.user_id, 'following_count', -1)
+    bump_follow_versions(instance)
+
+
+def bump_comment_versions(comment):
+    bump_feed_version(f'post:{comment.post_id}')
+    # Счётчик комментариев отдаёт API лент (поле comments_count).
+    bump_feed_version('comments')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        threads.assign_path(instance)
+        counters.change_comments(instance.post_id, 1)
+    bump_comment_versions(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comments(instance.post_id, -1)
+    bump_comment_versions(instance)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    # Прежнее имя: под ним отданы профиль и ссылки в комментариях.
+    instance._stored_username = None
+    if instance.pk and (update_fields is None or 'username' in update_fields):
+        instance._stored_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Вход пользователя сохраняет только last_login.
+    if update_fields is not None and not set(update_fields) & {
+            'username', 'first_name', 'last_name'}:
+        return
+    stored = getattr(instance, '_stored_username', None)
+    if stored is not None and stored != instance.username:
+        # Старый профиль теперь 404, а имя комментатора со ссылкой на
+        # профиль видно на страницах прокомментированных постов.
+        bump_feed_version(f'author:{stored}')
+        post_ids = Comment.objects.filter(author=instance).values_list(
+            'post_id', flat=True).distinct()
+        for post_id in post_ids:
+            bump_feed_version(f'post:{post_id}')
+    # Имя автора видно на главной, в профиле, на страницах его постов
+    # (post_scopes зависит от автора) и в группах, где он писал.
+    # У нового пользователя постов нет, главную он не меняет; своя
+    # версия нужна, чтобы 404 по его имени не подтвердился по ETag.
+    bump_feed_version(f'author:{instance.username}')
+    if not created:
+        bump_feed_version()
+        slugs = Group.objects.filter(posts__author=instance).values_list(
+            'slug', flat=True).distinct()
+        for slug in slugs:
+            bump_feed_version(f'group:{slug}')
+    entry = autocomplete.user_entry(instance)
+    transaction.on_commit(lambda: autocomplete.index.update(
+        autocomplete.USER, instance.pk, entry))
+
+
+def bump_group_links(group):
+    """Ссылка на группу по slug есть на главной, в профилях авторов её
+    постов и на страницах этих постов."""
+    posts = Post.objects.filter(group=group).values_list(
+        'pk', 'author__username')
+    usernames = set()
+    for pk, username in posts:
+        bump_feed_version(f'post:{pk}')
+        usernames.add(username)
+    for username in usernames:
+        bump_feed_version(f'author:{username}')
+    if usernames:
+        bump_feed_version()
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, **kwargs):
+    # Прежний slug: по нему нарисованы ссылки на уже отданных страницах.
+    instance._stored_slug = None
+    if instance.pk:
+        instance._stored_slug = Group.objects.filter(
+            pk=instance.pk).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    # Название и описание видны только на страницах, зависящих от
+    # версии группы: на её ленте и страницах её постов.
+    bump_feed_version(f'group:{instance.slug}')
+    stored = getattr(instance, '_stored_slug', None)
+    if stored is not None and stored != instance.slug:
+        bump_feed_version(f'group:{stored}')
+        bump_group_links(instance)
+    entry = autocomplete.group_entry(instance)
+    transaction.on_commit(lambda: autocomplete.index.update(
+        autocomplete.GROUP, instance.pk, entry))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    """Посты группы теряют её через SET_NULL без сигналов Post, поэтому
+    страницы со ссылкой на группу сбрасываются здесь, пока посты ещё
+    видны."""
+    bump_group_links(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+def autocomplete_deleted(sender, instance, **kwargs):
+    if sender is Group:
+        bump_feed_version(f'group:{instance.slug}')
+    kind = autocomplete.USER if sender is User else autocomplete.GROUP
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.index.remove(kind, pk))
+
+
+request_started.connect(kvstore.clear_memo)
@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def content_hash(content):
+    """sha256 содержимого файла, читается кусками."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — хэш его содержимого.
+
+    posts/photo.jpg сохраняется как posts/ab/abcdef….jpg. Повторная
+    загрузка тех же байтов не пишет новый файл, а получает имя уже
+    сохранённого, поэтому и миниатюры sorl (их ключ строится по имени
+    исходника) переиспользуются. Сколько постов ссылается на файл,
+    считает модель Blob (см. blobs.py).
+    """
+
+    def _save(self, name, content):
+        digest = content_hash(content)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest[:2], digest + extension)
+        from . import blobs
+        # Сначала отметка, потом проверка: сборщик, удаляющий файл,
+        # увидит отметку и вернёт его (см. blobs.collect).
+        blobs.touch(name)
+        if self.exists(name):
+            return name
+        # Пишем во временный файл и переносим его атомарно: если те же
+        # байты сохраняют два запроса сразу, второй просто перезапишет
+        # файл тем же содержимым.
+        temporary = super()._save(
+            os.path.join(directory, 'incoming', digest + extension),
+            content)
+        target = self.path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(self.path(temporary), target)
+        return name
+
+
+post_image_storage = ContentAddressedStorage()
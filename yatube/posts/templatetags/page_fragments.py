@@ -0,0 +1,27 @@
+from django import template
+
+from posts import fragments, pages
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, *args):
+    """Персональное место страницы (см. posts/fragments.py).
+
+        {% fragment 'follow' author.username %}
+
+    На общей странице из кэша выводит заглушку для анонима, которую
+    потом заполняет fragments.js, иначе — сам фрагмент.
+    """
+    request = context.get('request')
+    if request is None or pages.is_shared(request):
+        return fragments.placeholder(name, args)
+    resolved = fragments.resolve(
+        fragments.join(name, args), request.user)
+    if resolved is None:
+        return ''
+    template_name, data = resolved
+    fragment_template = context.template.engine.get_template(template_name)
+    with context.push(**data):
+        return fragment_template.render(context)
@@ -0,0 +1,18 @@
+from django import template
+
+from posts import rendered
+
+register = template.Library()
+
+
+@register.simple_tag
+def rendered_posts(posts):
+    """Пары (пост, HTML) для ленты: HTML постов берётся из кэша одним
+    обращением, рисуются только промахи (см. posts/rendered.py).
+
+        {% rendered_posts page_obj as items %}
+        {% for post, html in items %}{{ html }}{% endfor %}
+    """
+    posts = list(posts)
+    html = rendered.render_posts(posts)
+    return [(post, html[post.id]) for post in posts if post.id in html]
@@ -0,0 +1,57 @@
+import logging
+
+from django import template
+
+from posts import rendered, thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+# Лента занимает всю ширину экрана, пока он уже кадра
+SIZES = '(max-width: {0}px) 100vw, {0}px'.format(thumbnails.FRAME[0])
+
+
+def srcset(variants):
+    return ', '.join(f'{image.url} {width}w' for width, _, image in variants)
+
+
+@register.inclusion_tag('includes/post_image.html', takes_context=True)
+def post_image(context, image, css_class='card-img my-2'):
+    """<picture> с вариантами картинки поста в WebP и JPEG.
+
+        {% post_image post.image %}
+
+    Миниатюры при показе не строятся: если их ещё нет, выводится
+    исходная картинка, а построение ставится в очередь. Об этом
+    узнаёт кэш постов (rendered.INCOMPLETE), чтобы не сохранить
+    такой вариант.
+    """
+    if not image:
+        return {}
+    try:
+        variants = thumbnails.variants(image, create=False)
+    except OSError:
+        logger.exception('Не удалось получить варианты картинки %s', image)
+        variants = None
+    if variants is None:
+        incomplete = context.get(rendered.INCOMPLETE)
+        if incomplete is not None:
+            incomplete.append(image.name)
+        thumbnails.schedule_missing(image.instance)
+        return {'src': image.url, 'css_class': css_class, 'pending': True}
+    *sources, fallback = thumbnails.VARIANT_FORMATS
+    width, height, largest = variants[fallback][-1]
+    return {
+        'sources': [
+            {'type': thumbnails.CONTENT_TYPES[image_format],
+             'srcset': srcset(variants[image_format])}
+            for image_format in sources
+        ],
+        'src': largest.url,
+        'srcset': srcset(variants[fallback]),
+        'sizes': SIZES,
+        'width': width,
+        'height': height,
+        'css_class': css_class,
+    }
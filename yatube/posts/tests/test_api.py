@@ -0,0 +1,174 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}',
+                                group=self.group if i % 2 else None)
+            for i in range(5)
+        ]
+        self.ids = [post.pk for post in reversed(self.posts)]
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feeds_page_by_cursor(self):
+        urls = {
+            reverse('posts:api_posts'): self.ids,
+            reverse('posts:api_group_posts', args=['group']):
+                [pk for pk in self.ids if pk in (
+                    self.posts[1].pk, self.posts[3].pk)],
+            reverse('posts:api_profile_posts', args=['writer']): self.ids,
+        }
+        for url, expected in urls.items():
+            with self.subTest(url=url):
+                first = self.guest.get(url, {'limit': 1}).json()
+                self.assertEqual(
+                    [item['id'] for item in first['results']], expected[:1])
+                self.assertIsNone(first['previous'])
+                rest = self.guest.get(
+                    url, {'limit': 10, 'after': first['next']}).json()
+                self.assertEqual(
+                    [item['id'] for item in rest['results']], expected[1:])
+                self.assertIsNone(rest['next'])
+
+        data = self.guest.get(
+            reverse('posts:api_profile_posts', args=['writer'])).json()
+        self.assertEqual(data['author']['full_name'], 'Лев Толстой')
+        self.assertEqual(data['author']['posts_count'], 5)
+        item = data['results'][0]
+        self.assertEqual(item['author'], 'writer')
+        self.assertEqual(item['group'], None)
+        self.assertIsNone(item['image'])
+
+    def test_follow_feed_needs_login(self):
+        url = reverse('posts:api_follow_posts')
+        self.assertEqual(self.guest.get(url).status_code, 401)
+        data = self.client.get(url, {'fields': 'id'}).json()
+        self.assertEqual(data['results'], [{'id': pk} for pk in self.ids])
+
+    def test_fields_select_columns(self):
+        url = reverse('posts:api_posts')
+        self.guest.get(url)
+        # Версии лент одним чтением из кэша и один запрос к постам.
+        with self.assertNumQueries(2):
+            data = self.guest.get(url, {'fields': 'text,id'}).json()
+        self.assertEqual(list(data['results'][0]), ['text', 'id'])
+        with self.assertNumQueries(2):
+            data = self.guest.get(url, {'fields': 'id,group'}).json()
+        self.assertEqual(data['results'][1]['group'], 'group')
+
+        response = self.guest.get(url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_batch_fetch_in_one_query(self):
+        wanted = [self.posts[3].pk, self.posts[0].pk, 10 ** 6]
+        params = {'ids': ','.join(map(str, wanted)), 'fields': 'id,author'}
+        # Версию несуществующего поста заводит первый запрос.
+        self.guest.get(reverse('posts:api_posts'), params)
+        # Авторы пачки для валидаторов, их версии и сами посты.
+        with self.assertNumQueries(3):
+            data = self.guest.get(reverse('posts:api_posts'), params).json()
+        self.assertEqual(data['results'], [
+            {'id': wanted[0], 'author': 'writer'},
+            {'id': wanted[1], 'author': 'writer'},
+        ])
+        response = self.guest.get(reverse('posts:api_posts'), {'ids': '1,x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_comments(self):
+        post = self.posts[0]
+        root = Comment.objects.create(
+            post=post, author=self.reader, text='Корень')
+        Comment.objects.create(
+            post=post, author=self.author, text='Ответ', parent=root)
+        data = self.guest.get(
+            reverse('posts:api_post_comments', args=[post.pk])).json()
+        self.assertEqual([(item['text'], item['depth'])
+                          for item in data['results']],
+                         [('Корень', 0), ('Ответ', 1)])
+
+    def test_errors_are_json(self):
+        urls = [
+            reverse('posts:api_group_posts', args=['missing']),
+            reverse('posts:api_profile_posts', args=['missing']),
+            reverse('posts:api_post_comments', args=[10 ** 6]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest.get(url)
+                self.assertEqual(response.status_code, 404)
+                self.assertIn('error', response.json())
+
+        urls = [
+            (reverse('posts:api_posts'), 'after'),
+            (reverse('posts:api_posts'), 'before'),
+            (reverse('posts:api_post_comments', args=[self.posts[0].pk]),
+             'after'),
+        ]
+        for url, name in urls:
+            with self.subTest(url=url, name=name):
+                response = self.guest.get(url, {name: 'junk'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(name, response.json()['error'])
+
+    def test_conditional_get(self):
+        url = reverse('posts:api_posts')
+        response = self.guest.get(url)
+        again = self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 304)
+        other = self.guest.get(
+            url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(other.status_code, 200)
+        Post.objects.create(author=self.author, text='Новый')
+        again = self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+
+    def test_batch_revalidates_on_author_rename(self):
+        url = reverse('posts:api_posts')
+        params = {'ids': str(self.posts[0].pk)}
+        response = self.guest.get(url, params)
+        self.author.username = 'leo2'
+        self.author.save()
+        again = self.guest.get(
+            url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()['results'][0]['author'], 'leo2')
+
+    def test_comment_counts_revalidate(self):
+        post = self.posts[0]
+        feed = reverse('posts:api_posts')
+        self.assertNotIn('comments_count',
+                         self.guest.get(feed).json()['results'][0])
+        requests = [
+            (feed, {'fields': 'id,comments_count'}),
+            (feed, {'ids': str(post.pk)}),
+            (reverse('posts:api_profile_posts', args=['writer']),
+             {'fields': 'comments_count'}),
+        ]
+        responses = [self.guest.get(url, params) for url, params in requests]
+        plain = self.guest.get(feed)
+        Comment.objects.create(post=post, author=self.reader, text='Новый')
+        for (url, params), response in zip(requests, responses):
+            with self.subTest(url=url, params=params):
+                again = self.guest.get(
+                    url, params, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 200)
+        # Лента без счётчика от комментариев не зависит.
+        self.assertEqual(self.guest.get(
+            feed, HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 304)
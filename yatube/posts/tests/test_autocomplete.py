@@ -0,0 +1,108 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import autocomplete
+from posts.models import Group
+
+User = get_user_model()
+
+
+def run_on_commit(func):
+    func()
+
+
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        autocomplete.index.reset()
+        self.client = Client()
+        self.ivan = User.objects.create_user(
+            username='vanya', first_name='Иван', last_name='Ёлкин')
+        self.group = Group.objects.create(
+            title='Ивановские новости', slug='ivanovo', description='')
+
+    def labels(self, q, **params):
+        response = self.client.get(
+            reverse('posts:autocomplete'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [item['label'] for item in response.json()['results']]
+
+    def values(self, q):
+        return [item['value'] for item in autocomplete.index.search(q)]
+
+    def test_matches_username_names_title_and_slug(self):
+        self.assertEqual(self.labels('van'), ['Иван Ёлкин'])
+        self.assertEqual(self.labels('иван'),
+                         ['Иван Ёлкин', 'Ивановские новости'])
+        self.assertEqual(self.labels('елк'), ['Иван Ёлкин'])
+        self.assertEqual(self.labels('IVANO'), ['Ивановские новости'])
+        self.assertEqual(self.labels('иван', limit=1), ['Иван Ёлкин'])
+        self.assertEqual(self.labels(''), [])
+
+        item = self.client.get(
+            reverse('posts:autocomplete'), {'q': 'van'}).json()['results'][0]
+        self.assertEqual(item['url'], reverse('posts:profile',
+                                              args=['vanya']))
+
+    def test_search_does_not_touch_db_and_follows_signals(self):
+        autocomplete.index.search('a')
+        with self.assertNumQueries(0):
+            self.assertEqual(autocomplete.index.search('иван', 5)[0]['value'],
+                             'vanya')
+
+        self.ivan.first_name = 'Пётр'
+        self.ivan.save()
+        User.objects.create_user(username='ivanov')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.values('иван'), ['ivanovo'])
+            self.assertEqual(self.values('пет'), ['vanya'])
+            self.assertEqual(self.values('ivan'), ['ivanov', 'ivanovo'])
+        self.group.delete()
+        self.assertEqual(self.values('ivan'), ['ivanov'])
+
+    def test_login_does_not_bump_version(self):
+        autocomplete.index.search('a')
+        version = autocomplete.index_version()
+        self.ivan.set_password('pass')
+        self.ivan.save(update_fields=['password'])
+        self.assertEqual(
+            autocomplete.index_version(), version)
+
+    @override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0)
+    def test_reloads_after_change_in_other_process(self):
+        autocomplete.index.search('a')
+        # Другой процесс переименовал группу: сигнала здесь нет,
+        # видна только новая версия.
+        Group.objects.filter(pk=self.group.pk).update(title='Пресня')
+        autocomplete.bump_version(autocomplete.VERSION_KEY)
+        self.assertEqual(self.labels('прес'), ['Пресня'])
+
+    @override_settings(AUTOCOMPLETE_REFRESH_INTERVAL=0)
+    def test_rebuild_does_not_block_search(self):
+        self.assertEqual(self.values('иван'), ['vanya', 'ivanovo'])
+        autocomplete.bump_version(autocomplete.VERSION_KEY)
+        build = autocomplete.build
+        seen = []
+
+        def slow_build():
+            # Пока строится новый индекс, поиск в другом потоке
+            # отвечает по старому.
+            self.assertFalse(autocomplete.index._lock.locked())
+            seen.append(self.values('иван'))
+            return build()
+
+        with mock.patch('posts.autocomplete.build', side_effect=slow_build):
+            self.assertEqual(self.values('иван'), ['vanya', 'ivanovo'])
+        self.assertEqual(seen, [['vanya', 'ivanovo']])
+
+    def test_own_version_key(self):
+        feed = autocomplete.get_version('feed_version:autocomplete')
+        autocomplete.index.search('a')
+        self.group.title = 'Пресня'
+        self.group.save()
+        self.assertEqual(
+            autocomplete.get_version('feed_version:autocomplete'), feed)
@@ -0,0 +1,92 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.urls import reverse
+from posts import blobs, thumbnails
+from posts.models import Blob, Post
+from posts.storage import post_image_storage
+
+from .utils import MediaTestCase, image_file
+
+
+class ContentAddressedStorageTests(MediaTestCase):
+    username = 'reposter'
+
+    def create(self, text, image):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': text, 'image': image})
+        return Post.objects.get(text=text)
+
+    def refs(self, name):
+        return Blob.objects.get(name=name).refs
+
+    def test_duplicate_uploads_share_file_and_thumbnails(self):
+        first = self.create('Мем', image_file('meme.png'))
+        second = self.create('Снова мем', image_file('meme.png'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.refs(first.image.name), 2)
+        self.assertEqual(
+            thumbnails.generate(first.image.name),
+            thumbnails.generate(second.image.name))
+
+        other = self.create(
+            'Другой мем', image_file('meme.png', color='green'))
+        self.assertNotEqual(other.image.name, first.image.name)
+
+    def test_edit_with_same_file_keeps_refs(self):
+        post = self.create('Мем', image_file('meme.png'))
+        name = post.image.name
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Мем ещё раз', 'image': image_file('meme.png')})
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, name)
+        self.assertEqual(self.refs(name), 1)
+
+    def test_gc_removes_unreferenced_files_and_thumbnails(self):
+        first = self.create('Мем', image_file('meme.png'))
+        second = self.create('Снова мем', image_file('meme.png'))
+        name = first.image.name
+        thumbs = thumbnails.generate(name)
+
+        first.delete()
+        self.assertEqual(self.refs(name), 1)
+        call_command('gc_media', grace_hours=0, stdout=StringIO())
+        self.assertTrue(post_image_storage.exists(name))
+
+        second.delete()
+        out = StringIO()
+        call_command('gc_media', grace_hours=0, stdout=out)
+        self.assertIn('Удалено файлов: 1', out.getvalue())
+        self.assertFalse(post_image_storage.exists(name))
+        self.assertFalse(Blob.objects.filter(name=name).exists())
+        for thumb in thumbs:
+            self.assertFalse(default_storage.exists(thumb))
+
+    def test_upload_during_gc_keeps_file(self):
+        post = self.create('Мем', image_file('meme.png'))
+        name = post.image.name
+        post.delete()
+        replace = blobs.os.replace
+
+        def upload_arrives(source, target):
+            replace(source, target)
+            if target.startswith(post_image_storage.path(blobs.TRASH_DIR)):
+                # Та же картинка пришла, пока сборщик удалял файл.
+                blobs.touch(name)
+
+        with mock.patch('posts.blobs.os.replace', upload_arrives):
+            self.assertEqual(blobs.collect(grace=timedelta(0)), [])
+        self.assertTrue(post_image_storage.exists(name))
+        self.assertTrue(Blob.objects.filter(name=name).exists())
+
+    def test_recount_repairs_drift(self):
+        post = self.create('Мем', image_file('meme.png'))
+        Blob.objects.filter(name=post.image.name).update(refs=5)
+        Blob.objects.create(name='posts/lost.jpg', refs=3)
+        blobs.recount()
+        self.assertEqual(self.refs(post.image.name), 1)
+        self.assertEqual(self.refs('posts/lost.jpg'), 0)
@@ -0,0 +1,159 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import threads, views
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author = User.objects.create_user(username='talker')
+        self.post = Post.objects.create(author=self.author, text='Пост')
+        total = views.COMMENTS_PER_PAGE + 5
+        for i in range(total):
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Комм {i}')
+        self.ids = list(Comment.objects.filter(post=self.post).order_by(
+            '-created', '-id').values_list('id', flat=True))
+
+    def test_detail_renders_first_page_with_more_link(self):
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual([comment.pk for comment in comments],
+                         self.ids[:views.COMMENTS_PER_PAGE])
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', args=[self.post.pk])
+            + f'?after={comments.next_cursor}')
+
+    def test_fragment_continues_after_cursor(self):
+        first = views.comments_page(self.post.pk)
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        response = self.client.get(url, {'after': first.next_cursor})
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        self.assertEqual(
+            [comment.pk for comment in response.context['comments']],
+            self.ids[views.COMMENTS_PER_PAGE:])
+        self.assertNotContains(response, 'js-more-comments')
+
+        data = self.client.get(
+            url, {'after': first.next_cursor, 'format': 'json'}).json()
+        self.assertEqual([item['id'] for item in data['results']],
+                         self.ids[views.COMMENTS_PER_PAGE:])
+        self.assertIsNone(data['next'])
+        self.assertEqual(data['results'][0]['author'], 'talker')
+
+    def test_missing_post_is_404(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 100]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='replier')
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post = Post.objects.create(author=self.author, text='Пост')
+
+    def comment(self, text, parent=None):
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': text, 'parent': parent.pk if parent else ''})
+        return Comment.objects.get(text=text)
+
+    def test_replies_rendered_under_their_thread(self):
+        first = self.comment('Первый')
+        second = self.comment('Второй')
+        reply = self.comment('Ответ на первый', first)
+        nested = self.comment('Ответ на ответ', reply)
+        late = self.comment('Поздний ответ на первый', first)
+        self.assertEqual(nested.parent, reply)
+        self.assertEqual(nested.depth, 2)
+        self.assertEqual(
+            nested.path, threads.encode(first.pk) + threads.encode(reply.pk)
+            + threads.encode(nested.pk))
+
+        # Корни — от новых к старым, ответы — в порядке дерева.
+        with self.assertNumQueries(2):
+            page = list(threads.thread_page(self.post.pk, 10))
+        self.assertEqual([comment.text for comment in page], [
+            second.text, first.text, reply.text, nested.text, late.text])
+        self.assertEqual(
+            [comment.text for comment in threads.subtree(reply)],
+            [reply.text, nested.text])
+
+    def test_pages_count_only_root_comments(self):
+        roots = [self.comment(f'Корень {i}') for i in range(3)]
+        for i in range(5):
+            self.comment(f'Ответ {i}', roots[0])
+        first = threads.thread_page(self.post.pk, 2)
+        self.assertEqual([c.text for c in first], ['Корень 2', 'Корень 1'])
+        second = threads.thread_page(
+            self.post.pk, 2, after=first.next_cursor)
+        self.assertEqual(len(second.object_list), 6)
+        self.assertFalse(second.has_next())
+
+    def test_replies_capped_per_root(self):
+        root = self.comment('Корень')
+        other = self.comment('Другой корень')
+        per_page = threads.REPLIES_PER_PAGE
+        replies = [Comment.objects.create(
+            post=self.post, author=self.author, text=f'Ответ {i}',
+            parent=root) for i in range(per_page + 3)]
+        Comment.objects.create(post=self.post, author=self.author,
+                               text='Вложенный', parent=replies[-1])
+        with self.assertNumQueries(2):
+            page = list(threads.thread_page(self.post.pk, 10))
+        self.assertEqual([comment.pk for comment in page],
+                         [other.pk, root.pk]
+                         + [reply.pk for reply in replies[:per_page]])
+        cursor = page[-1].replies_cursor
+        self.assertEqual(cursor, replies[per_page - 1].path)
+
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        self.assertContains(response, f'{url}?replies={cursor}')
+        data = self.client.get(
+            url, {'replies': cursor, 'format': 'json'}).json()
+        self.assertEqual([item['text'] for item in data['results']],
+                         ['Ответ 10', 'Ответ 11', 'Ответ 12', 'Вложенный'])
+        self.assertIsNone(data['results'][-1]['more_replies'])
+        self.assertEqual(
+            self.client.get(url, {'replies': 'x'}).status_code, 400)
+
+    def test_comments_without_path(self):
+        roots = Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text=f'Без пути {i}')
+            for i in range(5))
+        self.assertEqual(
+            Comment.objects.filter(post=self.post, path='').count(), 5)
+        page = list(threads.thread_page(self.post.pk, 10))
+        self.assertEqual(sorted(comment.text for comment in page),
+                         sorted(root.text for root in roots))
+
+    def test_parent_from_other_post_rejected(self):
+        other = Post.objects.create(author=self.author, text='Другой')
+        foreign = Comment.objects.create(
+            post=other, author=self.author, text='Чужой')
+        response = self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Ответ не туда', 'parent': foreign.pk})
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(
+            Comment.objects.filter(text='Ответ не туда').exists())
+
+    def test_deep_replies_stop_at_max_depth(self):
+        parent = None
+        for level in range(threads.MAX_DEPTH + 2):
+            parent = self.comment(f'Уровень {level}', parent)
+        self.assertEqual(parent.depth, threads.MAX_DEPTH - 1)
@@ -0,0 +1,183 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=['group']),
+            reverse('posts:profile', args=['writer']),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_304_without_queries(self):
+        for url in self.urls + [reverse('posts:follow_index')]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Cookie', response['Vary'])
+                # Сессия, пользователь и одно чтение версий лент из L2;
+                # странице поста ещё нужны его автор и группа.
+                expected = 4 if url == self.urls[3] else 3
+                with self.assertNumQueries(expected):
+                    again = self.revalidate(self.client, url, response)
+                self.assertEqual(again.status_code, 304)
+
+    def test_last_modified_only_for_guests(self):
+        url = self.urls[0]
+        response = self.guest.get(url)
+        again = self.guest.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+        self.assertNotIn('Last-Modified', self.client.get(url))
+
+    def test_validators_vary_per_user(self):
+        url = self.urls[2]
+        response = self.guest.get(url)
+        self.assertEqual(
+            self.revalidate(self.client, url, response).status_code, 200)
+        other = Client()
+        other.force_login(self.author)
+        self.assertNotEqual(
+            other.get(url)['ETag'], self.client.get(url)['ETag'])
+
+    def test_changes_invalidate_dependent_pages(self):
+        responses = {url: self.client.get(url) for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        statuses = {url: self.revalidate(self.client, url, response)
+                    .status_code for url, response in responses.items()}
+        self.assertEqual(statuses[self.urls[3]], 200)
+        self.assertEqual(statuses[self.urls[0]], 304)
+
+        follow_url = reverse('posts:follow_index')
+        follow = self.client.get(follow_url)
+        profile = self.client.get(self.urls[2])
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            self.revalidate(self.client, follow_url, follow).status_code, 200)
+        self.assertEqual(
+            self.revalidate(self.client, self.urls[2], profile).status_code,
+            200)
+
+        # Пост без группы не трогает страницу группы.
+        responses = {url: self.client.get(url) for url in self.urls}
+        Post.objects.create(author=self.author, text='Новый пост')
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(self.client, url, response).status_code,
+                    304 if url == self.urls[1] else 200)
+
+        responses = {url: self.client.get(url) for url in self.urls}
+        Post.objects.create(
+            author=self.author, group=self.group, text='Пост в группе')
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(self.client, url, response).status_code,
+                    200)
+
+    def test_signup_keeps_index(self):
+        response = self.guest.get(self.urls[0])
+        User.objects.create_user(username='newcomer')
+        self.assertEqual(
+            self.revalidate(self.guest, self.urls[0], response).status_code,
+            304)
+
+    def test_group_delete_invalidates_pages_with_its_link(self):
+        responses = {url: self.client.get(url)
+                     for url in (self.urls[0], self.urls[2], self.urls[3])}
+        self.group.delete()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                again = self.revalidate(self.client, url, response)
+                self.assertEqual(again.status_code, 200)
+                self.assertNotContains(again, '/group/group/')
+
+    def test_group_slug_change_invalidates_pages_with_its_link(self):
+        responses = {url: self.client.get(url) for url in self.urls}
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertEqual(
+            self.revalidate(self.client, self.urls[1],
+                            responses.pop(self.urls[1])).status_code,
+            404)
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                again = self.revalidate(self.client, url, response)
+                self.assertEqual(again.status_code, 200)
+                self.assertContains(again, '/group/renamed/')
+
+        # Название видно только на ленте группы и страницах её постов.
+        responses = {url: self.client.get(url)
+                     for url in (self.urls[0], self.urls[2])}
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(self.client, url, response).status_code,
+                    304)
+
+    def test_rename_invalidates_old_profile_and_commented_posts(self):
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        detail = self.client.get(self.urls[3])
+        self.assertContains(detail, '/profile/reader/')
+        profile = self.client.get(self.urls[2])
+
+        self.reader.username = 'robert'
+        self.reader.save()
+        again = self.revalidate(self.client, self.urls[3], detail)
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, '/profile/robert/')
+
+        self.author.username = 'novelist'
+        self.author.save()
+        self.assertEqual(
+            self.revalidate(self.client, self.urls[2], profile).status_code,
+            404)
+
+    def test_scopes_follow_post_changes(self):
+        other = Group.objects.create(title='Другая', slug='other')
+        group_url = self.urls[1]
+        other_url = reverse('posts:group_posts', args=['other'])
+        responses = {url: self.client.get(url)
+                     for url in (group_url, other_url, self.urls[0])}
+        post = Post.objects.only('id', 'text').get(pk=self.post.pk)
+        post.group = other
+        post.save()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.revalidate(self.client, url, response).status_code,
+                    200)
+
+        # Комментарий меняет только страницу поста.
+        responses = {url: self.client.get(url) for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Ещё комментарий')
+        self.assertEqual(
+            [self.revalidate(self.client, url, response).status_code
+             for url, response in responses.items()],
+            [304, 304, 304, 200])
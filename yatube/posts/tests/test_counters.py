@@ -0,0 +1,72 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.counters import author_stats
+from posts.models import AuthorStats, Comment, Follow, Post
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='counted')
+        self.reader = User.objects.create_user(username='counting')
+        self.client = Client()
+        self.client.force_login(self.reader)
+        # Строки счётчиков появляются при первом чтении.
+        author_stats(self.author)
+        author_stats(self.reader)
+
+    def stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        self.client.post(
+            reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий'})
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'counted'}))
+
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'counted'}))
+        Comment.objects.filter(post=post).delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_profile_reads_counter(self):
+        Post.objects.create(text='Пост', author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(posts_count=7)
+        response = self.client.get(
+            reverse('posts:profile', kwargs={'username': 'counted'}))
+        self.assertEqual(response.context['post_count'], 7)
+
+    def test_recount_repairs_drift(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(
+            posts_count=5, followers_count=5, following_count=5)
+        Post.objects.update(comments_count=5)
+
+        call_command('recount', stdout=StringIO())
+        author = self.stats(self.author)
+        self.assertEqual(
+            (author.posts_count, author.followers_count,
+             author.following_count),
+            (1, 1, 0))
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
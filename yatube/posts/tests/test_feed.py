@@ -0,0 +1,173 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import feed, timelines
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FeedEntryTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый пост', author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post, pub_date=post.pub_date).exists())
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        for i in range(3):
+            Post.objects.create(text=f'Старый пост {i}', author=self.author)
+        self.client.get(
+            reverse('posts:profile_follow', kwargs={'username': 'writer'}))
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 3)
+
+        self.client.get(
+            reverse('posts:profile_unfollow', kwargs={'username': 'writer'}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    def test_fan_out_is_one_insert(self):
+        for i in range(5):
+            user = User.objects.create_user(username=f'fan{i}')
+            Follow.objects.create(user=user, author=self.author)
+        post = Post.objects.create(text='Пост', author=self.author)
+        FeedEntry.objects.filter(post=post).delete()
+        # Подписчики и вставка, сколько бы их ни было.
+        with self.assertNumQueries(2):
+            feed.fan_out(post)
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 5)
+
+    @override_settings(FEED_MAX_LENGTH=3)
+    def test_trim_only_cuts_long_feeds(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 5)
+        call_command('rebuild_feed', trim_only=True, stdout=StringIO())
+        newest = list(Post.objects.order_by('-pub_date', '-id')[:3])
+        self.assertEqual(
+            [entry.post for entry in FeedEntry.objects.filter(
+                user=self.reader).order_by('-pub_date', '-post_id')],
+            newest
+        )
+
+    @override_settings(FEED_MAX_LENGTH=3)
+    def test_backfill_keeps_feed_length(self):
+        other = User.objects.create_user(username='other_writer')
+        for author in (self.author, other):
+            for i in range(3):
+                Post.objects.create(text=f'Пост {i}', author=author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=other)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 3)
+
+    def test_trim_and_rebuild_command(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(5):
+            Post.objects.create(text=f'Пост {i}', author=self.author)
+        newest = list(Post.objects.order_by('-pub_date', '-id')[:2])
+
+        feed.trim(self.reader.pk, limit=2)
+        self.assertEqual(
+            [entry.post for entry in FeedEntry.objects.filter(
+                user=self.reader)],
+            newest
+        )
+
+        call_command('rebuild_feed', max_length=4, stdout=StringIO())
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 4)
+
+    def test_rebuild_drops_feeds_without_follows(self):
+        post = Post.objects.create(text='Пост', author=self.author)
+        # Подписку убрали в обход сигналов, лента осталась.
+        FeedEntry.objects.create(
+            user=self.reader, post=post, pub_date=post.pub_date)
+        call_command('rebuild_feed', stdout=StringIO())
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+
+class PullFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='pull_reader')
+        cls.authors = [
+            User.objects.create_user(username=f'pull_author_{i}')
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(8):
+            for author in cls.authors:
+                Post.objects.create(text=f'Пост {i}', author=author)
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self):
+        pages = [timelines.follow_page(self.reader, 10)]
+        while pages[-1].has_next():
+            pages.append(timelines.follow_page(
+                self.reader, 10, after=pages[-1].next_cursor))
+        return pages
+
+    def test_merge_matches_query(self):
+        pages = self.walk()
+        self.assertEqual(
+            [post for page in pages for post in page], self.ordered)
+        back = timelines.follow_page(
+            self.reader, 10, before=pages[-1].previous_cursor)
+        self.assertEqual(list(back), self.ordered[10:20])
+
+    def test_timelines_follow_writes(self):
+        timelines.follow_page(self.reader, 10)
+        post = Post.objects.create(text='Свежий', author=self.authors[1])
+        self.assertEqual(timelines.follow_page(self.reader, 10)[0], post)
+        post.delete()
+        self.assertEqual(
+            list(timelines.follow_page(self.reader, 10)), self.ordered[:10])
+
+    def test_concurrent_saves_keep_both_posts(self):
+        timelines.follow_page(self.reader, 10)
+        author = self.authors[1]
+        first = Post.objects.create(text='Первый', author=author)
+        # Второй процесс сохранил пост, прочитав список до первого.
+        stale = cache.get(timelines.TIMELINE_KEY.format(author.pk))
+        second = Post.objects.create(text='Второй', author=author)
+        self.assertIsNone(stale)
+        self.assertEqual(
+            list(timelines.follow_page(self.reader, 10))[:2],
+            [second, first])
+
+    @override_settings(AUTHOR_TIMELINE_LENGTH=5)
+    def test_truncated_timelines_fall_back(self):
+        first = timelines.follow_page(self.reader, 10)
+        self.assertEqual(list(first), self.ordered[:10])
+        self.assertIsNone(timelines.follow_page(
+            self.reader, 10, after=first.next_cursor))
+        client = Client()
+        client.force_login(self.reader)
+        page = client.get(
+            reverse('posts:follow_index'), {'after': first.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(page), self.ordered[10:20])
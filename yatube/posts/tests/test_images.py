@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import images, thumbnails
+from posts.models import Blob, Post
+
+from .utils import MediaTestCase, image_file
+
+# Тег EXIF Orientation: 6 — снимок повёрнут на 90° по часовой
+ORIENTATION = 0x0112
+
+
+def camera_photo(size=(400, 200)):
+    """Снимок с EXIF: поворот и «лишние» метаданные."""
+    exif = Image.Exif()
+    exif[ORIENTATION] = 6
+    exif[0x010F] = 'Camera maker'
+    return image_file('camera.jpeg', size, 'orange', exif=exif)
+
+
+@override_settings(POST_IMAGE_MAX_SIZE=(100, 100))
+class ImageIngestTests(MediaTestCase):
+    username = 'camera'
+
+    def create(self, image):
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'Снимок', 'image': image})
+        return Post.objects.get(text='Снимок')
+
+    def assertNormalized(self, post):
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertTrue(image.info.get('progressive'))
+            # 400x200 повёрнуто в 200x400 и уменьшено в рамку 100x100.
+            self.assertEqual(image.size, (50, 100))
+            self.assertEqual(len(image.getexif()), 0)
+        self.assertEqual(post.image_size, post.image.size)
+        self.assertGreater(post.image_original_size, post.image_size)
+
+    def test_small_upload_normalized_in_form(self):
+        post = self.create(camera_photo())
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        self.assertNormalized(post)
+
+    @override_settings(POST_IMAGE_INLINE_LIMIT=0)
+    def test_large_upload_normalized_in_pool(self):
+        post = self.create(camera_photo())
+        self.assertIsNone(post.image_size)
+        original = post.image.path
+
+        thumbnails.process_post(post.pk)
+        post.refresh_from_db()
+        self.assertNormalized(post)
+        self.assertNotEqual(post.image.path, original)
+
+    @override_settings(POST_IMAGE_INLINE_LIMIT=0)
+    def test_edit_during_normalize_keeps_new_image(self):
+        post = self.create(camera_photo())
+        normalize = images.normalize
+
+        def edited_meanwhile(source):
+            stored = normalize(source)
+            self.client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                {'text': 'Снимок', 'image': image_file('new.png')})
+            return stored
+
+        with mock.patch('posts.images.normalize', edited_meanwhile):
+            self.assertFalse(thumbnails.process_post(post.pk))
+        edited = Post.objects.get(pk=post.pk).image.name
+        self.assertTrue(edited.endswith('.png'))
+        self.assertEqual(Blob.objects.get(name=edited).refs, 1)
+        self.assertEqual(Blob.objects.get(name=post.image.name).refs, 0)
+        self.assertFalse(Blob.objects.filter(
+            name__endswith='.jpg', refs__gt=0).exists())
+
+    def test_transparent_png_flattened(self):
+        post = self.create(image_file(
+            'clear.png', (20, 20), (255, 0, 0, 0), mode='RGBA'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.mode, 'RGB')
+            self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
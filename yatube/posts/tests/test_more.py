@@ -0,0 +1,103 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import rendered, selectors, views
+from posts.models import Follow, Group, Post
+from posts.versions import bump_feed_version
+
+User = get_user_model()
+
+
+class MorePostsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.posts = [
+            Post.objects.create(author=self.author, group=self.group,
+                                text=f'Пост номер {i}')
+            for i in range(views.POSTS_PER_PAGE + 3)
+        ]
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_feeds_continue_with_post_fragments(self):
+        pages = {
+            reverse('posts:index'): reverse('posts:index_more'),
+            reverse('posts:group_posts', args=['group']):
+                reverse('posts:group_more', args=['group']),
+            reverse('posts:profile', args=['writer']):
+                reverse('posts:profile_more', args=['writer']),
+            reverse('posts:follow_index'): reverse('posts:follow_more'),
+        }
+        for url, more_url in pages.items():
+            with self.subTest(url=url):
+                page = self.client.get(url)
+                cursor = page.context['page_obj'].next_cursor
+                self.assertContains(
+                    page, f'data-more="{more_url}?after={cursor}"')
+                response = self.client.get(more_url, {'after': cursor})
+                self.assertNotContains(response, '<html')
+                self.assertContains(response, '<article>', count=3)
+                self.assertNotContains(response, 'js-more-posts')
+                # Под постом то же, что на странице ленты.
+                group_link = reverse('posts:group_posts', args=['group'])
+                self.assertContains(
+                    response, group_link,
+                    count=0 if 'group' in url else 3)
+                html = response.content.decode()
+                for post in self.posts[:3]:
+                    self.assertIn(post.text, html)
+                self.assertNotIn(self.posts[3].text + '<', html)
+
+    def test_cached_fragments_cost_one_query(self):
+        url = reverse('posts:index_more')
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'js-more-posts')
+
+    def rows(self, posts=None):
+        ids = [post.pk for post in posts or self.posts[:2]]
+        found = selectors.feed_rows(ids)
+        return [found[pk] for pk in ids if pk in found]
+
+    def test_changed_post_is_rendered_again(self):
+        rendered.render_posts(self.rows())
+        post = self.posts[0]
+        Post.objects.filter(pk=post.pk).update(text='Обход сигналов')
+        # update() не меняет updated_at: в кэше прежний текст.
+        self.assertIn('Пост номер 0',
+                      rendered.render_posts(self.rows())[post.pk])
+        post.text = 'Исправленный текст'
+        post.save()
+        html = rendered.render_posts(self.rows())
+        self.assertIn('Исправленный текст', html[post.pk])
+        self.assertIn('Пост номер 1', html[self.posts[1].pk])
+
+    def test_renamed_author_is_rendered_again(self):
+        post = self.posts[0]
+        rendered.render_posts(self.rows([post]))
+        self.author.first_name = 'Лев'
+        self.author.save()
+        self.assertIn('Лев', rendered.render_posts(self.rows([post]))[post.pk])
+
+    def test_feed_page_renders_only_missing_posts(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        cache.delete(rendered.cache_key(self.rows(self.posts[-1:])[0]))
+        # Новая версия ленты: копия страницы не подойдёт.
+        bump_feed_version()
+        with mock.patch('posts.rendered.render_to_string',
+                        wraps=render_to_string) as render:
+            response = self.client.get(url)
+        self.assertEqual(render.call_count, 1)
+        self.assertContains(response, '<article>',
+                            count=views.POSTS_PER_PAGE)
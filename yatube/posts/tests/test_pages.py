@@ -0,0 +1,132 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class SharedPageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='')
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост')
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_posts', args=['group']),
+            reverse('posts:profile', args=['writer']),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+
+    def test_one_copy_serves_everyone(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                page = self.guest.get(url).content
+                self.assertEqual(self.client.get(url).content, page)
+                self.assertNotIn(b'reader', page)
+                self.assertNotIn(b'csrfmiddlewaretoken', page)
+        page = self.guest.get(self.urls[3]).content.decode()
+        self.assertIn(f'data-fragment="edit:{self.post.pk}"', page)
+        self.assertIn(f'data-comment="{self.comment.pk}"', page)
+        self.assertIn(f'data-fragment="reply:{self.post.pk}"', page)
+
+    def test_cached_page_skips_view_queries(self):
+        url = self.urls[2]
+        self.guest.get(url)
+        # Сессия не заведена: версии лент, автор для 404 и сама
+        # страница из общего кэша.
+        with self.assertNumQueries(3):
+            self.guest.get(url)
+
+    def test_unread_params_share_one_copy(self):
+        url = self.urls[0]
+        self.guest.get(url)
+        # Версии лент и страница из общего кэша.
+        with self.assertNumQueries(2):
+            self.guest.get(url, {'utm_source': 'mail', 'after': 'junk'})
+        self.assertEqual(
+            self.guest.get(url, {'page': 'x'}).content,
+            self.guest.get(url, {'page': '1', 'ref': 'y'}).content)
+        with self.assertNumQueries(2):
+            self.guest.get(url, {'page': '1', 'ref': 'z'})
+
+    def test_signals_invalidate_pages(self):
+        detail = self.guest.get(self.urls[3]).content
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Новый ответ')
+        self.assertIn('Новый ответ',
+                      self.guest.get(self.urls[3]).content.decode())
+        self.assertNotEqual(self.guest.get(self.urls[3]).content, detail)
+
+        self.assertContains(self.guest.get(self.urls[2]), 'Подписчиков: 0')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.guest.get(self.urls[2]), 'Подписчиков: 1')
+
+    def test_group_slug_change_invalidates_pages(self):
+        pages = (self.urls[0], self.urls[2], self.urls[3])
+        for url in pages:
+            self.assertContains(self.guest.get(url), '/group/group/')
+        self.group.slug = 'renamed'
+        self.group.save()
+        for url in pages:
+            with self.subTest(url=url):
+                self.assertContains(self.guest.get(url), '/group/renamed/')
+        self.assertContains(self.guest.get(self.urls[3]), 'Группа')
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertContains(self.guest.get(self.urls[3]), 'Новое название')
+
+    def test_reply_form_is_one_fragment(self):
+        for i in range(3):
+            Comment.objects.create(
+                post=self.post, author=self.author, text=f'Ещё {i}')
+        page = self.guest.get(self.urls[3]).content.decode()
+        name = f'reply:{self.post.pk}'
+        self.assertEqual(page.count(f'data-fragment="{name}"'), 4)
+        found = self.client.get(
+            reverse('posts:fragments'), {'name': name}).json()['fragments']
+        self.assertIn('name="parent" value=""', found[name])
+
+        # Вне общей страницы форма сразу знает свой комментарий.
+        inline = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]))
+        self.assertContains(
+            inline, f'name="parent" value="{self.comment.pk}"')
+
+    def test_fragments_for_current_user(self):
+        names = ['nav', 'follow:writer', f'edit:{self.post.pk}',
+                 f'comment-form:{self.post.pk}', 'edit:x', 'unknown']
+        response = self.client.get(
+            reverse('posts:fragments'), {'name': names})
+        self.assertIn('no-cache', response['Cache-Control'])
+        found = response.json()['fragments']
+        self.assertEqual(set(found), set(names[:4]))
+        self.assertIn('Пользователь: reader', found['nav'])
+        self.assertIn(reverse('posts:profile_follow', args=['writer']),
+                      found['follow:writer'])
+        self.assertNotIn('редактировать', found[f'edit:{self.post.pk}'])
+        self.assertIn('csrfmiddlewaretoken',
+                      found[f'comment-form:{self.post.pk}'])
+
+        author = Client()
+        author.force_login(self.author)
+        found = author.get(
+            reverse('posts:fragments'),
+            {'name': f'edit:{self.post.pk}'}).json()['fragments']
+        self.assertIn(reverse('posts:post_edit', args=[self.post.pk]),
+                      found[f'edit:{self.post.pk}'])
+
+    def test_private_pages_render_fragments_inline(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'data-fragment="')
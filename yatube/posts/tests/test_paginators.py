@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.counters import recount_authors
+from posts.feed import estimate_length
+from posts.models import Follow, Group, Post
+from posts.paginators import (ELLIPSIS, CursorPaginator, FeedPaginator,
+                              decode_cursor, encode_cursor)
+
+User = get_user_model()
+
+
+class CursorPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='cursor_user')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(25)
+        )
+        # bulk_create ставит почти одинаковые pub_date, порядок
+        # внутри одной даты держит id.
+        cls.ordered = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_cursor_roundtrip(self):
+        post = self.ordered[0]
+        self.assertEqual(
+            decode_cursor(encode_cursor(post.pub_date, post.pk)),
+            (post.pub_date, post.pk)
+        )
+        self.assertIsNone(decode_cursor('не-курсор'))
+
+    def test_walk_forward_and_back(self):
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first = paginator.get_cursor_page()
+        self.assertEqual(list(first), self.ordered[:10])
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        second = paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(list(second), self.ordered[10:20])
+
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        last = paginator.get_cursor_page(after=second.next_cursor)
+        self.assertEqual(list(last), self.ordered[20:])
+        self.assertFalse(last.has_next())
+
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        back = paginator.get_cursor_page(before=last.previous_cursor)
+        self.assertEqual(list(back), self.ordered[10:20])
+        self.assertTrue(back.has_previous())
+
+    def test_views_follow_cursor(self):
+        url = reverse('posts:profile', kwargs={'username': 'cursor_user'})
+        response = self.client.get(url)
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertContains(response, f'?after={next_cursor}')
+        response = self.client.get(url, {'after': next_cursor})
+        self.assertEqual(
+            list(response.context['page_obj']), self.ordered[10:20])
+
+    def test_numbered_fallback(self):
+        response = self.client.get(reverse('posts:index'), {'page': 3})
+        self.assertEqual(response.context['page_obj'].number, 3)
+        self.assertEqual(len(response.context['page_obj']), 5)
+
+
+class FeedPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='numbered_user')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user) for i in range(30))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_elided_page_range(self):
+        paginator = FeedPaginator(Post.objects.all(), 1, count=20)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(10)),
+            [1, ELLIPSIS, 8, 9, 10, 11, 12, ELLIPSIS, 20])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(2)),
+            [1, 2, 3, 4, ELLIPSIS, 20])
+        paginator = FeedPaginator(Post.objects.all(), 1, count=5)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(3)), [1, 2, 3, 4, 5])
+
+    def test_count_is_cached(self):
+        FeedPaginator(Post.objects.all(), 10, count_key='test').get_page(1)
+        self.assertEqual(cache.get('feed_count:test'), 30)
+        cache.set('feed_count:test', 42)
+        paginator = FeedPaginator(Post.objects.all(), 10, count_key='test')
+        self.assertEqual(paginator.num_pages, 5)
+
+    def test_estimate_is_corrected(self):
+        paginator = FeedPaginator(
+            Post.objects.all(), 10, count=1000, estimated=True)
+        self.assertEqual(paginator.num_pages, 100)
+        page = paginator.get_page(50)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 10)
+
+        page = FeedPaginator(
+            Post.objects.all(), 10, count=5, estimated=True).get_page(3)
+        self.assertEqual(len(page), 10)
+
+    def test_follow_length_from_counters(self):
+        reader = User.objects.create_user(username='numbered_reader')
+        Follow.objects.create(user=reader, author=self.user)
+        # bulk_create обходит сигналы, счётчики считаем вручную.
+        recount_authors()
+        self.assertEqual(estimate_length(reader.pk), 30)
+        with self.settings(FEED_MAX_LENGTH=20):
+            self.assertEqual(estimate_length(reader.pk), 20)
+
+    def test_template_renders_window(self):
+        response = self.client.get(reverse('posts:index'), {'page': 2})
+        self.assertEqual(
+            response.context['page_obj'].paginator.page_window, [1, 2, 3])
+
+    def test_group_count_follows_new_posts(self):
+        group = Group.objects.create(
+            title='Группа', slug='numbered_group', description='-')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.user, group=group)
+            for i in range(10))
+        url = reverse('posts:group_posts', args=[group.slug])
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        # Новый пост поднимает версию группы, счётчик берётся заново.
+        Post.objects.create(text='Ещё пост', author=self.user, group=group)
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(response.context['page_obj'].number, 2)
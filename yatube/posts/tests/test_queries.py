@@ -0,0 +1,103 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import counters, feed, threads
+from posts.models import Comment, Follow, Group, Post
+from posts.views import POSTS_PER_PAGE
+
+from .utils import QueryBudgetMixin
+
+User = get_user_model()
+
+# Бюджеты не зависят от числа строк: если шаблон начнёт ходить в базу
+# за каждым постом или комментарием, тест упадёт уже на 10 строках.
+BUDGETS = {
+    'index': 2,
+    'group': 2,
+    'profile': 6,
+    'post_detail': 6,
+    'follow': 6,
+}
+# Запросы к кэшу в базе на холодном кэше: (чтения, записи). Читается
+# всё пачками через get_many, а DatabaseCache.set стоит три запроса на
+# ключ: COUNT(*) перед вытеснением, SELECT записи и INSERT или UPDATE.
+# Общие ленты пишут версию, время изменения, блокировку и саму
+# страницу; лента подписок вместо блокировки и страницы — хронику
+# автора (timelines.py). Главная рисует первой и кладёт в кэш посты
+# страницы, остальные берут их оттуда.
+SET_QUERIES = 3
+CACHE_BUDGETS = {
+    'index': (6, 4 + POSTS_PER_PAGE),
+    'group': (5, 4),
+    'profile': (5, 4),
+    'post_detail': (5, 4),
+    'follow': (3, 3),
+}
+
+
+def cache_budget(name):
+    reads, writes = CACHE_BUDGETS[name]
+    return reads + SET_QUERIES * writes
+
+
+class FeedQueryBudgetTests(QueryBudgetMixin, TestCase):
+    def fill(self, rows):
+        self.author = User.objects.create_user(
+            username='budget_author', first_name='Имя', last_name='Фамилия')
+        self.reader = User.objects.create_user(username='budget_reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='budget', description='Описание')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author, group=self.group)
+            for i in range(rows))
+        self.post = Post.objects.first()
+        # Половина комментариев — корни, половина — ответы на них; пути
+        # bulk_create не пишет, их проставляет assign_path.
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text=f'Корень {i}')
+            for i in range(rows // 2))
+        roots = list(Comment.objects.filter(post=self.post))
+        for root in roots:
+            threads.assign_path(root)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, parent=root,
+                    text=f'Ответ {i}')
+            for i, root in enumerate(roots))
+        for reply in Comment.objects.filter(
+                post=self.post, path='').select_related('parent'):
+            threads.assign_path(reply)
+        Follow.objects.create(user=self.reader, author=self.author)
+        feed.rebuild(self.reader.pk)
+        counters.recount_authors()
+        cache.clear()
+
+    def check_budgets(self, rows):
+        self.fill(rows)
+        client = Client()
+        client.force_login(self.reader)
+        urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_posts', kwargs={'slug': 'budget'}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'budget_author'}),
+            'post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': self.post.pk}),
+            'follow': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            # Сессия и пользователь — это два запроса middleware.
+            with self.subTest(view=name, rows=rows):
+                with self.assertQueryBudget(
+                        BUDGETS[name] + 2, name, cache_budget(name)):
+                    response = client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_10_rows(self):
+        self.check_budgets(10)
+
+    def test_100_rows(self):
+        self.check_budgets(100)
+
+    def test_1000_rows(self):
+        self.check_budgets(1000)
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts import selectors
+from posts.models import Group, Post
+from posts.rows import FeedRow
+
+User = get_user_model()
+
+
+class FeedRowTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='row_author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Классика', slug='classic', description='')
+        cls.with_group = Post.objects.create(
+            text='Пост в группе', author=cls.author, group=cls.group)
+        cls.without_group = Post.objects.create(
+            text='Пост без группы', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rows_match_models(self):
+        Post.objects.filter(pk=self.with_group.pk).update(
+            image='posts/row.jpg')
+        rows = selectors.feed_rows(
+            [self.with_group.pk, self.without_group.pk])
+        row = rows[self.with_group.pk]
+        self.assertIsInstance(row, FeedRow)
+        self.assertEqual(row, self.with_group)
+        self.assertEqual(row.author, self.author)
+        self.assertEqual(row.group, self.group)
+        self.assertEqual(row.author.get_full_name(), 'Лев Толстой')
+        self.assertEqual(row.image.name, 'posts/row.jpg')
+        empty = rows[self.without_group.pk]
+        self.assertIsNone(empty.group)
+        self.assertFalse(empty.image)
+        self.assertNotEqual(row, empty)
+
+    def test_feed_renders_rows(self):
+        response = Client().get(reverse(
+            'posts:profile', kwargs={'username': 'row_author'}))
+        self.assertIsInstance(response.context['page_obj'][0], FeedRow)
+        self.assertContains(response, 'Лев Толстой')
+        self.assertContains(response, reverse(
+            'posts:group_posts', kwargs={'slug': 'classic'}))
+        self.assertContains(response, reverse(
+            'posts:post_detail', kwargs={'post_id': self.with_group.pk}))
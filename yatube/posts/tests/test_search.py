@@ -0,0 +1,127 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts import search
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.author = User.objects.create_user(username='searcher')
+        self.other = User.objects.create_user(username='other')
+        self.group = Group.objects.create(
+            title='Сады', slug='gardens', description='')
+        self.roses = Post.objects.create(
+            author=self.author, group=self.group,
+            text='Розы в саду цветут. Розы пахнут, розы колются.')
+        self.rose = Post.objects.create(
+            author=self.other, text='Одна роза и много тюльпанов <b>.')
+        self.tulips = Post.objects.create(
+            author=self.other, text='Только тюльпаны.')
+
+    def found(self, **params):
+        response = self.client.get(reverse('posts:search'), params)
+        self.assertEqual(response.status_code, 200)
+        return [result.post for result in response.context['page_obj']]
+
+    def test_ranked_by_relevance_with_highlight(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'розы'})
+        results = list(response.context['page_obj'])
+        self.assertEqual([result.post for result in results], [self.roses])
+        self.assertIn('<mark>Розы</mark>', results[0].snippet)
+
+        self.assertEqual(self.found(q='тюльп'), [self.tulips, self.rose])
+
+    def test_snippet_is_escaped(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'одна'})
+        self.assertContains(response, '<mark>Одна</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_filters_by_group_and_author(self):
+        self.assertEqual(self.found(q='роз', group='gardens'), [self.roses])
+        self.assertEqual(self.found(q='роз', author='other'), [self.rose])
+        self.assertEqual(self.found(q='роз', author='nobody'), [])
+        self.assertEqual(self.found(q='роз', group='nowhere'), [])
+
+    def test_query_syntax_is_not_passed_to_fts(self):
+        self.assertEqual(self.found(q='"розы" (сад:'), [self.roses])
+        self.assertEqual(self.found(q='  '), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.rose.text = 'Одни пионы.'
+        self.rose.save()
+        Post.objects.filter(pk=self.tulips.pk).update(text='Пионы')
+        self.assertEqual(self.found(q='тюльпаны'), [])
+        self.assertEqual(
+            {post.id for post in self.found(q='пионы')},
+            {self.rose.pk, self.tulips.pk})
+        self.rose.delete()
+        self.assertEqual(self.found(q='пионы'), [self.tulips])
+
+    def test_cursor_pages_cover_all_results(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост про сирень номер {i}')
+            for i in range(25))
+        seen = []
+        params = {'q': 'сирень'}
+        while True:
+            response = self.client.get(reverse('posts:search'), params)
+            page_obj = response.context['page_obj']
+            seen += [result.id for result in page_obj]
+            if not page_obj.has_next():
+                break
+            self.assertContains(
+                response, f'?q=%D1%81%D0%B8%D1%80%D0%B5%D0%BD%D1%8C&amp;'
+                          f'after={page_obj.next_cursor}')
+            params = {'q': 'сирень', 'after': page_obj.next_cursor}
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+        back = self.client.get(reverse('posts:search'), {
+            'q': 'сирень', 'before': page_obj.previous_cursor})
+        self.assertEqual(
+            [result.id for result in back.context['page_obj']], seen[10:20])
+
+    @override_settings(SEARCH_RANK_WINDOW=5)
+    def test_ranking_limited_to_newest_matches(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост про сирень номер {i}')
+            for i in range(25))
+        newest = Post.objects.filter(text__contains='сирень').order_by(
+            '-id').values_list('id', flat=True)[:5]
+        response = self.client.get(reverse('posts:search'), {'q': 'сирень'})
+        self.assertEqual(
+            {result.id for result in response.context['page_obj']},
+            set(newest))
+        self.assertTrue(response.context['page_obj'].truncated)
+        self.assertContains(response, 'Уточните запрос')
+
+        response = self.client.get(reverse('posts:search'), {'q': 'розы'})
+        self.assertFalse(response.context['page_obj'].truncated)
+        self.assertNotContains(response, 'Уточните запрос')
+
+    def test_admin_search_finds_every_match(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'тюльпан'})
+        self.assertEqual(set(response.context['cl'].result_list),
+                         {self.rose, self.tulips})
+
+    def test_rebuild_restores_index_and_triggers(self):
+        with connection.cursor() as cursor:
+            search.uninstall(cursor)
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.found(q='розы'), [self.roses])
+        Post.objects.create(author=self.author, text='Розовые розы')
+        self.assertEqual(len(self.found(q='розы')), 2)
@@ -0,0 +1,162 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from posts import kvstore, rendered, selectors, thumbnails
+from posts.models import Post
+
+from .utils import MediaTestCase, QueryBudgetMixin, image_file
+
+User = get_user_model()
+
+
+def run_on_commit(func):
+    func()
+
+
+class ThumbnailTests(MediaTestCase):
+    username = 'photographer'
+
+    def test_generate_builds_every_geometry(self):
+        post = Post.objects.create(
+            text='Фото', author=self.user, image=image_file('photo.jpg'))
+        names = thumbnails.generate(post.image.name)
+        self.assertEqual(len(names), len(thumbnails.THUMBNAILS))
+        for name in names:
+            self.assertTrue(default_storage.exists(name))
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_on_commit)
+    @mock.patch('posts.thumbnails.submit')
+    def test_create_and_edit_schedule_thumbnails(self, submit):
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'С картинкой', 'image': image_file('photo.jpg')})
+        post = Post.objects.get(text='С картинкой')
+        submit.assert_called_once_with(thumbnails.process_post, post.pk)
+
+        submit.reset_mock()
+        edit = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+        self.client.post(edit, {'text': 'Только текст'})
+        submit.assert_not_called()
+        self.client.post(edit,
+                         {'text': 'Новая', 'image': image_file('new.jpg')})
+        submit.assert_called_once_with(thumbnails.process_post, post.pk)
+
+    def test_backfill_command(self):
+        for i in range(3):
+            Post.objects.create(text=f'Фото {i}', author=self.user,
+                                image=image_file(f'photo_{i}.jpg'))
+        Post.objects.create(text='Без картинки', author=self.user)
+        out = StringIO()
+        with mock.patch('posts.thumbnails.generate') as generate:
+            call_command('generate_thumbnails', workers=0, stdout=out)
+        self.assertEqual(generate.call_count, 3)
+        self.assertIn('для 3 картинок, ошибок: 0', out.getvalue())
+
+
+class PrefetchTests(QueryBudgetMixin, MediaTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='gallery')
+        cls.posts = [
+            Post.objects.create(text=f'Фото {i}', author=cls.user,
+                                image=image_file(f'gallery_{i}.jpg'))
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        kvstore.clear_memo()
+        self.thumbs = [thumbnails.generate(post.image.name)[0]
+                       for post in self.posts]
+        cache.clear()
+
+    def test_page_thumbnails_come_from_one_prefetch(self):
+        with mock.patch(
+            'sorl.thumbnail.kvstores.cached_db_kvstore.KVStore._get_raw'
+        ) as single_lookup:
+            response = Client().get(
+                reverse('posts:profile', kwargs={'username': 'gallery'}))
+        single_lookup.assert_not_called()
+        for name in self.thumbs:
+            self.assertContains(response, name)
+
+    def test_prefetch_batches_lookups(self):
+        # Кэш пуст: один SELECT по таблице хранилища на всю страницу,
+        # одно чтение кэша и запись найденного обратно (по три запроса
+        # DatabaseCache на каждую из шести миниатюр).
+        with self.assertQueryBudget(1, 'prefetch', cache_budget=19):
+            kvstore.prefetch(self.posts)
+        with self.assertQueryBudget(0, 'prefetch again'):
+            kvstore.prefetch(self.posts)
+
+
+class ResponsiveImageTests(MediaTestCase):
+    username = 'responsive'
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(
+            text='Фото', author=self.user,
+            image=image_file('photo.jpg', (1200, 800)))
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_on_commit)
+    @mock.patch('posts.thumbnails.submit')
+    def test_missing_variants_are_scheduled(self, submit):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        with mock.patch('sorl.thumbnail.get_thumbnail') as get_thumbnail:
+            response = Client().get(url)
+        get_thumbnail.assert_not_called()
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        self.assertNotContains(response, '<picture>')
+        submit.assert_called_once_with(thumbnails.process_post, self.post.pk)
+        Client().get(url)
+        submit.assert_called_once()
+
+    @mock.patch('posts.thumbnails.submit')
+    def test_built_variants_refresh_cached_pages(self, submit):
+        # Картинка уже обработана: остаётся только построить варианты.
+        Post.objects.filter(pk=self.post.pk).update(image_size=1)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertNotContains(response, '<picture>')
+
+        self.assertTrue(thumbnails.process_post(self.post.pk))
+        again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, '<picture>')
+
+    @mock.patch('posts.thumbnails.submit')
+    def test_fragment_without_variants_is_not_cached(self, submit):
+        row = selectors.feed_rows([self.post.pk])[self.post.pk]
+        self.assertNotIn('<picture>', rendered.render_posts([row])[row.id])
+        self.assertIsNone(cache.get(rendered.cache_key(row)))
+
+        thumbnails.generate(self.post.image.name)
+        self.assertIn('<picture>', rendered.render_posts([row])[row.id])
+        self.assertIsNotNone(cache.get(rendered.cache_key(row)))
+
+    def test_post_renders_srcset_variants(self):
+        thumbnails.generate(self.post.image.name)
+        response = Client().get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}))
+        html = response.content.decode()
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('width="960" height="339"', html)
+        for width in thumbnails.VARIANT_WIDTHS:
+            self.assertIn(f'.webp {width}w', html)
+            self.assertIn(f'.jpg {width}w', html)
+
+    def test_report_counts_saved_bytes(self):
+        out = StringIO()
+        call_command('thumbnail_report', width=320, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        before, after = map(float, lines[1].split()[1:3])
+        self.assertLess(after, before)
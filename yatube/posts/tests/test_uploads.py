@@ -0,0 +1,158 @@
+import os
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.http import HttpRequest
+from django.test import override_settings
+from django.urls import reverse
+from PIL import Image
+from posts import uploads
+from posts.models import Post, Upload
+
+from .utils import MediaTestCase, image_file
+
+User = get_user_model()
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_MAX_SIZE=1000,
+                   POST_IMAGE_UPLOAD_MAX_SIZE=100000)
+class ChunkedUploadTests(MediaTestCase):
+    username = 'uploader'
+
+    def setUp(self):
+        super().setUp()
+        self.upload_dir = os.path.join(self.media_root, 'chunks')
+        chunks = self.settings(CHUNKED_UPLOAD_DIR=self.upload_dir)
+        chunks.enable()
+        self.addCleanup(chunks.disable)
+        self.data = image_file('photo.png', (300, 200), 'navy').read()
+
+    def start(self, size=None):
+        response = self.client.post(reverse('posts:upload_start'), {
+            'filename': 'photo.png',
+            'size': len(self.data) if size is None else size,
+        })
+        return response
+
+    def put(self, upload_id, offset, chunk):
+        return self.client.put(
+            reverse('posts:upload_chunk', kwargs={'upload_id': upload_id})
+            + f'?offset={offset}',
+            data=chunk, content_type='application/octet-stream')
+
+    def send_all(self, upload_id, offset=0, step=1000):
+        while offset < len(self.data):
+            response = self.put(
+                upload_id, offset, self.data[offset:offset + step])
+            self.assertEqual(response.status_code, 200)
+            offset = response.json()['offset']
+
+    def test_resumable_upload_attached_to_post(self):
+        upload_id = self.start().json()['id']
+        # Первый кусок доходит наполовину — клиент спрашивает смещение
+        # и продолжает с него.
+        self.put(upload_id, 0, self.data[:400])
+        status = self.client.get(reverse(
+            'posts:upload_chunk', kwargs={'upload_id': upload_id}))
+        self.assertEqual(status.json()['offset'], 400)
+        response = self.put(upload_id, 100, self.data[100:200])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['offset'], 400)
+        self.send_all(upload_id, offset=400)
+
+        response = self.client.post(reverse(
+            'posts:upload_commit', kwargs={'upload_id': upload_id}))
+        self.assertEqual(response.status_code, 200)
+
+        self.client.post(reverse('posts:post_create'),
+                         {'text': 'По частям', 'upload': upload_id})
+        post = Post.objects.get(text='По частям')
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (300, 200))
+        self.assertEqual(post.image_original_size, len(self.data))
+        self.assertFalse(Upload.objects.exists())
+        self.assertNotIn(f'{upload_id}.part', os.listdir(self.upload_dir))
+
+    def test_limits_checked_before_bytes(self):
+        self.assertEqual(self.start(size=100001).status_code, 413)
+        upload_id = self.start().json()['id']
+        self.assertEqual(self.put(upload_id, 0, b'x' * 1001).status_code,
+                         413)
+
+    def test_chunked_body_without_content_length(self):
+        upload_id = self.start().json()['id']
+        url = reverse('posts:upload_chunk', kwargs={'upload_id': upload_id})
+
+        def put(offset, chunk):
+            # Transfer-Encoding: chunked — длины в заголовках нет.
+            return self.client.generic(
+                'PUT', f'{url}?offset={offset}', chunk,
+                'application/octet-stream', CONTENT_LENGTH='',
+                **{'wsgi.input': BytesIO(chunk),
+                   'wsgi.input_terminated': True})
+
+        response = put(0, self.data[:500])
+        self.assertEqual(response.json()['offset'], 500)
+        response = put(500, b'x' * 1001)
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(Upload.objects.get(pk=upload_id).received, 500)
+        self.assertEqual(
+            os.path.getsize(
+                os.path.join(self.upload_dir, f'{upload_id}.part')),
+            500)
+
+    def test_upload_file_closed_when_form_invalid(self):
+        upload = uploads.start(self.user, 'photo.png', len(self.data))
+        self.send_all(upload.pk)
+        upload.refresh_from_db()
+        uploads.commit(upload)
+        with mock.patch('posts.uploads.open_file',
+                        side_effect=uploads.open_file) as open_file:
+            response = self.client.post(reverse('posts:post_create'),
+                                        {'text': '', 'upload': upload.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(open_file.call_args[0][0].file.closed)
+
+    def test_commit_rejects_incomplete_and_non_images(self):
+        upload_id = self.start().json()['id']
+        commit = reverse(
+            'posts:upload_commit', kwargs={'upload_id': upload_id})
+        self.put(upload_id, 0, self.data[:10])
+        self.assertEqual(self.client.post(commit).status_code, 409)
+
+        self.data = b'not an image'
+        upload_id = self.start().json()['id']
+        self.send_all(upload_id)
+        response = self.client.post(reverse(
+            'posts:upload_commit', kwargs={'upload_id': upload_id}))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Upload.objects.filter(pk=upload_id).exists())
+
+    def test_foreign_or_unfinished_upload_not_attached(self):
+        other = User.objects.create_user(username='stranger')
+        upload = uploads.start(other, 'photo.png', len(self.data))
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Чужая', 'upload': upload.pk})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(reverse('posts:post_create'),
+                                    {'text': 'Битая', 'upload': 'zzz'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_multipart_upload_over_limit_rejected(self):
+        image = image_file('big.png', (1000, 1000), 'navy')
+        with override_settings(POST_IMAGE_UPLOAD_MAX_SIZE=1000):
+            response = self.client.post(reverse('posts:post_create'),
+                                        {'text': 'Большая', 'image': image})
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка слишком большая')
+        self.assertFalse(Post.objects.filter(text='Большая').exists())
+
+    def test_handler_stops_at_limit(self):
+        handler = uploads.LimitedUploadHandler(HttpRequest())
+        with override_settings(POST_IMAGE_UPLOAD_MAX_SIZE=100):
+            handler.new_file('image', 'big.png', 'image/png', 1000)
+        handler.receive_data_chunk(b'x' * 100, 0)
+        with self.assertRaises(uploads.StopUpload):
+            handler.receive_data_chunk(b'x', 100)
+        self.assertEqual(handler.request._uploads_too_large, {'image'})
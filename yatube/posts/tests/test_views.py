@@ -239,8 +239,9 @@ class PostPagesTests(TestCase):
 
 
 class CacheViwesTest(TestCase):
-    ''' При удалении записи из базы, она остаётся в response.content главной
-    страницы до тех пор, пока кэш не будет очищен принудительно.'''
+    ''' Главная страница кэшируется по номеру страницы и версии ленты:
+    правка в обход сигналов не видна до истечения кэша, а сохранение или
+    удаление поста сразу меняет версию и сбрасывает страницы.'''
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
@@ -257,36 +258,33 @@ class CacheViwesTest(TestCase):
 
     def setUp(self):
         self.guest_client = Client()
+        cache.clear()
 
     def test_index_page_cache(self):
-        created_post = Post.objects.filter(pk=CacheViwesTest.post.pk)
-        # Проверка существования поста в базе данных
-        self.assertTrue(created_post.exists(),
-                        'Пост отстутствует в базе данных')
-        # Проверка существования поста на стартовой странице
-        response = self.guest_client.get(
-            reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
         self.assertIn(CacheViwesTest.post, response.context['page_obj'
                                                             ].object_list,
                       'Пост отсутствует на главной странице')
-        # Контент стартовой страницы до удаления поста
         page_content = response.content
-        # Удаление поста
+        # update() не шлёт сигналов, версия ленты прежняя
+        Post.objects.filter(pk=CacheViwesTest.post.pk).update(
+            text='Текст изменён в обход сигналов')
+        self.assertEqual(
+            page_content,
+            self.guest_client.get(reverse('posts:index')).content,
+            'Кеширование не работает')
+
         CacheViwesTest.post.delete()
-        # Проверка существования поста в базе данных после удаления
-        self.assertFalse(created_post.exists(),
-                         'Пост не удален в базе данных')
-        # Контент стартовой страницы после удаления поста
-        page_content_after_delete = self.guest_client.get(
-            reverse('posts:index')).content
-        # Сравнение контента страницы до и после удаления поста
-        self.assertEqual(page_content, page_content_after_delete,
-                         'Кеширование не работает')
-        # Очистка кеша
-        cache.clear()
-        # Контент стартовой страницы после очистки кеша
-        page_content_after_cache_clear = self.guest_client.get(
-            reverse('posts:index')).content
-        # Сравнение контента страницы до и после удаления после очистки кэша
-        self.assertNotEqual(page_content_after_delete,
-                            page_content_after_cache_clear)
+        self.assertNotEqual(
+            page_content,
+            self.guest_client.get(reverse('posts:index')).content,
+            'Удаление поста не сбросило кэш главной страницы')
+
+    def test_index_pages_cached_separately(self):
+        for i in range(12):
+            Post.objects.create(text=f'Пост {i}', author=self.author_user)
+        first = self.guest_client.get(reverse('posts:index'))
+        second = self.guest_client.get(
+            reverse('posts:index'), {'page': 2})
+        self.assertNotEqual(first.content, second.content)
+        self.assertEqual(len(second.context['page_obj']), 3)
@@ -0,0 +1,103 @@
+import mimetypes
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+User = get_user_model()
+
+
+def _is_savepoint(sql):
+    return sql.startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+
+
+def _is_cache_query(sql):
+    return any(
+        params.get('LOCATION', '') and params['LOCATION'] in sql
+        for params in settings.CACHES.values()
+        if params['BACKEND'].endswith('DatabaseCache')
+    )
+
+
+class QueryBudgetMixin:
+    """Проверка, что view укладывается в бюджет SQL-запросов.
+
+    Запросы к таблице кэша считаются отдельно от остальных, со своим
+    бюджетом cache_budget: кэш в базе — это тоже запросы, и ни те, ни
+    другие не должны расти с числом строк в ленте. Точки сохранения
+    транзакций не считаются.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, label='', cache_budget=0):
+        with CaptureQueriesContext(connection) as context:
+            yield
+        queries = [query['sql'] for query in context.captured_queries
+                   if not _is_savepoint(query['sql'])]
+        cached = [sql for sql in queries if _is_cache_query(sql)]
+        queries = [sql for sql in queries if not _is_cache_query(sql)]
+        for kind, found, limit in (('SQL', queries, budget),
+                                   ('кэш', cached, cache_budget)):
+            if len(found) > limit:
+                self.fail(
+                    f'{label}: {len(found)} запросов ({kind}) при бюджете '
+                    f'{limit}:\n' + '\n'.join(found))
+
+
+def image_file(name='image.png', size=(120, 80), color='teal', mode='RGB',
+               **save_kwargs):
+    """Картинка в памяти для загрузки; формат — по расширению имени."""
+    buffer = BytesIO()
+    extension = os.path.splitext(name)[1].lower()
+    Image.new(mode, size, color).save(
+        buffer, Image.registered_extensions()[extension], **save_kwargs)
+    return SimpleUploadedFile(
+        name, buffer.getvalue(), mimetypes.guess_type(name)[0])
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class MediaTestCase(TestCase):
+    """Тесты с загрузкой картинок.
+
+    MEDIA_ROOT на время класса — свой временный каталог, миниатюры
+    строятся сразу, без пула. setUp чистит кэш и логинит self.client
+    под новым пользователем username.
+    """
+    username = 'author'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls._media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls._media_settings.enable()
+        try:
+            super().setUpClass()
+        except Exception:
+            cls._remove_media()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._remove_media()
+
+    @classmethod
+    def _remove_media(cls):
+        cls._media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username=self.username)
+        self.client = Client()
+        self.client.force_login(self.user)
@@ -0,0 +1,129 @@
+"""Ветки комментариев на материализованном пути.
+
+Путь комментария — id его предков и его собственный, каждый в base36
+фиксированной ширины: корень 42 получает путь «00000016», ответ 57 на
+него — «000000160000001l». Сортировка по пути даёт обход дерева в
+глубину, а вся ветка комментария с путём p — это диапазон
+[p, p + «~») в индексе (post, path). Страницу веток поэтому читают два
+запроса: корни по курсору и одним диапазоном ответы под ними.
+
+Под каждым корнем страница показывает только первые REPLIES_PER_PAGE
+ответов по пути; у последнего показанного ответа тогда есть
+replies_cursor — его путь. Следующие ответы ветки — это всё в её
+диапазоне после этого пути (replies_page).
+"""
+import re
+
+from .models import Comment
+from .paginators import CursorPaginator
+from .selectors import post_comments, with_ids
+
+SEGMENT = 8
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# Больше любой цифры base36: верхняя граница диапазона ветки.
+PATH_END = '~'
+MAX_DEPTH = 6
+REPLIES_PER_PAGE = 10
+REPLY_PATH = re.compile(f'(?:[0-9a-z]{{{SEGMENT}}}){{2,{MAX_DEPTH}}}')
+
+
+def encode(pk):
+    digits = []
+    while pk:
+        pk, rest = divmod(pk, len(DIGITS))
+        digits.append(DIGITS[rest])
+    return ''.join(reversed(digits)).rjust(SEGMENT, '0')
+
+
+def depth(path):
+    return max(len(path) // SEGMENT - 1, 0)
+
+
+def attach_parent(parent):
+    """Ответ на слишком глубокий комментарий становится ответом
+    его родителю, чтобы ветка не уходила вправо бесконечно."""
+    while parent is not None and depth(parent.path) >= MAX_DEPTH - 1:
+        parent = parent.parent
+    return parent
+
+
+def assign_path(comment):
+    """Записывает путь только что созданного комментария."""
+    prefix = comment.parent.path if comment.parent_id else ''
+    comment.path = prefix + encode(comment.pk)
+    type(comment).objects.filter(pk=comment.pk).update(path=comment.path)
+
+
+def subtree(comment):
+    """Комментарий и все ответы под ним в порядке обхода."""
+    return post_comments(comment.post_id).filter(
+        path__gte=comment.path, path__lt=comment.path + PATH_END,
+    ).order_by('path')
+
+
+def first_replies(post_id, low, high, limit):
+    """Первые limit ответов по пути в каждой ветке диапазона
+    [low, high); сами корни в выборку не входят."""
+    table = Comment._meta.db_table
+    return with_ids(
+        post_comments(post_id),
+        f'SELECT id FROM ('
+        f' SELECT id, ROW_NUMBER() OVER ('
+        f'  PARTITION BY substr(path, 1, {SEGMENT}) ORDER BY path'
+        f' ) AS position FROM {table}'
+        f' WHERE post_id = %s AND path >= %s AND path < %s'
+        f' AND length(path) > {SEGMENT}'
+        f') WHERE position <= %s',
+        [post_id, low, high, limit])
+
+
+def limit_replies(comments, per_page):
+    """Первые per_page ответов из выбранных с запасом в одну запись;
+    если запас пригодился, последний показанный получает курсор."""
+    shown = comments[:per_page]
+    if len(comments) > per_page:
+        shown[-1].replies_cursor = shown[-1].path
+    return shown
+
+
+def thread_page(post_id, per_page, after=None, replies=REPLIES_PER_PAGE):
+    """Страница веток: корневые комментарии от новых к старым по
+    курсору (created, id), под каждым — первые replies ответов
+    по порядку."""
+    paginator = CursorPaginator(
+        post_comments(post_id).filter(parent=None), per_page,
+        keys=('created', 'id'))
+    page = paginator.get_cursor_page(after=after)
+    roots = list(page)
+    if not roots:
+        return page
+    # Путь корня — это его id, поэтому он известен и у комментария,
+    # которому путь не записали (bulk_create, вставка мимо сигналов).
+    # Ответов без пути не видно: их место в дереве неизвестно.
+    paths = [encode(root.pk) for root in roots]
+    # Корни страницы идут подряд, поэтому их ветки лежат в одном
+    # диапазоне путей. Чужие корни, если created и id разошлись,
+    # отсекаются ниже. Из каждой ветки берутся replies ответов и ещё
+    # один — узнать, есть ли продолжение.
+    low, high = min(paths), max(paths) + PATH_END
+    branches = {path: [root] for path, root in zip(paths, roots)}
+    found = first_replies(post_id, low, high, replies + 1).order_by('path')
+    for comment in found:
+        branch = branches.get(comment.path[:SEGMENT])
+        if branch is not None:
+            branch.append(comment)
+    page.object_list = [
+        comment for path in paths
+        for comment in limit_replies(branches[path], replies + 1)]
+    return page
+
+
+def replies_page(post_id, cursor, per_page=REPLIES_PER_PAGE):
+    """Ответы ветки после ответа с путём cursor. Для битого курсора
+    возвращает None."""
+    if not REPLY_PATH.fullmatch(cursor or ''):
+        return None
+    found = post_comments(post_id).filter(
+        path__gt=cursor, path__lt=cursor[:SEGMENT] + PATH_END,
+    ).order_by('path')
+    return limit_replies(list(found[:per_page + 1]), per_page)
@@ -0,0 +1,184 @@
+"""Миниатюры картинок постов, подготовленные заранее.
+
+Тег {% thumbnail %} при первом показе картинки декодирует, режет и
+кодирует её прямо во время отрисовки страницы. Чтобы страница
+находила миниатюру уже готовой (одно обращение к хранилищу ключей
+sorl), после сохранения поста с картинкой миниатюры строятся в пуле
+процессов.
+
+Картинка поста показывается набором вариантов: несколько ширин кадра
+960x339 в WebP и JPEG. Браузер сам выбирает из srcset подходящую
+ширину и формат (см. тег post_image).
+"""
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import images
+
+logger = logging.getLogger(__name__)
+
+FRAME = (960, 339)
+VARIANT_WIDTHS = (320, 640, 960)
+# Первый формат — предпочтительный, последний — запасной для <img>
+VARIANT_FORMATS = ('WEBP', 'JPEG')
+CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+PENDING_KEY = 'thumbnails_pending:{}'
+# Сколько показы картинки без миниатюр не ставят её в очередь снова
+PENDING_TIMEOUT = 60
+
+
+def variant_size(width):
+    return width, round(width * FRAME[1] / FRAME[0])
+
+
+def variant_options(image_format):
+    return {'crop': 'center', 'upscale': True, 'format': image_format}
+
+
+# (геометрия, параметры) всех вариантов картинки поста
+THUMBNAILS = tuple(
+    ('{}x{}'.format(*variant_size(width)), variant_options(image_format))
+    for image_format in VARIANT_FORMATS
+    for width in VARIANT_WIDTHS
+)
+
+_pool = None
+_pool_lock = Lock()
+
+
+def workers():
+    """Число процессов пула; 0 — строить миниатюры в текущем потоке."""
+    return getattr(settings, 'THUMBNAIL_WORKERS', 2)
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def get_pool(max_workers=None):
+    """Общий для процесса пул. Процессы запускаются через spawn,
+    чтобы не наследовать соединения с базой от родителя."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or workers(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def generate(name):
+    """Строит все миниатюры картинки и возвращает их имена."""
+    from sorl.thumbnail import get_thumbnail
+    from sorl.thumbnail.images import ImageFile
+    from .storage import post_image_storage
+    # Ключ миниатюры в sorl зависит от хранилища исходника, поэтому
+    # оно должно быть тем же, что у поля Post.image в шаблонах.
+    source = ImageFile(name, post_image_storage)
+    return [get_thumbnail(source, geometry, **options).name
+            for geometry, options in THUMBNAILS]
+
+
+def variants(file_, create=True):
+    """Варианты картинки: {формат: [(ширина, высота, миниатюра)]}.
+
+    Размеры берутся из геометрии (кадр режется точно по ней), так что
+    в файлы за ними ходить не нужно. С create=False недостающие
+    миниатюры не строятся: если хоть одной нет в хранилище ключей
+    sorl, возвращается None.
+    """
+    from sorl.thumbnail import default, get_thumbnail
+    from .kvstore import thumbnail_file
+    result = {}
+    for image_format in VARIANT_FORMATS:
+        result[image_format] = []
+        for width in VARIANT_WIDTHS:
+            geometry = '{}x{}'.format(*variant_size(width))
+            options = variant_options(image_format)
+            if create:
+                thumbnail = get_thumbnail(file_, geometry, **options)
+            else:
+                thumbnail = default.kvstore.get(
+                    thumbnail_file(file_, geometry, options))
+                if thumbnail is None:
+                    return None
+            result[image_format].append(
+                (*variant_size(width), thumbnail))
+    return result
+
+
+def try_generate(name):
+    """Как generate, но ошибку только пишет в лог. Возвращает успех."""
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', name)
+        return False
+    return True
+
+
+def process_post(post_id):
+    """Обрабатывает картинку поста, если форма оставила её как есть,
+    и строит миниатюры.
+
+    Страницы с постом, отрисованные до этого, показывают исходный файл
+    без вариантов, поэтому после обработки версии поста поднимаются.
+    """
+    from .models import Post
+    from .versions import bump_post_versions
+    post = Post.objects.filter(pk=post_id).select_related(
+        'author', 'group').only(
+        'image', 'image_size', 'author', 'author__username', 'group',
+        'group__slug').first()
+    if post is None or not post.image:
+        return False
+    normalized = False
+    if post.image_size is None:
+        try:
+            normalized = images.normalize_stored(post) is not None
+            if not normalized:
+                # Картинку заменили: новую обработает своя задача.
+                return False
+        except Exception:
+            logger.exception('Не удалось обработать картинку %s',
+                             post.image.name)
+    generated = try_generate(post.image.name)
+    if normalized or generated:
+        bump_post_versions(post.pk, post.author.username,
+                           [post.group.slug] if post.group_id else [])
+    return generated
+
+
+def submit(func, *args):
+    """Ставит задачу в очередь пула или выполняет её сразу."""
+    if workers():
+        get_pool().submit(func, *args)
+    else:
+        func(*args)
+
+
+def schedule(post):
+    """Обрабатывает картинку поста и строит миниатюры после фиксации
+    транзакции."""
+    if post.image:
+        post_id = post.pk
+        transaction.on_commit(lambda: submit(process_post, post_id))
+
+
+def schedule_missing(post):
+    """Ставит в очередь миниатюры, которых не нашлось при показе поста.
+
+    Пока задача не отработала, повторные показы её не дублируют.
+    """
+    if cache.add(PENDING_KEY.format(post.image.name), True,
+                 PENDING_TIMEOUT):
+        schedule(post)
@@ -0,0 +1,163 @@
+"""Лента подписок по pull-модели.
+
+Для каждого автора в кэше лежит список (pub_date, id) его последних
+постов, от новых к старым. Страница ленты собирается k-way слиянием
+этих списков через кучу, после чего посты выбираются одним запросом
+по id. При сохранении и удалении поста список автора сбрасывается,
+а на случай гонок записи в кэше живут AUTHOR_TIMELINE_TIMEOUT секунд.
+"""
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import selectors
+from .models import Follow, Post
+from .paginators import CursorPaginator, decode_cursor
+
+TIMELINE_KEY = 'author_timeline:{}'
+
+
+def timeline_length():
+    return getattr(settings, 'AUTHOR_TIMELINE_LENGTH', 200)
+
+
+def timeline_timeout():
+    return getattr(settings, 'AUTHOR_TIMELINE_TIMEOUT', 300)
+
+
+def pull_max_follows():
+    return getattr(settings, 'FOLLOW_FEED_PULL_MAX_FOLLOWS', 300)
+
+
+def _load(author_id):
+    """Читает из базы последние посты автора.
+
+    Возвращает пару (записи, полный ли список): если постов больше
+    длины ленты, хвост обрезан и старше последней записи верить
+    списку нельзя.
+    """
+    length = timeline_length()
+    entries = list(
+        Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('pub_date', 'id')[:length + 1]
+    )
+    return entries[:length], len(entries) <= length
+
+
+def get_timelines(author_ids):
+    """Возвращает {author_id: (записи, полный ли список)}."""
+    keys = {TIMELINE_KEY.format(author_id): author_id
+            for author_id in author_ids}
+    cached = cache.get_many(keys)
+    timelines = {keys[key]: value for key, value in cached.items()}
+    missing = {}
+    for key, author_id in keys.items():
+        if key not in cached:
+            timelines[author_id] = missing[key] = _load(author_id)
+    if missing:
+        cache.set_many(missing, timeline_timeout())
+    return timelines
+
+
+def forget(author_id):
+    """Сбрасывает кэшированный список автора; follow_page прочитает
+    его из базы заново.
+
+    Править список на месте нельзя: два одновременных сохранения
+    постов автора читают одну версию, и запись одного из них теряется.
+    Второй сброс после фиксации транзакции нужен на случай, если
+    читатель успел положить в кэш список до неё.
+    """
+    key = TIMELINE_KEY.format(author_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def add_post(post):
+    forget(post.author_id)
+
+
+def remove_post(post):
+    forget(post.author_id)
+
+
+def _merge(timelines, after, before, count):
+    """Сливает списки авторов и возвращает до count записей.
+
+    После курсора after (или с начала) записи идут от новых к старым,
+    перед курсором before — от старых к новым. Возвращает None, если
+    у обрезанных списков не хватает хвоста, чтобы честно собрать
+    страницу.
+    """
+    horizon = max(
+        (entries[-1] for entries, complete in timelines
+         if not complete and entries),
+        default=None
+    )
+    if before is not None:
+        if horizon is not None and before < horizon:
+            return None
+        streams = (
+            reversed([entry for entry in entries if entry > before])
+            for entries, complete in timelines
+        )
+        return list(islice(heapq.merge(*streams), count))
+    streams = (
+        (entry for entry in entries if after is None or entry < after)
+        for entries, complete in timelines
+    )
+    result = list(islice(heapq.merge(*streams, reverse=True), count))
+    if horizon is not None and (
+            len(result) < count or result[-1] < horizon):
+        return None
+    return result
+
+
+def follow_page(user, per_page, after=None, before=None):
+    """Собирает страницу ленты подписок слиянием лент авторов.
+
+    Возвращает None, если пользователь подписан на слишком многих
+    авторов или страница уходит глубже кэшированных лент — тогда
+    ленту нужно читать из материализованной таблицы.
+    """
+    limit = pull_max_follows()
+    author_ids = list(Follow.objects.filter(
+        user=user).values_list('author_id', flat=True)[:limit + 1])
+    if len(author_ids) > limit:
+        return None
+    after = decode_cursor(after)
+    before = decode_cursor(before) if after is None else None
+    timelines = list(get_timelines(author_ids).values())
+    entries = _merge(timelines, after, before, per_page + 1)
+    if entries is None:
+        return None
+    if before is not None:
+        has_previous = len(entries) > per_page
+        entries = entries[:per_page][::-1]
+        has_next = True
+        if not entries:
+            return follow_page(user, per_page)
+    else:
+        has_next = len(entries) > per_page
+        has_previous = after is not None
+        entries = entries[:per_page]
+    ids = [pk for pub_date, pk in entries]
+    posts = selectors.feed_rows(ids)
+    followed = set(author_ids)
+    if len(posts) != len(ids) or any(
+            post.author_id not in followed for post in posts.values()):
+        # Кэш разошёлся с базой: сбрасываем списки и читаем ленту
+        # из таблицы.
+        cache.delete_many([TIMELINE_KEY.format(author_id)
+                           for author_id in author_ids])
+        return None
+    paginator = CursorPaginator(Post.objects.none(), per_page)
+    return paginator.build_page(
+        [posts[pk] for pk in ids],
+        has_next=has_next,
+        has_previous=has_previous,
+    )
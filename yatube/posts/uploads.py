@@ -0,0 +1,219 @@
+"""Загрузка картинок по частям и потоковый обработчик загрузок.
+
+Клиент создаёт загрузку (имя и полный размер файла), затем шлёт
+куски с указанием смещения и в конце фиксирует её. Куски пишутся во
+временный файл в CHUNKED_UPLOAD_DIR, принятое смещение хранится в
+Upload, так что после обрыва связи загрузку можно продолжить. Готовую
+загрузку форма поста прикрепляет вместо файла из multipart-запроса.
+"""
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from PIL import Image
+
+from . import images
+from .models import Upload
+
+# Сколько байт читать из запроса за раз
+COPY_SIZE = 64 * 2 ** 10
+
+
+class UploadError(Exception):
+    """Ошибка загрузки с HTTP-статусом для ответа клиенту."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def upload_dir():
+    path = getattr(settings, 'CHUNKED_UPLOAD_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'yatube-uploads')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def chunk_max_size():
+    """Наибольший кусок, который принимается одним запросом."""
+    return getattr(settings, 'CHUNKED_UPLOAD_CHUNK_MAX_SIZE', 2 ** 20)
+
+
+def path_of(upload):
+    return os.path.join(upload_dir(), f'{upload.pk}.part')
+
+
+def start(user, filename, size):
+    """Заводит загрузку. Размер проверяется до того, как пришли байты."""
+    if not filename:
+        raise UploadError('Не указано имя файла')
+    if size <= 0:
+        raise UploadError('Размер файла должен быть больше нуля')
+    if size > images.upload_max_size():
+        raise UploadError('Файл слишком большой', status=413)
+    upload = Upload.objects.create(
+        author=user, filename=os.path.basename(filename)[:255], size=size)
+    open(path_of(upload), 'wb').close()
+    return upload
+
+
+def body_stream(request):
+    """Тело запроса, которое можно читать до конца.
+
+    Без Content-Length (Transfer-Encoding: chunked) Django отдаёт
+    пустой поток, поэтому тогда читается wsgi.input — если сервер сам
+    отмечает в нём конец тела (wsgi.input_terminated).
+    """
+    if (not request.META.get('CONTENT_LENGTH')
+            and request.META.get('wsgi.input_terminated')):
+        return request.META['wsgi.input']
+    return request
+
+
+def write_chunk(upload, offset, stream, length=None):
+    """Дописывает кусок из stream начиная с offset.
+
+    Кусок читается из запроса понемногу, так что память не зависит
+    от его размера, а принятым считается столько байт, сколько
+    действительно пришло. length — заявленная длина, если она
+    известна: слишком большой кусок отклоняется до чтения. Возвращает
+    новое смещение.
+    """
+    if upload.committed:
+        raise UploadError('Загрузка уже завершена', status=409)
+    if offset != upload.received:
+        raise UploadError('Неверное смещение', status=409,
+                          offset=upload.received)
+    limit = min(chunk_max_size(), upload.size - offset)
+    if length is not None and length > limit:
+        raise UploadError('Кусок слишком большой', status=413,
+                          offset=upload.received)
+    written = 0
+    with open(path_of(upload), 'r+b') as target:
+        target.seek(offset)
+        while True:
+            # На байт больше остатка: так видно, что кусок не влез.
+            data = stream.read(min(COPY_SIZE, limit - written + 1))
+            if not data:
+                break
+            written += len(data)
+            if written > limit:
+                target.truncate(offset)
+                raise UploadError('Кусок слишком большой', status=413,
+                                  offset=upload.received)
+            target.write(data)
+        target.truncate()
+    # Условие на received не даёт двум запросам принять один кусок.
+    updated = Upload.objects.filter(
+        pk=upload.pk, received=offset, committed=False
+    ).update(received=offset + written)
+    if not updated:
+        upload.refresh_from_db()
+        raise UploadError('Неверное смещение', status=409,
+                          offset=upload.received)
+    upload.received = offset + written
+    return upload.received
+
+
+def commit(upload):
+    """Завершает загрузку, если пришли все байты и это картинка."""
+    if upload.received != upload.size:
+        raise UploadError('Загрузка не закончена', status=409,
+                          offset=upload.received)
+    try:
+        with Image.open(path_of(upload)) as image:
+            image.verify()
+    except Exception:
+        discard(upload)
+        raise UploadError('Файл не является картинкой')
+    upload.committed = True
+    upload.save(update_fields=['committed'])
+    return upload
+
+
+def from_request(request):
+    """Завершённая загрузка текущего пользователя из поля upload."""
+    upload_id = request.POST.get('upload')
+    if not upload_id:
+        return None
+    try:
+        upload_id = uuid.UUID(upload_id)
+    except ValueError:
+        raise Http404('Загрузка не найдена')
+    return get_object_or_404(
+        Upload, pk=upload_id, author=request.user, committed=True)
+
+
+def open_file(upload):
+    """Файл загрузки для формы; закрывается в close() или discard()."""
+    upload.file = File(open(path_of(upload), 'rb'), name=upload.filename)
+    return upload.file
+
+
+def close(upload):
+    """Закрывает файл, открытый open_file, если он был открыт."""
+    file_ = getattr(upload, 'file', None)
+    if file_ is not None:
+        file_.close()
+
+
+def discard(upload):
+    """Удаляет временный файл и запись о загрузке."""
+    close(upload)
+    try:
+        os.remove(path_of(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def expire(max_age=timedelta(days=1)):
+    """Удаляет брошенные загрузки старше max_age. Возвращает их число."""
+    stale = Upload.objects.filter(created__lt=timezone.now() - max_age)
+    count = 0
+    for upload in stale:
+        discard(upload)
+        count += 1
+    return count
+
+
+def too_large(request):
+    """Поля файлов, загрузку которых LimitedUploadHandler оборвал."""
+    request.POST  # разбор тела запускает обработчики загрузки
+    return getattr(request, '_uploads_too_large', set())
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет файл из multipart-запроса на диск кусками по 64 КБ.
+
+    В памяти держится только текущий кусок. На байте сверх
+    POST_IMAGE_UPLOAD_MAX_SIZE разбор запроса останавливается, и
+    остаток тела не читается. Имя поля запоминается на запросе
+    (см. too_large), чтобы форма назвала настоящую причину.
+    """
+
+    chunk_size = COPY_SIZE
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.limit = images.upload_max_size()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            self.file.close()
+            rejected = getattr(self.request, '_uploads_too_large', set())
+            rejected.add(self.field_name)
+            self.request._uploads_too_large = rejected
+            raise StopUpload(connection_reset=True)
+        self.file.write(raw_data)
@@ -1,18 +1,41 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('more/', views.index_more, name='index_more'),
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
+    path('group/<slug:slug>/more/', views.group_more, name='group_more'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/more/',
+         views.profile_more, name='profile_more'),
+    path('search/', views.post_search, name='search'),
+    path('autocomplete/', views.suggest, name='autocomplete'),
+    path('fragments/', views.page_fragments, name='fragments'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    path('uploads/', views.upload_start, name='upload_start'),
+    path('uploads/<uuid:upload_id>/',
+         views.upload_chunk, name='upload_chunk'),
+    path('uploads/<uuid:upload_id>/commit/',
+         views.upload_commit, name='upload_commit'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('follow/more/', views.follow_more, name='follow_more'),
+    path('api/posts/', api.posts, name='api_posts'),
+    path('api/posts/<int:post_id>/comments/',
+         api.post_comments, name='api_post_comments'),
+    path('api/groups/<slug:slug>/posts/',
+         api.group_posts, name='api_group_posts'),
+    path('api/profiles/<str:username>/posts/',
+         api.profile_posts, name='api_profile_posts'),
+    path('api/follow/posts/', api.follow_posts, name='api_follow_posts'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -0,0 +1,81 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'feed_version:{}'
+CHANGED_KEY = 'feed_changed_at:{}'
+
+
+def _initial_version():
+    # Если счётчик вытеснили из кэша, новое значение должно быть больше
+    # любого прежнего, иначе поднимутся старые фрагменты.
+    return int(time.time() * 1000)
+
+
+def get_version(key):
+    """Счётчик версии под ключом key; заводит его, если записи нет."""
+    version = cache.get(key)
+    if version is None:
+        version = _start_version(key)
+    return version
+
+
+def _start_version(key):
+    cache.add(key, _initial_version(), None)
+    return cache.get(key)
+
+
+def bump_version(key):
+    """Поднимает счётчик под ключом key и возвращает новое значение."""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, _initial_version(), None)
+        return cache.get(key)
+
+
+def feed_version(scope='index'):
+    """Текущая версия ленты, входит в ключи кэшированных страниц."""
+    return get_version(VERSION_KEY.format(scope))
+
+
+def bump_feed_version(scope='index'):
+    """Инвалидирует все закэшированные страницы ленты.
+
+    Возвращает новую версию.
+    """
+    cache.set(CHANGED_KEY.format(scope), time.time(), None)
+    return bump_version(VERSION_KEY.format(scope))
+
+
+def bump_post_versions(post_id, username, group_slugs=()):
+    """Поднимает версии всех страниц, на которых виден пост: главной,
+    самого поста, профиля автора и его групп."""
+    scopes = ['index', f'post:{post_id}', f'author:{username}']
+    scopes += [f'group:{slug}' for slug in group_slugs]
+    for scope in scopes:
+        bump_feed_version(scope)
+
+
+def scope_states(scopes):
+    """Версии и время последнего изменения (unix time) для нескольких
+    лент за одно обращение к кэшу.
+
+    Если запись вытеснили, время считается текущим: лишний раз отдать
+    страницу целиком лучше, чем ответить 304 на изменённую.
+    """
+    keys = {}
+    for scope in scopes:
+        keys[scope] = (VERSION_KEY.format(scope), CHANGED_KEY.format(scope))
+    found = cache.get_many([key for pair in keys.values() for key in pair])
+    states = []
+    for scope, (version_key, changed_key) in keys.items():
+        version = found.get(version_key)
+        if version is None:
+            version = _start_version(version_key)
+        changed = found.get(changed_key)
+        if changed is None:
+            changed = time.time()
+            cache.add(changed_key, changed, None)
+        states.append((version, changed))
+    return states
@@ -1,74 +1,120 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Follow, Post, Group
+from .models import Comment, Follow, Group, Post, Upload
 from .forms import PostForm, CommentForm
-from django.core.paginator import Paginator
+from .paginators import CursorPaginator, FeedPaginator
+from . import (api, autocomplete, conditional, feed, fragments,
+               kvstore, rendered, search, selectors, threads, thumbnails,
+               timelines, uploads)
+from .conditional import feed_condition
+from .pages import shared_page
+from .rows import as_rows
+from .counters import author_stats
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
-from django.core.cache import cache
+from django.http import HttpResponseBadRequest, JsonResponse
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_http_methods, require_POST
 
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+# Кроме updated_at ключ поста в кэше и обёртка в ленте читают имя
+# автора и slug группы (см. more_posts).
+POST_KEY_FIELDS = ('author__first_name', 'author__last_name', 'group__slug')
 
-def paginator_my(request, post_list):
-    paginator = Paginator(post_list, 10)
+
+def paginator_my(request, post_list, keys=('pub_date', 'id'), count=None,
+                 count_key=None, estimated=False, transform=list):
+    """По умолчанию листает ленту курсором (?after=/?before=),
+    нумерованные страницы остаются доступны через ?page=.
+    Число записей для них берётся из счётчиков или кэша
+    (см. FeedPaginator)."""
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    return page_obj
+    if page_number is not None:
+        paginator = FeedPaginator(
+            post_list, POSTS_PER_PAGE, count=count, count_key=count_key,
+            estimated=estimated, transform=transform)
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(
+        post_list, POSTS_PER_PAGE, keys=keys, transform=transform)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
 
+@feed_condition(conditional.index_scopes)
+@shared_page(conditional.index_scopes)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = paginator_my(request, post_list)
-    if len(request.GET) != 0:
-        cache.clear()
+    post_list = selectors.index_feed()
+    # Версию главной уже прочитали валидаторы, второй раз кэш не нужен.
+    states = conditional.feed_states(request, conditional.index_scopes, {})
+    count_key = f'index:{states[0][0]}'
+    # Страница выбирается только если она не нашлась в кэше.
+    page_obj = SimpleLazyObject(lambda: paginator_my(
+        request, post_list, count_key=count_key,
+        transform=as_rows))
     context = {
         'page_obj': page_obj,
+        'more_url': reverse('posts:index_more'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@feed_condition(conditional.group_scopes)
+@shared_page(conditional.group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = paginator_my(request, post_list)
+    post_list = selectors.group_feed(group)
+    states = conditional.feed_states(
+        request, conditional.group_scopes, {'slug': slug})
+    count_key = f'group:{group.pk}:{states[0][0]}'
+    page_obj = SimpleLazyObject(lambda: paginator_my(
+        request, post_list, count_key=count_key,
+        transform=as_rows))
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'page_obj': page_obj,
+        'more_url': reverse('posts:group_more', args=[slug]),
     }
     return render(request, template, context)
 
 
+@feed_condition(conditional.profile_scopes)
+@shared_page(conditional.profile_scopes)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
     full_name = author.get_full_name()
 
-    post_list = author.posts.all()
-    post_count = post_list.count()
-    page_obj = paginator_my(request, post_list)
-    if request.user.is_authenticated:
-        following = Follow.objects.filter(
-            user=request.user, author=author
-        )
-    else:
-        following = False
+    post_list = selectors.author_feed(author)
+    stats = SimpleLazyObject(lambda: author_stats(author))
+    post_count = SimpleLazyObject(lambda: stats.posts_count)
+    page_obj = SimpleLazyObject(lambda: paginator_my(
+        request, post_list, count=stats.posts_count, transform=as_rows))
 
     context = {
         'page_obj': page_obj,
         'post_count': post_count,
+        'stats': stats,
         'full_name': full_name,
         'author': author,
-        'following': following,
+        'more_url': reverse('posts:profile_more', args=[username]),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@feed_condition(conditional.post_scopes)
+@shared_page(conditional.post_scopes)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(selectors.detail_posts(), id=post_id)
     author = post.author
     form = CommentForm(request.POST or None)
-    comments = post.coments.all()
+    comments = SimpleLazyObject(lambda: comments_page(post.pk))
 
     full_name = author.get_full_name()
-    post_count = author.posts.all().count()
+    post_count = SimpleLazyObject(lambda: author_stats(author).posts_count)
     context = {
         'post': post,
         'author': author,
@@ -83,20 +129,119 @@ def post_detail(request, post_id):
         return render(request, 'posts/post_detail.html', context)
 
 
+def post_search(request):
+    """Поиск по тексту постов: ?q=, необязательные ?group= (slug) и
+    ?author= (username). Выдача по релевантности (см. search.py)."""
+    query = request.GET.get('q', '').strip()
+    group_slug = request.GET.get('group', '')
+    author_name = request.GET.get('author', '').strip()
+    group = author = None
+    if group_slug:
+        group = Group.objects.filter(slug=group_slug).first()
+    if author_name:
+        author = User.objects.filter(username=author_name).first()
+    paginator = search.SearchPaginator(
+        query, POSTS_PER_PAGE,
+        group_id=group.pk if group else None,
+        author_id=author.pk if author else None)
+    if (group_slug and group is None) or (author_name and author is None):
+        # Фильтр ни с чем не совпал — значит, и постов нет.
+        page_obj = paginator.empty_page()
+    else:
+        page_obj = paginator.get_cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    kvstore.prefetch([result.post for result in page_obj])
+    params = request.GET.copy()
+    for key in ('after', 'before', 'page'):
+        params.pop(key, None)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'group_slug': group_slug,
+        'author_name': author_name,
+        'groups': Group.objects.order_by('title').only('slug', 'title'),
+        'page_params': params.urlencode() + '&' if params else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def suggest(request):
+    """Подсказки авторов и групп: ?q= — начало имени, логина, названия
+    или slug, ?limit= — сколько вернуть. База не читается."""
+    try:
+        limit = int(request.GET.get('limit', autocomplete.DEFAULT_LIMIT))
+    except ValueError:
+        limit = autocomplete.DEFAULT_LIMIT
+    limit = max(1, min(limit, autocomplete.MAX_LIMIT))
+    results = autocomplete.index.search(request.GET.get('q', ''), limit)
+    return JsonResponse(
+        {'results': [autocomplete.with_url(item) for item in results]})
+
+
+@never_cache
+def page_fragments(request):
+    """Персональные фрагменты общей страницы для текущего
+    пользователя: ?name=nav&name=follow:leo... (см. fragments.py)."""
+    found = {}
+    names = dict.fromkeys(request.GET.getlist('name'))
+    for key in list(names)[:fragments.MAX_NAMES]:
+        html = fragments.render(key, request)
+        if html is not None:
+            found[key] = html
+    return JsonResponse({'fragments': found})
+
+
+def comments_page(post_id, after=None):
+    return threads.thread_page(post_id, COMMENTS_PER_PAGE, after=after)
+
+
+def post_comments(request, post_id):
+    """Следующая страница веток комментариев после курсора ?after=
+    или следующие ответы ветки после ?replies=: HTML-фрагмент для
+    подгрузки на странице поста или JSON при ?format=json."""
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    if 'replies' in request.GET:
+        comments = threads.replies_page(post_id, request.GET['replies'])
+        if comments is None:
+            return HttpResponseBadRequest('Неверный курсор')
+        next_cursor = None
+    else:
+        comments = comments_page(post_id, after=request.GET.get('after'))
+        next_cursor = comments.next_cursor
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'results': api.serialize_comments(comments),
+            'next': next_cursor,
+        })
+    return render(request, 'posts/includes/comments.html', {
+        'post_id': post_id,
+        'comments': comments,
+    })
+
+
 @login_required
 def post_create(request):
-
-    form = PostForm(request.POST or None, files=request.FILES or None)
+    upload = uploads.from_request(request)
+    form = PostForm(request.POST or None, files=request.FILES or None,
+                    upload=upload, too_large=uploads.too_large(request))
     context = {
         'form': form,
     }
-    if form.is_valid() and request.method == 'POST':
-        form_obj = form.save(commit=False)
-        form_obj.author = request.user
-        form_obj.save()
-        return redirect('posts:profile', username=request.user)
-    else:
-        return render(request, 'posts/create_post.html', context)
+    try:
+        if form.is_valid() and request.method == 'POST':
+            form_obj = form.save(commit=False)
+            form_obj.author = request.user
+            form_obj.save()
+            if upload is not None:
+                uploads.discard(upload)
+            thumbnails.schedule(form_obj)
+            return redirect('posts:profile', username=request.user)
+    finally:
+        if upload is not None:
+            uploads.close(upload)
+    return render(request, 'posts/create_post.html', context)
 
 
 def post_edit(request, post_id):
@@ -104,14 +249,25 @@ def post_edit(request, post_id):
     if post.author != request.user:
         return redirect('posts:post_detail', post_id=post_id)
 
+    upload = uploads.from_request(request)
     form = PostForm(
         request.POST or None,
         files=request.FILES or None,
-        instance=post
+        instance=post,
+        upload=upload,
+        too_large=uploads.too_large(request)
     )
-    if form.is_valid():
-        form.save()
-        return redirect('posts:post_detail', post_id=post_id)
+    try:
+        if form.is_valid():
+            post = form.save()
+            if upload is not None:
+                uploads.discard(upload)
+            if 'image' in form.changed_data or upload is not None:
+                thumbnails.schedule(post)
+            return redirect('posts:post_detail', post_id=post_id)
+    finally:
+        if upload is not None:
+            uploads.close(upload)
     context = {
         'post': post,
         'form': form,
@@ -123,7 +279,11 @@ def post_edit(request, post_id):
 @login_required
 def add_comment(request, post_id):
     post = get_object_or_404(Post, id=post_id)
-    form = CommentForm(request.POST or None)
+    parent = None
+    if request.POST.get('parent', '').isdigit():
+        parent = get_object_or_404(
+            Comment, pk=request.POST['parent'], post=post)
+    form = CommentForm(request.POST or None, parent=parent)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
@@ -132,16 +292,159 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post_id)
 
 
+def upload_error(error):
+    data = {'error': str(error)}
+    if error.offset is not None:
+        data['offset'] = error.offset
+    return JsonResponse(data, status=error.status)
+
+
+@login_required
+@require_POST
+def upload_start(request):
+    """Заводит загрузку по частям: filename и size в байтах."""
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Неверный размер'}, status=400)
+    try:
+        upload = uploads.start(
+            request.user, request.POST.get('filename', ''), size)
+    except uploads.UploadError as error:
+        return upload_error(error)
+    return JsonResponse(
+        {'id': str(upload.pk), 'offset': upload.received}, status=201)
+
+
+@login_required
+@require_http_methods(['GET', 'PUT'])
+def upload_chunk(request, upload_id):
+    """GET — сколько байт уже принято, PUT ?offset=N — очередной кусок
+    в теле запроса."""
+    upload = get_object_or_404(Upload, pk=upload_id, author=request.user)
+    if request.method == 'GET':
+        return JsonResponse({'id': str(upload.pk), 'size': upload.size,
+                             'offset': upload.received,
+                             'committed': upload.committed})
+    try:
+        offset = int(request.GET.get('offset', ''))
+        length = request.META.get('CONTENT_LENGTH')
+        length = int(length) if length else None
+    except ValueError:
+        return JsonResponse({'error': 'Неверное смещение'}, status=400)
+    try:
+        offset = uploads.write_chunk(
+            upload, offset, uploads.body_stream(request), length)
+    except uploads.UploadError as error:
+        return upload_error(error)
+    return JsonResponse({'id': str(upload.pk), 'offset': offset})
+
+
+@login_required
+@require_POST
+def upload_commit(request, upload_id):
+    upload = get_object_or_404(
+        Upload, pk=upload_id, author=request.user, committed=False)
+    try:
+        uploads.commit(upload)
+    except uploads.UploadError as error:
+        return upload_error(error)
+    return JsonResponse({'id': str(upload.pk), 'offset': upload.received,
+                         'committed': True})
+
+
 @login_required
+@feed_condition(conditional.follow_scopes)
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator_my(request, post_list)
+    page_obj = None
+    if 'page' not in request.GET:
+        page_obj = timelines.follow_page(
+            request.user,
+            POSTS_PER_PAGE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    if page_obj is None:
+        entries = selectors.follow_entries(request.user)
+        count = None
+        if 'page' in request.GET:
+            count = feed.estimate_length(request.user.pk)
+        page_obj = paginator_my(
+            request, entries, keys=('pub_date', 'post_id'),
+            count=count, estimated=True)
+        ids = [entry.post_id for entry in page_obj]
+        posts = selectors.feed_rows(ids)
+        page_obj.object_list = [posts[pk] for pk in ids if pk in posts]
     context = {
         'page_obj': page_obj,
+        'more_url': reverse('posts:follow_more'),
     }
     return render(request, 'posts/follow.html', context)
 
 
+def more_posts(request, entries, url, keys=('pub_date', 'id'),
+               show_group=True):
+    """Следующая страница ленты после курсора ?after= — только посты,
+    без шапки и подвала страницы. Ключи постов, имя автора для ключа
+    кэша и slug группы для ссылки под постом читаются одним запросом
+    по индексу ленты, HTML постов берётся из кэша (см. rendered.py).
+    Под постом то же, что на странице ленты (includes/feed_post.html).
+
+    Лента подписок хранит только id постов (keys с post_id), для неё
+    updated_at, автор и группа читаются ещё одним запросом по
+    первичному ключу."""
+    first, second = keys
+    if second == 'post_id':
+        entries = entries.only(first, second)
+    else:
+        entries = entries.select_related('author', 'group').only(
+            first, second, 'updated_at', *POST_KEY_FIELDS)
+    page_obj = CursorPaginator(
+        entries, POSTS_PER_PAGE, keys=keys,
+    ).get_cursor_page(after=request.GET.get('after'))
+    posts = list(page_obj)
+    if second == 'post_id':
+        ids = [entry.post_id for entry in posts]
+        found = Post.objects.select_related('author', 'group').only(
+            'updated_at', *POST_KEY_FIELDS).in_bulk(ids)
+        posts = [found[pk] for pk in ids if pk in found]
+    html = rendered.render_posts(posts)
+    next_url = None
+    if page_obj.next_cursor:
+        next_url = f'{url}?after={page_obj.next_cursor}'
+    return render(request, 'posts/includes/more_posts.html', {
+        'posts': [(post, html[post.id]) for post in posts if post.id in html],
+        'next_url': next_url,
+        'show_group': show_group,
+    })
+
+
+def index_more(request):
+    return more_posts(
+        request, Post.objects.all(), reverse('posts:index_more'))
+
+
+def group_more(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return more_posts(
+        request, Post.objects.filter(group=group),
+        reverse('posts:group_more', args=[slug]), show_group=False)
+
+
+def profile_more(request, username):
+    author = get_object_or_404(User, username=username)
+    return more_posts(
+        request, Post.objects.filter(author=author),
+        reverse('posts:profile_more', args=[username]))
+
+
+@login_required
+def follow_more(request):
+    return more_posts(
+        request, selectors.follow_entries(request.user),
+        reverse('posts:follow_more'), keys=('pub_date', 'post_id'))
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
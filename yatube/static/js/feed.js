@@ -0,0 +1,56 @@
+// Бесконечная лента: вместо перехода на следующую страницу
+// подгружает только посты (см. posts.views.more_posts) и дописывает
+// их в конец. Без скрипта остаётся обычная пагинация.
+(function ($) {
+  'use strict';
+
+  function load(button) {
+    if (button.data('loading')) {
+      return;
+    }
+    button.data('loading', true);
+    $.get(button.attr('href'), function (html) {
+      button.replaceWith(html);
+      watch();
+    }).fail(function () {
+      button.data('loading', false);
+    });
+  }
+
+  // Следующая порция грузится, когда кнопка доезжает до экрана.
+  var observer = 'IntersectionObserver' in window ?
+    new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (entry.isIntersecting) {
+          observer.unobserve(entry.target);
+          load($(entry.target));
+        }
+      });
+    }, {rootMargin: '400px'}) : null;
+
+  function watch() {
+    if (observer) {
+      $('.js-more-posts').each(function () {
+        observer.observe(this);
+      });
+    }
+  }
+
+  $(document).on('click', '.js-more-posts', function (event) {
+    event.preventDefault();
+    load($(this));
+  });
+
+  $(function () {
+    var next = $('a[data-more]').first();
+    if (!next.length) {
+      return;
+    }
+    $('<a class="btn btn-outline-primary my-4 js-more-posts">Ещё записи</a>')
+      .attr('href', next.data('more'))
+      .insertBefore(next.closest('nav'));
+    // Скрипт сам листает дальше: кнопки страниц больше не нужны.
+    next.closest('nav').hide();
+    watch();
+  });
+})(jQuery);
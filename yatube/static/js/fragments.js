@@ -0,0 +1,45 @@
+// Заполняет персональные места общей страницы из кэша: меню в шапке,
+// кнопку подписки, формы комментариев (см. posts/fragments.py).
+// До ответа на их месте остаётся вариант для анонима.
+(function ($) {
+  'use strict';
+
+  function fill(root) {
+    var holes = $(root).find('[data-fragment]');
+    var url = $('body').data('fragments-url');
+    if (!holes.length || !url) {
+      return;
+    }
+    // Один и тот же фрагмент (форма ответа) может стоять во многих
+    // местах, запрашивается он один раз.
+    var names = [];
+    holes.each(function () {
+      var name = $(this).attr('data-fragment');
+      if (names.indexOf(name) === -1) {
+        names.push(name);
+      }
+    });
+    $.ajax({
+      url: url,
+      data: {name: names},
+      traditional: true,
+      dataType: 'json',
+    }).done(function (data) {
+      holes.each(function () {
+        var html = data.fragments[$(this).attr('data-fragment')];
+        if (html !== undefined) {
+          $(this).html(html).removeAttr('data-fragment');
+          // Форма ответа отвечает комментарию, под которым стоит.
+          var comment = $(this).closest('[data-comment]').attr('data-comment');
+          if (comment) {
+            $(this).find('[data-parent]').val(comment);
+          }
+        }
+      });
+    });
+  }
+
+  $(function () {
+    fill(document);
+  });
+})(jQuery);
@@ -115,8 +115,73 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# default — двухуровневый кэш: LRU в памяти воркера поверх общего
+# для всех воркеров кэша в базе (таблица создаётся createcachetable).
+# В памяти держатся только записи, которые никогда не переписываются
+# под тем же ключом: отрисованные посты и метаданные картинок
+# sorl-thumbnail (см. core/cache.py).
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'OPTIONS': {
+            'L2_CACHE': 'shared',
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 5,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
 }
+
+# sorl-thumbnail хранит метаданные миниатюр через тот же двухуровневый кэш
+THUMBNAIL_CACHE = 'default'
+# ...и умеет подгружать их пачкой на всю страницу ленты
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+
+# Сколько процессов строят миниатюры после загрузки картинки
+# (0 — строить сразу в потоке запроса)
+THUMBNAIL_WORKERS = 2
+
+# Загруженные картинки уменьшаются до этих размеров и пересжимаются
+# в прогрессивный JPEG. Файлы крупнее POST_IMAGE_INLINE_LIMIT байт
+# обрабатываются не в запросе, а в пуле миниатюр.
+POST_IMAGE_MAX_SIZE = (2048, 2048)
+POST_IMAGE_QUALITY = 85
+POST_IMAGE_INLINE_LIMIT = 1024 * 1024
+POST_IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+# Файлы из форм пишутся на диск кусками, без буфера в памяти.
+# Загрузка по частям копит куски в CHUNKED_UPLOAD_DIR (по умолчанию
+# во временной папке системы).
+FILE_UPLOAD_HANDLERS = ['posts.uploads.LimitedUploadHandler']
+CHUNKED_UPLOAD_CHUNK_MAX_SIZE = 1024 * 1024
+
+# Поиск ранжирует по bm25 только столько самых новых совпадений
+SEARCH_RANK_WINDOW = 5000
+
+# Как часто индекс автодополнения сверяется с общей версией в кэше
+# (изменения из других процессов видны с такой задержкой), секунды
+AUTOCOMPLETE_REFRESH_INTERVAL = 5
+
+# Сколько записей хранится в материализованной ленте подписок
+# (лишнее обрезает rebuild_feed --trim-only по расписанию)
+FEED_MAX_LENGTH = 1000
+
+# Pull-лента подписок: длина кэшированной ленты автора и порог подписок,
+# после которого лента читается из материализованной таблицы
+AUTHOR_TIMELINE_LENGTH = 200
+# Сколько живёт кэшированная лента автора, секунды
+AUTHOR_TIMELINE_TIMEOUT = 300
+FOLLOW_FEED_PULL_MAX_FOLLOWS = 300
+
+# Сколько живёт отрисованный пост в кэше лент, секунды (см. rendered.py)
+POST_FRAGMENT_TIMEOUT = 60 * 60
+
+# Сколько живёт общая копия страницы ленты или поста, секунды. Сигналы
+# сбрасывают её раньше; срок ограничивает только правки в обход них.
+PAGE_CACHE_TIMEOUT = 60